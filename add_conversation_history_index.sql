@@ -0,0 +1,7 @@
+-- Index for the conversation history read in modules/conversation.py:
+--   sakhi_conversations?user_id=eq.<id>&order=created_at.desc&limit=N
+-- lets Postgres read the newest N rows of one user straight from the index
+-- instead of scanning and sorting all of that user's messages.
+
+create index if not exists sakhi_conversations_user_id_created_at_idx
+  on sakhi_conversations (user_id, created_at desc);
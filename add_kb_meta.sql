@@ -0,0 +1,13 @@
+-- Knowledge base version shared by every API worker and pod.
+-- The ingest scripts (ingest_hierarchical.py, ingest_json.py) write a new
+-- value through modules/answer_cache.bump_kb_version; workers poll it to drop
+-- cached answers and rebuild the in-process KB / BM25 indexes after a re-ingest.
+
+create table if not exists kb_meta (
+  key text primary key,
+  value text not null default '',
+  updated_at timestamptz not null default now()
+);
+
+insert into kb_meta (key, value) values ('kb_version', '')
+  on conflict (key) do nothing;
@@ -0,0 +1,111 @@
+-- ANN indexes for the retrieval RPCs, and hierarchical_search / match_faq rewritten to use them
+-- Requires setup_hierarchical_rag.sql and update_faq_rpc.sql (pgvector >= 0.5.0 for HNSW).
+--
+-- Before: both RPCs computed <=> for every row (twice, in SELECT and WHERE), and
+-- hierarchical_search's "distinct on (sakhi_sections.id) ... order by sakhi_sections.id"
+-- returned the sections with the lowest ids above the threshold, not the most similar ones.
+-- After: nearest chunks come from the HNSW index, are deduped to the best chunk per
+-- parent section, and only then ordered by similarity and cut to match_count.
+
+-- 1. HNSW indexes (cosine distance, same operator as <=>)
+create index if not exists sakhi_section_chunks_embedding_hnsw
+  on sakhi_section_chunks using hnsw (embedding vector_cosine_ops)
+  with (m = 16, ef_construction = 64);
+
+create index if not exists sakhi_faq_question_vector_hnsw
+  on sakhi_faq using hnsw (question_vector vector_cosine_ops)
+  with (m = 16, ef_construction = 64);
+
+-- Join from chunk candidates to their parent section
+create index if not exists sakhi_section_chunks_section_id_idx
+  on sakhi_section_chunks (section_id);
+
+-- 2. hierarchical_search: ANN candidates -> best chunk per section -> most similar sections
+-- A section usually has several chunks among the nearest ones, so the candidate pool
+-- (100 chunks, = hnsw.ef_search) is much larger than match_count.
+create or replace function hierarchical_search (
+  query_embedding vector(1536),
+  match_threshold float,
+  match_count int
+)
+returns table (
+  section_content text,
+  header_path text,
+  similarity float
+)
+language plpgsql
+set hnsw.ef_search = 100
+as $$
+begin
+  return query
+  with candidates as (
+    select
+      sakhi_section_chunks.section_id,
+      sakhi_section_chunks.embedding <=> query_embedding as distance
+    from sakhi_section_chunks
+    order by sakhi_section_chunks.embedding <=> query_embedding
+    limit 100
+  ),
+  best_per_section as (
+    select distinct on (candidates.section_id)
+      candidates.section_id,
+      candidates.distance
+    from candidates
+    order by candidates.section_id, candidates.distance
+  )
+  select
+    sakhi_sections.content,
+    sakhi_sections.header_path,
+    1 - best_per_section.distance as similarity
+  from best_per_section
+  join sakhi_sections on sakhi_sections.id = best_per_section.section_id
+  where 1 - best_per_section.distance > match_threshold
+  order by best_per_section.distance
+  limit match_count;
+end;
+$$;
+
+-- 3. match_faq: ANN top-k first, threshold on the (already computed) distance
+create or replace function match_faq (
+  query_embedding vector(1536),
+  match_count int
+)
+returns table (
+  id int,
+  question text,
+  answer text,
+  youtube_link text,
+  infographic_url text,
+  similarity float
+)
+language plpgsql
+set hnsw.ef_search = 40
+as $$
+begin
+  return query
+  select
+    nearest.id,
+    nearest.question,
+    nearest.answer,
+    nearest.youtube_link,
+    nearest.infographic_url,
+    1 - nearest.distance as similarity
+  from (
+    select
+      sakhi_faq.id,
+      sakhi_faq.question,
+      sakhi_faq.answer,
+      sakhi_faq.youtube_link,
+      sakhi_faq.infographic_url,
+      sakhi_faq.question_vector <=> query_embedding as distance
+    from sakhi_faq
+    order by sakhi_faq.question_vector <=> query_embedding
+    limit match_count
+  ) as nearest
+  where 1 - nearest.distance > 0.5 -- Threshold
+  order by nearest.distance;
+end;
+$$;
+
+-- hierarchical_search_with_faq (hierarchical_search_with_faq.sql) calls both functions
+-- and picks up the new versions without being re-created.
@@ -0,0 +1,188 @@
+# benchmark_retrieval.py
+"""
+Benchmark hierarchical retrieval: in-process KB index (float32 / int8) vs. the Supabase RPCs,
+and vector-only vs. hybrid (BM25 + vector, RRF) retrieval.
+
+Usage:
+    python benchmark_retrieval.py --synthetic 20000          # offline, random KB
+    python benchmark_retrieval.py --synthetic 20000 --hybrid # + BM25 / fusion latency
+    python benchmark_retrieval.py --queries "what is ivf" "ivf cost" --rpc
+    python benchmark_retrieval.py --labeled labeled_queries.jsonl --hybrid
+        # one {"query": "...", "header_path": "..."} per line; recall@k vector-only vs hybrid
+Requires (live mode):
+    - .env with Supabase credentials (and OPENAI_API_KEY to embed --queries)
+"""
+
+import argparse
+import json
+import statistics
+import time
+from typing import Any, Callable, List
+
+import numpy as np
+
+from bm25_index import LexicalKBIndex, reciprocal_rank_fusion
+from kb_index import KBIndex, _Snapshot, encode_vectors
+
+DIMENSIONS = 1536
+
+
+def synthetic_index(chunks: int, sections: int, faqs: int, quantize: bool, seed: int = 0) -> KBIndex:
+    """A KBIndex filled with random vectors (no Supabase needed)."""
+    rng = np.random.default_rng(seed)
+    index = KBIndex(quantize=quantize)
+    snapshot = _Snapshot()
+    snapshot.chunk_matrix, snapshot.chunk_scales = encode_vectors(
+        rng.standard_normal((chunks, DIMENSIONS)).astype(np.float32), quantize
+    )
+    snapshot.chunk_section_ids = rng.integers(1, sections + 1, size=chunks).astype(np.int64)
+    snapshot.sections = {i: (f"Section {i}", synthetic_text(i)) for i in range(1, sections + 1)}
+    snapshot.faq_matrix, snapshot.faq_scales = encode_vectors(
+        rng.standard_normal((faqs, DIMENSIONS)).astype(np.float32), quantize
+    )
+    snapshot.faq_rows = [{"id": i, "question": f"Q{i}", "answer": f"A{i}", "youtube_link": None,
+                          "infographic_url": None} for i in range(faqs)]
+    index._snapshot = snapshot
+    return index
+
+
+def synthetic_text(seed: int, words: int = 300, vocabulary: int = 5000) -> str:
+    """Deterministic random-word text (Zipf-like word frequencies)."""
+    rng = np.random.default_rng(seed)
+    return " ".join(f"w{min(int(w), vocabulary)}" for w in rng.zipf(1.3, size=words))
+
+
+def synthetic_lexical_index(sections: int, faqs: int) -> LexicalKBIndex:
+    """A LexicalKBIndex over the same synthetic sections as synthetic_index."""
+    index = LexicalKBIndex(min_score=0.0)
+    sections_rows = [{"id": i, "header_path": f"Section {i}", "content": synthetic_text(i)} for i in range(1, sections + 1)]
+    faq_rows = [{"id": i, "question": synthetic_text(10**6 + i, words=12), "answer": f"A{i}"} for i in range(faqs)]
+    index._index_rows(index.sections, index.faq, index._section_rows, index._faq_rows, sections_rows, faq_rows)
+    return index
+
+
+def hybrid_search(vector_index: KBIndex, lexical_index: LexicalKBIndex, text: str, query: np.ndarray, top_k: int):
+    """What search_hierarchical returns with RAG_HYBRID_ENABLED (sections only)."""
+    docs = vector_index.hierarchical_search(query, 0.3, top_k)
+    return reciprocal_rank_fusion(
+        [docs, lexical_index.search_sections(text, top_k)],
+        lambda r: (r.get("header_path"), r.get("section_content")),
+        top_k,
+    )
+
+
+def labeled_recall(rows: List[dict], search: Callable[[dict], List[dict]]) -> float:
+    """Share of labeled queries whose expected header_path is among the results."""
+    hits = sum(1 for row in rows if any(r["header_path"] == row["header_path"] for r in search(row)))
+    return hits / len(rows) if rows else 1.0
+
+
+def time_calls(fn: Callable[[Any], object], queries: List[Any], repeat: int) -> List[float]:
+    timings = []
+    for _ in range(repeat):
+        for query in queries:
+            started = time.perf_counter()
+            fn(query)
+            timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def report(label: str, timings: List[float]) -> None:
+    ordered = sorted(timings)
+    p95 = ordered[int(len(ordered) * 0.95) - 1] if len(ordered) >= 20 else ordered[-1]
+    print(f"{label:<28} p50 {statistics.median(ordered):8.3f} ms   p95 {p95:8.3f} ms   n={len(ordered)}")
+
+
+def recall_at_k(reference: KBIndex, candidate: KBIndex, queries: List[np.ndarray], k: int) -> float:
+    """Share of reference sections that the candidate index also returns."""
+    hits = total = 0
+    for query in queries:
+        expected = {r["header_path"] for r in reference.hierarchical_search(query, -1.0, k)}
+        got = {r["header_path"] for r in candidate.hierarchical_search(query, -1.0, k)}
+        hits += len(expected & got)
+        total += len(expected)
+    return hits / total if total else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark KB retrieval")
+    parser.add_argument("--synthetic", type=int, help="Number of random chunks (offline mode)")
+    parser.add_argument("--sections", type=int, default=500)
+    parser.add_argument("--faqs", type=int, default=300)
+    parser.add_argument("--queries", nargs="*", help="Questions to embed (live mode)")
+    parser.add_argument("--num-queries", type=int, default=50, help="Random queries when none are given")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top-k", type=int, default=4)
+    parser.add_argument("--rpc", action="store_true", help="Also time the Supabase RPCs (live mode)")
+    parser.add_argument("--hybrid", action="store_true", help="Also time BM25 and hybrid (RRF) retrieval")
+    parser.add_argument("--labeled", help="JSONL of {query, header_path} for recall (live mode)")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        float_index = synthetic_index(args.synthetic, args.sections, args.faqs, quantize=False)
+        int8_index = synthetic_index(args.synthetic, args.sections, args.faqs, quantize=True)
+    else:
+        float_index = KBIndex(quantize=False)
+        float_index.refresh(full=True)
+        int8_index = KBIndex(quantize=True)
+        int8_index.refresh(full=True)
+    print(f"float32 index: {float_index.stats()}")
+    print(f"int8 index:    {int8_index.stats()}")
+
+    labeled = []
+    if args.labeled:
+        with open(args.labeled, "r", encoding="utf-8") as f:
+            labeled = [json.loads(line) for line in f if line.strip()]
+        args.queries = [row["query"] for row in labeled]
+
+    if args.queries:
+        from rag import generate_embeddings
+        queries = [np.asarray(v, dtype=np.float32) for v in generate_embeddings(args.queries)]
+        texts = list(args.queries)
+    else:
+        rng = np.random.default_rng(1)
+        queries = list(rng.standard_normal((args.num_queries, DIMENSIONS)).astype(np.float32))
+        texts = [synthetic_text(2 * 10**6 + i, words=4) for i in range(len(queries))]
+
+    report("in-process float32", time_calls(lambda q: float_index.search(q, 0.3, args.top_k), queries, args.repeat))
+    report("in-process int8", time_calls(lambda q: int8_index.search(q, 0.3, args.top_k), queries, args.repeat))
+    print(f"int8 recall@{args.top_k} vs float32: {recall_at_k(float_index, int8_index, queries, args.top_k):.3f}")
+
+    if args.hybrid or labeled:
+        if args.synthetic:
+            lexical_index = synthetic_lexical_index(args.sections, args.faqs)
+        else:
+            lexical_index = LexicalKBIndex()
+            lexical_index.refresh(full=True)
+        print(f"BM25 index:    {lexical_index.stats()}")
+        pairs = list(zip(texts, queries))
+
+        def time_pairs(fn):
+            return time_calls(lambda pair: fn(*pair), pairs, args.repeat)
+
+        report("BM25 sections + FAQ", time_pairs(lambda t, q: (lexical_index.search_sections(t, args.top_k),
+                                                                  lexical_index.search_faq(t, 1))))
+        report("hybrid float32 + RRF", time_pairs(lambda t, q: hybrid_search(float_index, lexical_index, t, q, args.top_k)))
+
+        if labeled:
+            by_query = dict(zip(texts, queries))
+            vector_recall = labeled_recall(
+                labeled, lambda row: float_index.hierarchical_search(by_query[row["query"]], 0.3, args.top_k))
+            hybrid_recall = labeled_recall(
+                labeled, lambda row: hybrid_search(float_index, lexical_index, row["query"], by_query[row["query"]], args.top_k))
+            print(f"recall@{args.top_k} on {len(labeled)} labeled queries: "
+                  f"vector-only {vector_recall:.3f}   hybrid {hybrid_recall:.3f}")
+
+    if args.rpc and not args.synthetic:
+        from supabase_client import supabase_rpc
+
+        def rpc_search(query: np.ndarray):
+            vector = query.tolist()
+            supabase_rpc("hierarchical_search", {"query_embedding": vector, "match_threshold": 0.3, "match_count": args.top_k})
+            supabase_rpc("match_faq", {"query_embedding": vector, "match_count": 1})
+
+        report("Supabase RPCs", time_calls(rpc_search, queries, 1))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+# bm25_index.py
+"""
+Lexical (BM25) index over the KB for hybrid retrieval.
+
+text-embedding-3-small places Tinglish and short medical abbreviations
+("pcod", "icsi", "hsg") poorly, so a purely vector search often finds no
+section above the threshold for them. This module keeps an in-process BM25
+inverted index over sakhi_sections (header_path + content) and
+sakhi_faq.question; search_hierarchical fuses its rankings with the vector
+rankings by reciprocal rank fusion (RRF).
+
+- Enabled with RAG_HYBRID_ENABLED=true.
+- Incremental: new rows (id above the last seen id) are added to the posting
+  lists every RAG_BM25_REFRESH_SECONDS in a background thread; a KB version
+  bump forces a full rebuild.
+"""
+
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from kb_index import fetch_rows_since
+from modules.answer_cache import read_kb_version
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Question words and fillers (English and Tinglish) that carry no topic
+STOPWORDS = frozenset(
+    """
+    a an the is are was were be been am do does did i me my you your we our it its this that these those
+    what which who whom how why when where can could should would will shall may might must
+    of in on at to for from by with about into as or and but if so not no yes
+    please tell explain know need want get have has had any some
+    em emi enti ela ala ekkada eppudu enduku naku nenu meeru memu nuvvu mee maa ki ko lo tho
+    ante kuda kavali cheppandi cheppu undi unda ledu leda avuna ha
+    """.split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word tokens without stopwords (Telugu script is kept as-is)."""
+    return [t for t in TOKEN_PATTERN.findall((text or "").lower()) if t not in STOPWORDS and (len(t) > 1 or t.isdigit())]
+
+
+class BM25:
+    """
+    Okapi BM25 over one corpus, with documents added or replaced one at a time.
+    Not thread-safe on its own; LexicalKBIndex serializes access.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[Hashable, int]] = {}  # token -> {doc_id: term frequency}
+        self.doc_lengths: Dict[Hashable, int] = {}
+        self.doc_tokens: Dict[Hashable, Tuple[str, ...]] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def add(self, doc_id: Hashable, text: str) -> None:
+        """Index a document (replacing an earlier version with the same id)."""
+        if doc_id in self.doc_lengths:
+            self.remove(doc_id)
+        tokens = tokenize(text)
+        counts = Counter(tokens)
+        for token, tf in counts.items():
+            self.postings.setdefault(token, {})[doc_id] = tf
+        self.doc_lengths[doc_id] = len(tokens)
+        self.doc_tokens[doc_id] = tuple(counts)
+        self.total_length += len(tokens)
+
+    def remove(self, doc_id: Hashable) -> None:
+        for token in self.doc_tokens.pop(doc_id, ()):
+            docs = self.postings.get(token)
+            if docs is not None:
+                docs.pop(doc_id, None)
+                if not docs:
+                    del self.postings[token]
+        self.total_length -= self.doc_lengths.pop(doc_id, 0)
+
+    def search(self, query: str, limit: int = 10, min_score: float = 0.0) -> List[Tuple[Hashable, float]]:
+        """
+        Returns:
+            [(doc_id, score)] best first, only scores >= min_score
+        """
+        n_docs = len(self.doc_lengths)
+        if not n_docs:
+            return []
+        avg_length = self.total_length / n_docs or 1.0
+        scores: Dict[Hashable, float] = {}
+        for token in set(tokenize(query)):
+            docs = self.postings.get(token)
+            if not docs:
+                continue
+            idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc_id, tf in docs.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return [(doc_id, score) for doc_id, score in ranked[:limit] if score >= min_score]
+
+
+def reciprocal_rank_fusion(
+    ranked_lists: Sequence[Sequence[Dict[str, Any]]],
+    key: Callable[[Dict[str, Any]], Hashable],
+    limit: int,
+    k: int = 60,
+) -> List[Dict[str, Any]]:
+    """
+    Merge rankings by RRF: score(row) = sum over lists of 1 / (k + rank).
+
+    The first occurrence of a row is kept (list order decides ties, so pass the
+    vector rows first); each returned row gets an "rrf_score".
+    """
+    fused: Dict[Hashable, Dict[str, Any]] = {}
+    scores: Dict[Hashable, float] = {}
+    for rows in ranked_lists:
+        for rank, row in enumerate(rows or [], start=1):
+            row_key = key(row)
+            fused.setdefault(row_key, row)
+            scores[row_key] = scores.get(row_key, 0.0) + 1.0 / (k + rank)
+    ordered = sorted(fused, key=lambda row_key: scores[row_key], reverse=True)[:limit]
+    return [dict(fused[row_key], rrf_score=scores[row_key]) for row_key in ordered]
+
+
+class LexicalKBIndex:
+    """
+    BM25 indexes for sakhi_sections and sakhi_faq, with rows shaped like the
+    hierarchical_search / match_faq RPC results.
+    """
+
+    def __init__(self, min_score: float = 2.0, refresh_seconds: float = 300.0):
+        """
+        Args:
+            min_score: Minimum BM25 score of a lexical hit (filters matches on common words only)
+            refresh_seconds: Minimum age before an incremental refresh is started
+        """
+        self.min_score = min_score
+        self.refresh_seconds = refresh_seconds
+        self.sections = BM25()
+        self.faq = BM25()
+        self._section_rows: Dict[int, Dict[str, Any]] = {}
+        self._faq_rows: Dict[int, Dict[str, Any]] = {}
+        self._max_ids = {"sakhi_sections": 0, "sakhi_faq": 0}
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self.refreshed_at = 0.0
+        self.kb_version = ""
+
+    def refresh(self, full: bool = False) -> Dict[str, int]:
+        """
+        Index rows added since the last refresh (everything when full=True or
+        the KB version changed).
+
+        Returns:
+            Number of new rows per table
+        """
+        version = read_kb_version()
+        if version is None:
+            version = self.kb_version  # unknown: keep the last known version
+        full = full or version != self.kb_version
+        max_ids = {table: 0 for table in self._max_ids} if full else dict(self._max_ids)
+        sections = fetch_rows_since("sakhi_sections", "id,header_path,content", max_ids["sakhi_sections"])
+        faqs = fetch_rows_since("sakhi_faq", "id,question,answer,youtube_link,infographic_url", max_ids["sakhi_faq"])
+
+        if full:
+            # Build aside and swap, so searches keep using the old index meanwhile
+            section_index, faq_index, section_rows, faq_rows = BM25(), BM25(), {}, {}
+            self._index_rows(section_index, faq_index, section_rows, faq_rows, sections, faqs)
+            with self._lock:
+                self.sections, self.faq = section_index, faq_index
+                self._section_rows, self._faq_rows = section_rows, faq_rows
+        else:
+            with self._lock:
+                self._index_rows(self.sections, self.faq, self._section_rows, self._faq_rows, sections, faqs)
+
+        for table, rows in (("sakhi_sections", sections), ("sakhi_faq", faqs)):
+            if rows:
+                max_ids[table] = rows[-1]["id"]
+        self._max_ids = max_ids
+        self.kb_version = version
+        self.refreshed_at = time.time()
+
+        added = {"sections": len(sections), "faq": len(faqs)}
+        logger.info(f"BM25 index {'built' if full else 'refreshed'}: +{added} -> {self.stats()}")
+        return added
+
+    @staticmethod
+    def _index_rows(section_index: BM25, faq_index: BM25, section_rows: Dict[int, Dict[str, Any]],
+                    faq_rows: Dict[int, Dict[str, Any]], sections: List[Dict[str, Any]], faqs: List[Dict[str, Any]]) -> None:
+        for row in sections:
+            header_path, content = row.get("header_path") or "", row.get("content") or ""
+            section_index.add(row["id"], f"{header_path} {content}")
+            section_rows[row["id"]] = {"section_content": content, "header_path": header_path}
+        for row in faqs:
+            faq_index.add(row["id"], row.get("question") or "")
+            faq_rows[row["id"]] = row
+
+    def maybe_refresh(self) -> None:
+        """Start a background incremental refresh if the index is older than refresh_seconds."""
+        if self._refreshing or time.time() - self.refreshed_at < self.refresh_seconds:
+            return
+        self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning(f"BM25 index refresh failed: {e}")
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name="bm25-index-refresh", daemon=True).start()
+
+    def search_sections(self, query: str, limit: int = 4) -> List[Dict[str, Any]]:
+        """hierarchical_search-shaped rows for the best lexical matches (similarity 0.0 = no vector score)."""
+        with self._lock:
+            hits = self.sections.search(query, limit, self.min_score)
+            return [dict(self._section_rows[doc_id], similarity=0.0, bm25_score=score) for doc_id, score in hits]
+
+    def search_faq(self, query: str, limit: int = 1) -> List[Dict[str, Any]]:
+        """match_faq-shaped rows for the best lexical matches on the FAQ question."""
+        with self._lock:
+            hits = self.faq.search(query, limit, self.min_score)
+            return [dict(self._faq_rows[doc_id], similarity=0.0, bm25_score=score) for doc_id, score in hits]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"sections": len(self.sections), "faq": len(self.faq), "terms": len(self.sections.postings)}
+
+
+# Module-level singleton instance
+_index_instance = None
+_index_failed = False
+
+
+def get_lexical_index() -> Optional[LexicalKBIndex]:
+    """
+    Get the process-wide LexicalKBIndex (built on first use), or None when
+    RAG_HYBRID_ENABLED is not set or the initial build failed.
+    """
+    global _index_instance, _index_failed
+    if os.getenv("RAG_HYBRID_ENABLED", "false").lower() not in ("1", "true", "yes") or _index_failed:
+        return None
+    if _index_instance is None:
+        index = LexicalKBIndex(
+            min_score=float(os.getenv("RAG_BM25_MIN_SCORE", "2.0")),
+            refresh_seconds=float(os.getenv("RAG_BM25_REFRESH_SECONDS", "300")),
+        )
+        try:
+            index.refresh(full=True)
+        except Exception as e:
+            logger.warning(f"Hybrid retrieval disabled, BM25 index build failed: {e}")
+            _index_failed = True
+            return None
+        _index_instance = index
+    return _index_instance
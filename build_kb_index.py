@@ -0,0 +1,51 @@
+# build_kb_index.py
+"""
+Build the memory-mapped KB index artifact (artifacts/kb_index/<version>/).
+
+Fetches sakhi_sections / sakhi_section_chunks / sakhi_faq once, writes the
+normalized vectors, the chunk -> section map and the section / FAQ texts as
+flat .npy/.bin files and points artifacts/kb_index/CURRENT at them. With
+KB_INDEX_ENABLED=true every uvicorn worker maps these files read-only
+(kb_index.py), so the index is held once per host instead of once per worker.
+
+Run after every ingestion, before building the Docker image:
+
+Usage:
+    python build_kb_index.py
+    python build_kb_index.py --quantize            # int8 vectors (4x smaller)
+    python build_kb_index.py --output-dir /data/kb_index --keep 3
+Requires:
+    - .env with Supabase credentials
+"""
+
+import argparse
+import os
+
+from kb_index import DEFAULT_ARTIFACT_DIR, KBIndex
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the memory-mapped KB index artifact")
+    parser.add_argument("--output-dir", default=os.getenv("KB_INDEX_ARTIFACT_DIR", DEFAULT_ARTIFACT_DIR))
+    parser.add_argument("--quantize", action="store_true", help="Store int8 vectors with per-row scales")
+    parser.add_argument("--keep", type=int, default=2, help="Artifact versions to keep (including the new one)")
+    args = parser.parse_args()
+
+    index = KBIndex(quantize=args.quantize)
+    try:
+        index.refresh(full=True)
+    except Exception as e:
+        print(f"❌ Failed to load the KB from Supabase: {e}")
+        return
+
+    path = index.write_artifact(args.output_dir, keep=max(1, args.keep))
+    print(f"✅ Wrote {path}: {index.stats()}")
+
+    # Sanity check: the mapped copy answers like the in-memory one
+    mapped = KBIndex()
+    mapped.load_artifact(args.output_dir)
+    print(f"✅ Mapped back: {mapped.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# embedding_batcher.py
+"""
+Cross-request micro-batcher for embedding calls.
+
+Concurrent single-text embedding requests (from different chat requests on
+the same worker) are held for a few milliseconds and sent to OpenAI as one
+batched `embeddings.create` call. Each caller gets back its own vector.
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+EmbedBatchFn = Callable[[List[str]], Awaitable[List[List[float]]]]
+
+
+class EmbeddingBatcher:
+    """
+    Collects `embed()` calls for up to `window_ms` (or until `max_batch_size`
+    texts are waiting) and resolves them all from a single batched call.
+    """
+
+    def __init__(self, embed_batch: EmbedBatchFn, window_ms: float = 5.0, max_batch_size: int = 256):
+        """
+        Args:
+            embed_batch: Coroutine function embedding a list of texts, preserving order
+            window_ms: How long the first queued text waits for companions
+            max_batch_size: Flush immediately once this many texts are waiting
+        """
+        self._embed_batch = embed_batch
+        self.window = max(0.0, window_ms) / 1000.0
+        self.max_batch_size = max(1, max_batch_size)
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches_sent = 0
+        self.texts_sent = 0
+
+    async def embed(self, text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Batches never span event loops (e.g. separate test runs)
+            self._loop = loop
+            self._pending = []
+            self._timer = None
+
+        future = loop.create_future()
+        self._pending.append((text, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = self._loop.create_task(self._run_batch(batch))
+            # Keep a reference until done so the task is not garbage-collected
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        # Identical texts inside one window are embedded once
+        unique_texts: List[str] = []
+        index_of: Dict[str, int] = {}
+        for text, _ in batch:
+            if text not in index_of:
+                index_of[text] = len(unique_texts)
+                unique_texts.append(text)
+
+        try:
+            vectors = await self._embed_batch(unique_texts)
+        except Exception as e:
+            logger.warning(f"Batched embedding call failed for {len(unique_texts)} texts: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches_sent += 1
+        self.texts_sent += len(unique_texts)
+        if len(batch) > 1:
+            logger.info(f"Embedding batch: {len(batch)} requests -> {len(unique_texts)} inputs in one call")
+
+        for text, future in batch:
+            if not future.done():
+                future.set_result(vectors[index_of[text]])
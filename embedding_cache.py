@@ -0,0 +1,234 @@
+# embedding_cache.py
+"""
+Two-tier cache for OpenAI embeddings.
+
+- Memory tier: bounded LRU (OrderedDict) per process.
+- Disk tier: local SQLite file that survives restarts and is shared by all
+  workers on the same host (WAL mode, float32 blobs).
+
+Keys are a SHA-256 of the embedding model name plus the normalized text
+(whitespace collapsed, case-folded), so "Hi " and "hi" share one entry.
+
+Async callers use get_many_async / put_many(write_behind=True): only the
+memory tier is touched on the event loop, SQLite reads run in a worker thread
+and SQLite writes are handed to a background writer thread.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "embeddings.sqlite3")
+DEFAULT_MEMORY_ITEMS = 10000
+
+
+def normalize_text(text: str) -> str:
+    return " ".join((text or "").split()).casefold()
+
+
+def cache_key(text: str, model: str) -> str:
+    return hashlib.sha256(f"{model}\x00{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Thread-safe LRU + SQLite embedding cache.
+    """
+
+    def __init__(self, path: Optional[str] = DEFAULT_CACHE_PATH, max_memory_items: int = DEFAULT_MEMORY_ITEMS):
+        """
+        Args:
+            path: SQLite file for the persistent tier (None or "" disables it)
+            max_memory_items: Maximum number of vectors kept in the memory tier
+        """
+        self.max_memory_items = max(0, max_memory_items)
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()  # memory tier and counters
+        self._db_lock = threading.Lock()  # SQLite connection
+        self._db: Optional[sqlite3.Connection] = None
+        self._writes: "queue.Queue[list]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self.hits = 0
+        self.misses = 0
+
+        if path:
+            try:
+                directory = os.path.dirname(path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._db = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute("PRAGMA synchronous=NORMAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS embeddings ("
+                    " key TEXT PRIMARY KEY,"
+                    " model TEXT NOT NULL,"
+                    " vector BLOB NOT NULL,"
+                    " created_at REAL NOT NULL)"
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Embedding cache disk tier disabled ({path}): {e}")
+                self._db = None
+
+    def get(self, text: str, model: str) -> Optional[List[float]]:
+        return self.get_many([text], model)[0]
+
+    def get_many(self, texts: Sequence[str], model: str) -> List[Optional[List[float]]]:
+        """
+        Look up several texts at once. Returns one vector (or None on miss) per input.
+        Blocks on SQLite for memory misses; use get_many_async on the event loop.
+        """
+        keys = [cache_key(t, model) for t in texts]
+        found, missing = self._memory_lookup(keys)
+        if missing and self._db is not None:
+            self._merge_disk_rows(found, self._disk_lookup(missing))
+        return self._count(keys, found)
+
+    async def get_many_async(self, texts: Sequence[str], model: str) -> List[Optional[List[float]]]:
+        """
+        get_many for the event loop: the memory tier is read inline, the SQLite
+        tier (memory misses only) in a worker thread.
+        """
+        keys = [cache_key(t, model) for t in texts]
+        found, missing = self._memory_lookup(keys)
+        if missing and self._db is not None:
+            self._merge_disk_rows(found, await asyncio.to_thread(self._disk_lookup, missing))
+        return self._count(keys, found)
+
+    def _memory_lookup(self, keys: Sequence[str]):
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+        return found, [k for k in set(keys) if k not in found]
+
+    def _disk_lookup(self, keys: List[str]) -> list:
+        try:
+            with self._db_lock:
+                placeholders = ",".join("?" * len(keys))
+                return self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", keys
+                ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Embedding cache read failed: {e}")
+            return []
+
+    def _merge_disk_rows(self, found: Dict[str, List[float]], rows: list) -> None:
+        with self._lock:
+            for key, blob in rows:
+                vector = array("f", blob).tolist()
+                found[key] = vector
+                self._remember(key, vector)
+
+    def _count(self, keys: Sequence[str], found: Dict[str, List[float]]) -> List[Optional[List[float]]]:
+        results = [found.get(k) for k in keys]
+        hit_count = sum(1 for r in results if r is not None)
+        with self._lock:
+            self.hits += hit_count
+            self.misses += len(results) - hit_count
+        return results
+
+    def put(self, text: str, model: str, vector: Sequence[float], write_behind: bool = False) -> None:
+        self.put_many([text], model, [vector], write_behind=write_behind)
+
+    def put_many(
+        self,
+        texts: Sequence[str],
+        model: str,
+        vectors: Sequence[Sequence[float]],
+        write_behind: bool = False,
+    ) -> None:
+        """
+        Store vectors in both tiers. With write_behind=True (event loop callers)
+        the SQLite write is queued for the background writer thread instead.
+        """
+        rows = []
+        now = time.time()
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = cache_key(text, model)
+                self._remember(key, list(vector))
+                rows.append((key, model, array("f", vector).tobytes(), now))
+
+        if not rows or self._db is None:
+            return
+        if write_behind:
+            self._ensure_writer()
+            self._writes.put(rows)
+        else:
+            self._disk_write(rows)
+
+    def _disk_write(self, rows: list) -> None:
+        try:
+            with self._db_lock:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, model, vector, created_at) VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+                self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Embedding cache write failed: {e}")
+
+    def _ensure_writer(self) -> None:
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="embedding-cache-writer", daemon=True)
+                self._writer.start()
+
+    def _write_loop(self) -> None:
+        while True:
+            rows = self._writes.get()
+            # Merge whatever else is waiting into one transaction
+            while not self._writes.empty():
+                rows.extend(self._writes.get_nowait())
+            self._disk_write(rows)
+
+    def _remember(self, key: str, vector: List[float]) -> None:
+        if self.max_memory_items == 0:
+            return
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "memory_items": len(self._memory),
+            "pending_writes": self._writes.qsize(),
+        }
+
+
+# Module-level singleton instance
+_cache_instance = None
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """
+    Get or create the process-wide EmbeddingCache.
+
+    Configured with EMBEDDING_CACHE_PATH (empty string disables the disk tier)
+    and EMBEDDING_CACHE_MEMORY_ITEMS.
+    """
+    global _cache_instance
+    if _cache_instance is None:
+        _cache_instance = EmbeddingCache(
+            path=os.getenv("EMBEDDING_CACHE_PATH", DEFAULT_CACHE_PATH),
+            max_memory_items=int(os.getenv("EMBEDDING_CACHE_MEMORY_ITEMS", DEFAULT_MEMORY_ITEMS)),
+        )
+    return _cache_instance
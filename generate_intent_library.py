@@ -0,0 +1,98 @@
+# generate_intent_library.py
+"""
+Refresh the pre-generated intent library (intent_library.json) offline.
+
+For every (route, topic) known to ModelGateway, asks gpt-4o-mini for a few
+variants of the curated English sentence in each supported language. The
+chat API only reads the resulting file (modules/intent_engine.py).
+
+Usage:
+    python generate_intent_library.py                  # 5 variants per key, all languages
+    python generate_intent_library.py --variants 3
+    python generate_intent_library.py --seed-only      # curated English sentences, no LLM calls
+Requires:
+    - .env with OPENAI_API_KEY (not needed with --seed-only)
+"""
+
+import argparse
+import json
+import os
+import time
+
+from openai import OpenAI
+
+from modules.intent_engine import FALLBACK_LANGUAGE, INTENT_LANGUAGES, INTENT_LIBRARY_PATH, seed_library
+from modules.model_gateway import get_model_gateway
+from modules.response_builder import INTENT_GENERATOR_PROMPT, INTENT_LANGUAGE_INSTRUCTIONS
+
+
+def generate_variants(client: OpenAI, seed: str, route: str, topic: str, language: str, count: int) -> list[str]:
+    """
+    Ask the model for `count` variants of one curated intent sentence.
+    """
+    completion = client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "system", "content": INTENT_GENERATOR_PROMPT},
+            {
+                "role": "user",
+                "content": (
+                    f"Route: {route}\nTopic: {topic}\n"
+                    f"Reference sentence: {seed}\n\n"
+                    f"Write {count} different intent sentences with the same meaning and tone as the reference. "
+                    f"{INTENT_LANGUAGE_INSTRUCTIONS[language]}\n"
+                    'Respond ONLY with JSON: {"intents": ["...", "..."]}'
+                ),
+            },
+        ],
+        temperature=0.7,
+        response_format={"type": "json_object"},
+    )
+    data = json.loads(completion.choices[0].message.content)
+    variants = [str(v).strip().strip('"\'') for v in data.get("intents", []) if str(v).strip()]
+    return variants[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate intent_library.json")
+    parser.add_argument("--output", default=INTENT_LIBRARY_PATH)
+    parser.add_argument("--variants", type=int, default=5, help="Sentences per (route, topic, language)")
+    parser.add_argument("--languages", nargs="+", default=list(INTENT_LANGUAGES), choices=list(INTENT_LANGUAGES))
+    parser.add_argument("--seed-only", action="store_true", help="Write the curated English sentences only")
+    args = parser.parse_args()
+
+    library = seed_library(get_model_gateway())
+
+    if not args.seed_only:
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            print("OPENAI_API_KEY missing. Use --seed-only to write the curated sentences.")
+            return
+        client = OpenAI(api_key=api_key)
+
+        for route, topics in library.items():
+            for topic, by_language in topics.items():
+                seed = by_language[FALLBACK_LANGUAGE][0]
+                for language in args.languages:
+                    try:
+                        variants = generate_variants(client, seed, route, topic, language, args.variants)
+                    except Exception as e:
+                        print(f"❌ {route}/{topic}/{language}: {e}")
+                        continue
+                    if language == FALLBACK_LANGUAGE:
+                        # Keep the curated sentence as the first English variant
+                        variants = [seed] + [v for v in variants if v != seed]
+                    if variants:
+                        by_language[language] = variants
+                        print(f"✅ {route}/{topic}/{language}: {len(variants)} variants")
+
+    payload = {"version": time.strftime("%Y%m%d%H%M%S"), "intents": library}
+    tmp_path = f"{args.output}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, args.output)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+-- Combined retrieval RPC: hierarchical sections + best FAQ row in one call
+-- Requires setup_hierarchical_rag.sql (hierarchical_search) and update_faq_rpc.sql (match_faq).
+-- The query embedding is sent (and parsed) once instead of once per RPC.
+-- Apply add_vector_indexes.sql for the indexed, similarity-ordered versions of both functions.
+
+create or replace function hierarchical_search_with_faq (
+  query_embedding vector(1536),
+  match_threshold float,
+  match_count int,
+  faq_match_count int default 1
+)
+returns table (
+  source_type text,      -- 'DOCUMENT' or 'FAQ'
+  section_content text,  -- DOCUMENT rows
+  header_path text,      -- DOCUMENT rows
+  id int,                -- FAQ rows
+  question text,         -- FAQ rows
+  answer text,           -- FAQ rows
+  youtube_link text,     -- FAQ rows
+  infographic_url text,  -- FAQ rows
+  similarity float
+)
+language sql
+stable
+as $$
+  select
+    'DOCUMENT'::text,
+    docs.section_content,
+    docs.header_path,
+    null::int,
+    null::text,
+    null::text,
+    null::text,
+    null::text,
+    docs.similarity
+  from hierarchical_search(query_embedding, match_threshold, match_count) as docs
+  union all
+  select
+    'FAQ'::text,
+    null::text,
+    null::text,
+    faq.id,
+    faq.question,
+    faq.answer,
+    faq.youtube_link,
+    faq.infographic_url,
+    faq.similarity
+  from match_faq(query_embedding, faq_match_count) as faq;
+$$;
@@ -5,6 +5,7 @@ from typing import List, Dict, Any
 # Import from existing modules
 from supabase_client import supabase_insert
 from rag import generate_embedding
+from modules.answer_cache import bump_kb_version
 
 def parse_hierarchical_text(raw_text: str) -> List[Dict[str, Any]]:
     """
@@ -131,6 +132,9 @@ def ingest_to_supabase(sections: List[Dict[str, Any]]):
             # Optional: sleep to avoid rate limits if needed
             # time.sleep(0.5)
 
+    # Invalidate cached answers built from the previous KB
+    print(f"KB version: {bump_kb_version()}")
+
 import sys
 import os
 try:
@@ -7,6 +7,7 @@ from typing import List, Dict, Any
 try:
     from supabase_client import supabase_insert
     from rag import generate_embedding
+    from modules.answer_cache import bump_kb_version
 except ImportError:
     print("Error: Could not import 'supabase_client' or 'rag'. Ensure these files exist.")
     exit(1)
@@ -111,6 +112,8 @@ def ingest_json_file(file_path: str):
             process_node(node, [])
             
         print("\n--- Ingestion Complete ---")
+        # Invalidate cached answers built from the previous KB
+        print(f"KB version: {bump_kb_version()}")
         
     except FileNotFoundError:
         print("Error: File not found.")
@@ -0,0 +1,549 @@
+# kb_index.py
+"""
+In-process mirror of the retrieval tables for hierarchical_rag_query.
+
+Loads sakhi_section_chunks / sakhi_sections / sakhi_faq into memory as
+pre-normalized float32 (or int8-quantized) matrices and answers the same
+questions as the hierarchical_search and match_faq RPCs with one numpy
+matmul each, without a network round trip.
+
+- Enabled with KB_INDEX_ENABLED=true (KB_INDEX_QUANTIZE=true for int8).
+- Refreshes incrementally: only rows with ids above the last seen id are
+  fetched, every KB_INDEX_REFRESH_SECONDS, in a background thread. A KB
+  version bump (see modules/answer_cache.bump_kb_version) forces a full reload.
+- With a prebuilt artifact (build_kb_index.py) under KB_INDEX_ARTIFACT_DIR,
+  the index is memory-mapped read-only instead of fetched: every uvicorn
+  worker maps the same files, so the vectors and section texts exist once in
+  the page cache however many workers run. Such an index is refreshed by
+  building a new artifact; workers switch to it when the CURRENT pointer changes.
+"""
+
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from modules.answer_cache import read_kb_version
+from supabase_client import supabase_select
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 1000  # PostgREST default max rows per request
+FAQ_MATCH_THRESHOLD = 0.5  # same threshold as match_faq (add_vector_indexes.sql)
+DEFAULT_ARTIFACT_DIR = os.path.join("artifacts", "kb_index")
+ARTIFACT_POINTER = "CURRENT"  # file naming the active version directory
+FAQ_TEXT_FIELDS = ("question", "answer", "youtube_link", "infographic_url")
+SCORE_BLOCK_ROWS = 128  # int8 rows converted per step (128 x 1536 float32 = 768 KB)
+
+
+def fetch_rows_since(table: str, select: str, last_id: int = 0) -> List[Dict[str, Any]]:
+    """All rows of `table` with id > last_id, in id order (paged)."""
+    rows: List[Dict[str, Any]] = []
+    while True:
+        page = supabase_select(
+            table,
+            select=select,
+            filters=f"id=gt.{last_id}&order=id.asc",
+            limit=PAGE_SIZE,
+        )
+        if not page:
+            break
+        rows.extend(page)
+        last_id = page[-1]["id"]
+        if len(page) < PAGE_SIZE:
+            break
+    return rows
+
+
+def parse_vector(value: Any) -> Optional[np.ndarray]:
+    """pgvector columns arrive from PostgREST as '[0.1,0.2,...]' strings."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = json.loads(value)
+    return np.asarray(value, dtype=np.float32)
+
+
+def encode_vectors(vectors: np.ndarray, quantize: bool) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    L2-normalize rows; optionally quantize them to int8 with one scale per row.
+
+    Returns:
+        (matrix, scales); scales is None for float32 matrices
+    """
+    if vectors.size == 0:
+        return vectors.astype(np.float32), (np.zeros(0, dtype=np.float32) if quantize else None)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    normalized = (vectors / np.maximum(norms, 1e-12)).astype(np.float32)
+    if not quantize:
+        return normalized, None
+    scales = np.abs(normalized).max(axis=1) / 127.0
+    scales = np.maximum(scales, 1e-12).astype(np.float32)
+    quantized = np.round(normalized / scales[:, None]).astype(np.int8)
+    return quantized, scales
+
+
+def cosine_scores(matrix: np.ndarray, scales: Optional[np.ndarray], query: np.ndarray) -> np.ndarray:
+    """
+    Cosine similarity of a normalized query against every row.
+
+    int8 matrices are scored SCORE_BLOCK_ROWS rows at a time through one small
+    float32 buffer that stays in cache; `matrix @ query` on int8 would convert
+    the whole matrix to floating point on every query.
+    """
+    if matrix.shape[0] == 0:
+        return np.zeros(0, dtype=np.float32)
+    if scales is None:
+        return matrix @ query
+    rows = matrix.shape[0]
+    scores = np.empty(rows, dtype=np.float32)
+    block = np.empty((min(SCORE_BLOCK_ROWS, rows), matrix.shape[1]), dtype=np.float32)
+    for start in range(0, rows, SCORE_BLOCK_ROWS):
+        end = min(start + SCORE_BLOCK_ROWS, rows)
+        buffer = block[: end - start]
+        np.copyto(buffer, matrix[start:end], casting="unsafe")
+        np.matmul(buffer, query, out=scores[start:end])
+    np.multiply(scores, scales, out=scores)
+    return scores
+
+
+def read_artifact_version(root: str = DEFAULT_ARTIFACT_DIR) -> str:
+    """Version named by root/CURRENT ("" when no artifact was built)."""
+    try:
+        with open(os.path.join(root, ARTIFACT_POINTER), "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+class _Snapshot:
+    """Immutable set of arrays; searches use one snapshot, refreshes swap in a new one."""
+
+    def __init__(self):
+        self.chunk_matrix = np.zeros((0, 0), dtype=np.float32)
+        self.chunk_scales: Optional[np.ndarray] = None
+        self.chunk_section_ids = np.zeros(0, dtype=np.int64)
+        self.sections: Dict[int, Tuple[str, str]] = {}  # id -> (header_path, content)
+        self.faq_matrix = np.zeros((0, 0), dtype=np.float32)
+        self.faq_scales: Optional[np.ndarray] = None
+        self.faq_rows: List[Dict[str, Any]] = []
+
+
+class StringTable:
+    """
+    Read-only list of strings stored as one UTF-8 blob plus int64 offsets.
+    Both files are memory-mapped; a string is decoded only when accessed.
+    """
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    @staticmethod
+    def write(directory: str, name: str, values: Sequence[Optional[str]]) -> None:
+        encoded = [(v or "").encode("utf-8") for v in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(b) for b in encoded], dtype=np.int64)
+        with open(os.path.join(directory, f"{name}.bin"), "wb") as f:
+            f.write(b"".join(encoded))
+        np.save(os.path.join(directory, f"{name}_offsets.npy"), offsets)
+
+    @classmethod
+    def load(cls, directory: str, name: str) -> "StringTable":
+        offsets = np.load(os.path.join(directory, f"{name}_offsets.npy"), mmap_mode="r")
+        blob_path = os.path.join(directory, f"{name}.bin")
+        # np.memmap cannot map an empty file
+        blob = np.memmap(blob_path, dtype=np.uint8, mode="r") if offsets[-1] else np.zeros(0, dtype=np.uint8)
+        return cls(blob, offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return bytes(self.blob[start:end]).decode("utf-8")
+
+
+class _MappedSections:
+    """sections mapping (id -> (header_path, content)) backed by an artifact."""
+
+    def __init__(self, ids: np.ndarray, header_paths: StringTable, contents: StringTable):
+        self.ids = ids  # sorted
+        self.header_paths = header_paths
+        self.contents = contents
+
+    def _position(self, section_id: int) -> int:
+        i = int(np.searchsorted(self.ids, section_id))
+        return i if i < len(self.ids) and int(self.ids[i]) == section_id else -1
+
+    def __contains__(self, section_id: int) -> bool:
+        return self._position(section_id) >= 0
+
+    def __getitem__(self, section_id: int) -> Tuple[str, str]:
+        i = self._position(section_id)
+        if i < 0:
+            raise KeyError(section_id)
+        return self.header_paths[i], self.contents[i]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+class _MappedFaqRows:
+    """faq_rows list backed by an artifact; rows are built on access."""
+
+    def __init__(self, ids: np.ndarray, fields: Dict[str, StringTable]):
+        self.ids = ids
+        self.fields = fields
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        row: Dict[str, Any] = {"id": int(self.ids[i])}
+        for name, table in self.fields.items():
+            row[name] = table[i] or None
+        return row
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+class KBIndex:
+    """
+    In-memory retrieval index with the same result shapes as the Supabase RPCs.
+    """
+
+    def __init__(self, quantize: bool = False, refresh_seconds: float = 300.0):
+        """
+        Args:
+            quantize: Store vectors as int8 (4x smaller, ~1e-3 similarity error)
+            refresh_seconds: Minimum age before an incremental refresh is started
+        """
+        self.quantize = quantize
+        self.refresh_seconds = refresh_seconds
+        self._snapshot = _Snapshot()
+        self._max_ids = {"sakhi_sections": 0, "sakhi_section_chunks": 0, "sakhi_faq": 0}
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self.refreshed_at = 0.0
+        self.kb_version = ""
+        self.artifact_root: Optional[str] = None  # set when serving a memory-mapped artifact
+        self.artifact_version = ""
+        self._pointer_mtime = 0.0
+
+    # ---------- loading ----------
+
+    def _fetch_new_rows(self, table: str, select: str) -> List[Dict[str, Any]]:
+        return fetch_rows_since(table, select, self._max_ids[table])
+
+    def refresh(self, full: bool = False) -> Dict[str, int]:
+        """
+        Fetch rows added since the last refresh (or everything when full=True)
+        and swap in a new snapshot.
+
+        Returns:
+            Number of new rows per table
+        """
+        with self._lock:
+            version = read_kb_version()
+            if version is not None and version != self.kb_version:
+                # Re-ingestion may have replaced rows, not just appended
+                full = True
+                self.kb_version = version
+            if full:
+                self._max_ids = {table: 0 for table in self._max_ids}
+                base = _Snapshot()
+            else:
+                base = self._snapshot
+
+            sections = self._fetch_new_rows("sakhi_sections", "id,header_path,content")
+            chunks = self._fetch_new_rows("sakhi_section_chunks", "id,section_id,embedding")
+            faqs = self._fetch_new_rows(
+                "sakhi_faq", "id,question,answer,youtube_link,infographic_url,question_vector"
+            )
+
+            snapshot = _Snapshot()
+            snapshot.sections = dict(base.sections)
+            for row in sections:
+                snapshot.sections[row["id"]] = (row.get("header_path") or "", row.get("content") or "")
+
+            chunk_items = [(parse_vector(r.get("embedding")), r["section_id"]) for r in chunks]
+            chunk_items = [(v, section_id) for v, section_id in chunk_items if v is not None]
+            snapshot.chunk_matrix, snapshot.chunk_scales = self._append(
+                base.chunk_matrix, base.chunk_scales, [v for v, _ in chunk_items]
+            )
+            snapshot.chunk_section_ids = np.concatenate([
+                base.chunk_section_ids, np.asarray([s for _, s in chunk_items], dtype=np.int64)
+            ])
+
+            faq_items = [(parse_vector(r.pop("question_vector", None)), r) for r in faqs]
+            faq_items = [(v, r) for v, r in faq_items if v is not None]
+            snapshot.faq_matrix, snapshot.faq_scales = self._append(
+                base.faq_matrix, base.faq_scales, [v for v, _ in faq_items]
+            )
+            snapshot.faq_rows = list(base.faq_rows) + [r for _, r in faq_items]
+
+            for table, rows in (("sakhi_sections", sections), ("sakhi_section_chunks", chunks), ("sakhi_faq", faqs)):
+                if rows:
+                    self._max_ids[table] = rows[-1]["id"]
+            self._snapshot = snapshot
+            self.refreshed_at = time.time()
+
+        added = {"sections": len(sections), "chunks": len(chunks), "faq": len(faqs)}
+        logger.info(f"KB index {'loaded' if full else 'refreshed'}: +{added} -> {self.stats()}")
+        return added
+
+    def _append(
+        self, matrix: np.ndarray, scales: Optional[np.ndarray], vectors: List[np.ndarray]
+    ) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Encode new vectors and append them to a (possibly empty) matrix."""
+        if not vectors:
+            return matrix, scales
+        new_matrix, new_scales = encode_vectors(np.vstack(vectors), self.quantize)
+        if matrix.shape[0] == 0:
+            return new_matrix, new_scales
+        return (
+            np.vstack([matrix, new_matrix]),
+            np.concatenate([scales, new_scales]) if new_scales is not None else None,
+        )
+
+    def maybe_refresh(self) -> None:
+        """Start a background incremental refresh if the index is older than refresh_seconds."""
+        if self.artifact_root:
+            # Appending to the mapped arrays would copy them into every worker;
+            # pick up a newly built artifact instead
+            self._maybe_switch_artifact()
+            return
+        if self._refreshing or time.time() - self.refreshed_at < self.refresh_seconds:
+            return
+        self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning(f"KB index refresh failed: {e}")
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name="kb-index-refresh", daemon=True).start()
+
+    # ---------- memory-mapped artifact ----------
+
+    def write_artifact(self, root: str = DEFAULT_ARTIFACT_DIR, keep: int = 2) -> str:
+        """
+        Write the current snapshot as a new artifact version under `root` and
+        point root/CURRENT at it. Older versions beyond `keep` are removed
+        (workers that still map them keep valid mappings until they switch).
+
+        Returns:
+            Path of the new version directory
+        """
+        snapshot = self._snapshot
+        version = time.strftime("%Y%m%d%H%M%S")
+        directory = os.path.join(root, version)
+        tmp_directory = f"{directory}.tmp"
+        if os.path.isdir(tmp_directory):
+            shutil.rmtree(tmp_directory)
+        os.makedirs(tmp_directory)
+
+        np.save(os.path.join(tmp_directory, "chunk_vectors.npy"), snapshot.chunk_matrix)
+        np.save(os.path.join(tmp_directory, "chunk_section_ids.npy"), snapshot.chunk_section_ids)
+        np.save(os.path.join(tmp_directory, "faq_vectors.npy"), snapshot.faq_matrix)
+        for name, scales in (("chunk_scales.npy", snapshot.chunk_scales), ("faq_scales.npy", snapshot.faq_scales)):
+            if scales is not None:
+                np.save(os.path.join(tmp_directory, name), scales)
+
+        section_ids = sorted(snapshot.sections)
+        np.save(os.path.join(tmp_directory, "section_ids.npy"), np.asarray(section_ids, dtype=np.int64))
+        StringTable.write(tmp_directory, "section_header_paths", [snapshot.sections[i][0] for i in section_ids])
+        StringTable.write(tmp_directory, "section_contents", [snapshot.sections[i][1] for i in section_ids])
+
+        faq_rows = [snapshot.faq_rows[i] for i in range(len(snapshot.faq_rows))]
+        np.save(os.path.join(tmp_directory, "faq_ids.npy"), np.asarray([r["id"] for r in faq_rows], dtype=np.int64))
+        for name in FAQ_TEXT_FIELDS:
+            StringTable.write(tmp_directory, f"faq_{name}", [r.get(name) for r in faq_rows])
+
+        with open(os.path.join(tmp_directory, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump({"version": version, "kb_version": self.kb_version, "stats": self.stats()}, f, indent=2)
+
+        if os.path.isdir(directory):
+            shutil.rmtree(directory)
+        os.replace(tmp_directory, directory)
+        pointer = os.path.join(root, ARTIFACT_POINTER)
+        with open(f"{pointer}.tmp", "w", encoding="utf-8") as f:
+            f.write(version)
+        os.replace(f"{pointer}.tmp", pointer)
+
+        versions = sorted(d for d in os.listdir(root) if os.path.isdir(os.path.join(root, d)) and d != version)
+        for old in versions[:max(0, len(versions) - (keep - 1))]:
+            shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+        return directory
+
+    def load_artifact(self, root: str = DEFAULT_ARTIFACT_DIR) -> bool:
+        """
+        Memory-map the artifact named by root/CURRENT and serve searches from it.
+
+        Returns:
+            False when no artifact exists under root
+        """
+        version = read_artifact_version(root)
+        if not version:
+            return False
+        directory = os.path.join(root, version)
+
+        def mapped(name: str) -> np.ndarray:
+            return np.load(os.path.join(directory, name), mmap_mode="r")
+
+        def optional(name: str) -> Optional[np.ndarray]:
+            path = os.path.join(directory, name)
+            return np.load(path, mmap_mode="r") if os.path.exists(path) else None
+
+        with open(os.path.join(directory, "manifest.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        snapshot = _Snapshot()
+        snapshot.chunk_matrix = mapped("chunk_vectors.npy")
+        snapshot.chunk_scales = optional("chunk_scales.npy")
+        snapshot.chunk_section_ids = mapped("chunk_section_ids.npy")
+        snapshot.sections = _MappedSections(
+            mapped("section_ids.npy"),
+            StringTable.load(directory, "section_header_paths"),
+            StringTable.load(directory, "section_contents"),
+        )
+        snapshot.faq_matrix = mapped("faq_vectors.npy")
+        snapshot.faq_scales = optional("faq_scales.npy")
+        snapshot.faq_rows = _MappedFaqRows(
+            mapped("faq_ids.npy"),
+            {name: StringTable.load(directory, f"faq_{name}") for name in FAQ_TEXT_FIELDS},
+        )
+
+        with self._lock:
+            self._snapshot = snapshot
+            self.quantize = snapshot.chunk_scales is not None
+            self.kb_version = manifest.get("kb_version", "")
+            self.artifact_root = root
+            self.artifact_version = version
+            self._pointer_mtime = self._artifact_pointer_mtime()
+            self.refreshed_at = time.time()
+        logger.info(f"KB index mapped from {directory}: {self.stats()}")
+        return True
+
+    def _artifact_pointer_mtime(self) -> float:
+        try:
+            return os.stat(os.path.join(self.artifact_root, ARTIFACT_POINTER)).st_mtime
+        except OSError:
+            return 0.0
+
+    def _maybe_switch_artifact(self) -> None:
+        # One stat() per search; the pointer is only re-read when it changed
+        if self._artifact_pointer_mtime() == self._pointer_mtime:
+            return
+        try:
+            if read_artifact_version(self.artifact_root) != self.artifact_version:
+                self.load_artifact(self.artifact_root)
+            else:
+                self._pointer_mtime = self._artifact_pointer_mtime()
+        except Exception as e:
+            logger.warning(f"KB index artifact switch failed, keeping {self.artifact_version}: {e}")
+            self._pointer_mtime = self._artifact_pointer_mtime()
+
+    # ---------- search ----------
+
+    @staticmethod
+    def _normalize_query(query_vector: Sequence[float]) -> np.ndarray:
+        query = np.asarray(query_vector, dtype=np.float32)
+        return query / max(float(np.linalg.norm(query)), 1e-12)
+
+    def hierarchical_search(
+        self, query_vector: Sequence[float], match_threshold: float = 0.3, match_count: int = 4
+    ) -> List[Dict[str, Any]]:
+        """
+        Same rows as the hierarchical_search RPC: best chunk per parent section,
+        above the threshold, most similar sections first.
+        """
+        snapshot = self._snapshot
+        scores = cosine_scores(snapshot.chunk_matrix, snapshot.chunk_scales, self._normalize_query(query_vector))
+        candidates = np.flatnonzero(scores > match_threshold)
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+
+        results: List[Dict[str, Any]] = []
+        seen = set()
+        for i in candidates:
+            section_id = int(snapshot.chunk_section_ids[i])
+            if section_id in seen or section_id not in snapshot.sections:
+                continue
+            seen.add(section_id)
+            header_path, content = snapshot.sections[section_id]
+            results.append({
+                "section_content": content,
+                "header_path": header_path,
+                "similarity": float(scores[i]),
+            })
+            if len(results) >= match_count:
+                break
+        return results
+
+    def match_faq(self, query_vector: Sequence[float], match_count: int = 1) -> List[Dict[str, Any]]:
+        """Same rows as the match_faq RPC."""
+        snapshot = self._snapshot
+        scores = cosine_scores(snapshot.faq_matrix, snapshot.faq_scales, self._normalize_query(query_vector))
+        candidates = np.flatnonzero(scores > FAQ_MATCH_THRESHOLD)
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")][:match_count]
+        return [dict(snapshot.faq_rows[i], similarity=float(scores[i])) for i in candidates]
+
+    def search(
+        self, query_vector: Sequence[float], match_threshold: float = 0.3, match_count: int = 4, faq_match_count: int = 1
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """(hierarchical_search rows, match_faq rows) for one query."""
+        return (
+            self.hierarchical_search(query_vector, match_threshold, match_count),
+            self.match_faq(query_vector, faq_match_count),
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        nbytes = snapshot.chunk_matrix.nbytes + snapshot.faq_matrix.nbytes
+        return {
+            "sections": len(snapshot.sections),
+            "chunks": int(snapshot.chunk_matrix.shape[0]),
+            "faq": len(snapshot.faq_rows),
+            "dtype": str(snapshot.chunk_matrix.dtype),
+            "vector_mb": round(nbytes / 1e6, 2),
+            "artifact": self.artifact_version or None,
+        }
+
+
+# Module-level singleton instance
+_index_instance = None
+_index_failed = False
+
+
+def get_kb_index() -> Optional[KBIndex]:
+    """
+    Get the process-wide KBIndex (loaded on first use), or None when
+    KB_INDEX_ENABLED is not set or the initial load failed.
+
+    Maps the artifact under KB_INDEX_ARTIFACT_DIR when one was built,
+    otherwise loads the tables from Supabase.
+    """
+    global _index_instance, _index_failed
+    if os.getenv("KB_INDEX_ENABLED", "false").lower() not in ("1", "true", "yes") or _index_failed:
+        return None
+    if _index_instance is None:
+        index = KBIndex(
+            quantize=os.getenv("KB_INDEX_QUANTIZE", "false").lower() in ("1", "true", "yes"),
+            refresh_seconds=float(os.getenv("KB_INDEX_REFRESH_SECONDS", "300")),
+        )
+        try:
+            if not index.load_artifact(os.getenv("KB_INDEX_ARTIFACT_DIR", DEFAULT_ARTIFACT_DIR)):
+                index.refresh(full=True)
+        except Exception as e:
+            logger.warning(f"KB index disabled, initial load failed: {e}")
+            _index_failed = True
+            return None
+        _index_instance = index
+    return _index_instance
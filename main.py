@@ -1,6 +1,12 @@
+import asyncio
+import json
+import logging
+import os
 import time
+from typing import AsyncIterator, Tuple
 from fastapi import FastAPI, HTTPException, UploadFile, File, status, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field, model_validator
 from uuid import UUID
 from enum import Enum
@@ -12,29 +18,50 @@ from modules.user_profile import (
     update_preferred_language,
     update_relation, 
     get_user_profile,
+    get_user_profile_async,
     resolve_user_id_by_phone,
-    get_user_by_phone,
-    create_partial_user,
+    get_user_by_phone_async,
+    create_partial_user_async,
     update_user_profile,
+    update_user_profile_async,
     login_user,
 )
 from modules.response_builder import (
-    classify_message,
-    generate_medical_response,
-    generate_smalltalk_response,
-    generate_intent,
+    classify_message_async,
+    classify_message_local,
+    generate_medical_response_async,
+    generate_medical_response_fused_async,
+    FUSED_MEDICAL_GENERATION,
+    generate_smalltalk_response_async,
+    stream_medical_response,
+    stream_smalltalk_response,
 )
-from modules.conversation import save_user_message, save_sakhi_message, get_last_messages
+from modules.text_utils import truncate_response
+from modules.conversation import save_user_message_async, save_sakhi_message_async
 from modules.user_answers import save_bulk_answers
 from modules.model_gateway import get_model_gateway, Route
+from modules.intent_engine import get_intent_engine
+from modules.answer_cache import depersonalize, get_answer_cache, personalize
+from modules.single_flight import SingleFlight
+from modules.context_builder import context_token_budget, load_encoding
+from modules.history_manager import get_history_manager
+from modules.write_behind import get_conversation_queue
 from modules.slm_client import get_slm_client
+from modules.chat_pipeline import Stage, log_skipped_stages, route_needs, run_stages
 from modules.onboarding_engine import OnboardingRequest, get_next_question
 from modules.parent_profiles import create_parent_profile, update_parent_profile_answers
 from modules.onboarding_engine import OnboardingRequest, get_next_question
 from modules.parent_profiles import create_parent_profile, update_parent_profile_answers
-from search_hierarchical import hierarchical_rag_query, format_hierarchical_context
+from search_hierarchical import hierarchical_rag_query_async, format_hierarchical_context
+from kb_index import get_kb_index
+from bm25_index import get_lexical_index
+from supabase_client import close_async_http
+from rag import generate_embedding_async
+from embedding_cache import normalize_text
 from modules.tools import router as tools_router
 
+logger = logging.getLogger(__name__)
+
 app = FastAPI()
 
 # Include Tools Router
@@ -60,6 +87,25 @@ async def log_latency(request: Request, call_next):
 # Initialize model gateway and SLM client (singleton instances)
 model_gateway = get_model_gateway()
 slm_client = get_slm_client()
+intent_engine = get_intent_engine()
+history_manager = get_history_manager()
+answer_cache = get_answer_cache()
+# Concurrent identical questions share one retrieval + generation
+chat_single_flight = SingleFlight()
+# Load the in-process retrieval indexes now (KB_INDEX_ENABLED, RAG_HYBRID_ENABLED) rather than on the first chat turn
+get_kb_index()
+get_lexical_index()
+# Also the tiktoken encoding (its first load may download the BPE file)
+load_encoding()
+
+
+@app.on_event("shutdown")
+async def close_async_clients():
+    # Write queued conversation messages before the HTTP pool goes away
+    conversation_queue = get_conversation_queue()
+    if conversation_queue is not None:
+        await conversation_queue.drain(timeout=float(os.getenv("WRITE_BEHIND_DRAIN_SECONDS", "10")))
+    await close_async_http()
 
 class RegisterRequest(BaseModel):
     name: str  # full name
@@ -213,6 +259,16 @@ def home():
     return {"message": "Sakhi API working!"}
 
 
+@app.get("/health")
+def health():
+    """Liveness plus the depth of the conversation write-behind queue."""
+    conversation_queue = get_conversation_queue()
+    return {
+        "status": "ok",
+        "write_behind": conversation_queue.stats() if conversation_queue is not None else None,
+    }
+
+
 @app.post("/user/register")
 def register_user(req: RegisterRequest):
     try:
@@ -262,14 +318,19 @@ def login(req: LoginRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/sakhi/chat")
-async def sakhi_chat(req: ChatRequest):
+async def _resolve_chat_user(req: ChatRequest) -> Tuple[dict | None, dict | None]:
+    """
+    Resolve (or create) the chat user and advance the onboarding state machine.
+    Returns (user, onboarding_reply); onboarding_reply is set when the turn was
+    consumed by onboarding and must be returned to the client as-is.
+    """
+    user = None
     # 1. Resolve or Create User
     try:
         if req.user_id:
-            user = get_user_profile(req.user_id)
+            user = await get_user_profile_async(req.user_id)
         elif req.phone_number:
-            user = get_user_by_phone(req.phone_number)
+            user = await get_user_by_phone_async(req.phone_number)
     except Exception as e:
         # If it's a UUID format error or similar, treat as user not found
         logger.warning(f"User resolution failed for {req.user_id or req.phone_number}: {e}")
@@ -279,9 +340,9 @@ async def sakhi_chat(req: ChatRequest):
     if not user:
         if req.phone_number:
             try:
-                user = create_partial_user(req.phone_number)
+                user = await create_partial_user_async(req.phone_number)
                 # Return Welcome Message
-                return {
+                return user, {
                     "reply": "Welcome to Sakhi! I'm here to support you on your health journey. ❤️ \n Let's get started! What should I call you? (Please type just your name, e.g., Deepthi)",
                     "mode": "onboarding"
                 }
@@ -302,16 +363,16 @@ async def sakhi_chat(req: ChatRequest):
 
     # STATE 1: WAITING FOR NAME (User sent Name)
     if not current_name:
-        update_user_profile(user_id, {"name": msg})
-        return {
+        await update_user_profile_async(user_id, {"name": msg})
+        return user, {
             "reply": f"Nice to meet you, {msg}! Can you let me know your gender ? (Please reply with 'Male' or 'Female')",
             "mode": "onboarding"
         }
 
     # STATE 2: WAITING FOR GENDER (User sent Gender)
     elif not current_gender:
-        update_user_profile(user_id, {"gender": msg})
-        return {
+        await update_user_profile_async(user_id, {"gender": msg})
+        return user, {
             "reply": "Got it. And finally, what's your location (City/Town)? (e.g., Vizag)",
             "mode": "onboarding"
         }
@@ -319,7 +380,7 @@ async def sakhi_chat(req: ChatRequest):
     # STATE 3: WAITING FOR LOCATION (User sent Location)
     elif not current_location:
         # Update both keys to be safe
-        update_user_profile(user_id, {"location": msg}) 
+        await update_user_profile_async(user_id, {"location": msg}) 
         
         long_intro = (
             "Thank you! Your profile is all set.\n"
@@ -334,60 +395,255 @@ async def sakhi_chat(req: ChatRequest):
             "Visit the Website below for more information"
         )
         
-        return {
+        return user, {
             "reply": long_intro, 
             "mode": "onboarding_complete",
             "image": "Sakhi_intro.png"
         }
 
-    # 3. Normal Flow
-    try:
-        save_user_message(user_id, req.message, req.language)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to save user message: {e}")
+    return user, None
 
-    # STEP 0: Decide routing using Model Gateway
-    route = model_gateway.decide_route(req.message)
 
-    # Step 1: classify message
-    try:
-        classification = classify_message(req.message)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to classify message: {e}")
+async def _prepare_chat_turn(req: ChatRequest, user: dict) -> dict:
+    """
+    Run the pre-route stages of a normal chat turn and decide the route.
+    Route-specific stages (history, retrieval) are started by the branch that needs them.
+    """
+    user_id = user.get("user_id")
 
+    # Obvious greetings / clinic-info questions are routed from keywords, no embedding needed
+    fast_route = model_gateway.fast_route(req.message)
+
+    # Fan-out: saving and embedding do not depend on each other, so run them concurrently.
+    # Saving is required, but with the write-behind queue it only queues the row: insert
+    # failures are retried and dead-lettered in the background (modules/write_behind.py),
+    # so the stage can only fail when the message is inserted directly (queue disabled
+    # or full). The profile row was already fetched above, so the name is read from it
+    # directly. The message is embedded once here and the vector is reused for routing
+    # and retrieval; if embedding fails, routing falls back to the lexical router.
+    stages = [
+        Stage("save_user_message", save_user_message_async, user_id, req.message, req.language,
+              error_detail="Failed to save user message"),
+    ]
+    if fast_route is None:
+        stages.append(Stage("embedding", generate_embedding_async, req.message,
+                            required=False, default=None))
+    stage_results = await run_stages(stages)
+    executed = set(stage_results)
+    # Counts the turn; every few turns the user's history summary is refreshed in the background
+    history_manager.note_turn(user_id)
+
+    # STEP 0: Decide routing using Model Gateway (local scoring, no extra network call)
+    query_vector = stage_results.get("embedding")
+    scores = None
+    if fast_route is not None:
+        route = fast_route
+    elif query_vector is not None:
+        route, scores = model_gateway.decide_route_with_scores(req.message, query_vector=query_vector)
+    else:
+        route = model_gateway.fallback_route(req.message, "embedding unavailable")
+
+    # Step 1: classify message locally (script/lexicon/langdetect + routing scores);
+    # the LLM classifier is only called when the local result is low-confidence.
+    # Only OPENAI_RAG reads the signal, so other routes just need the language.
+    classification = classify_message_local(
+        req.message,
+        scores=scores,
+        fast_route=fast_route,
+        need_signal=route_needs(route, "signal"),
+    )
+    if classification is None:
+        try:
+            classification = await classify_message_async(req.message)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to classify message: {e}")
     detected_lang = classification.get("language", req.language)
     signal = classification.get("signal", "NO")
+    executed.add("language")
+    if route_needs(route, "signal"):
+        executed.add("signal")
+
+    # User name for personalization
+    user_name = user.get("name")
+
+    return {
+        "user_id": user_id,
+        "route": route,
+        "query_vector": query_vector,
+        "detected_lang": detected_lang,
+        "signal": signal,
+        "user_name": user_name,
+        # Stages run so far; the branch adds its own and logs them (log_skipped_stages)
+        "executed": executed,
+    }
+
+
+def _history_stage(user_id: str) -> Stage:
+    # Conversation history is optional context: failures degrade to an empty history
+    # Follow-ups stripped, token-bounded, rolling summary first (modules/history_manager.py)
+    return Stage("history", history_manager.get_history, user_id, required=False, default=[])
+
+
+def _retrieval_stage(req: ChatRequest, query_vector) -> Stage:
+    return Stage("retrieval", hierarchical_rag_query_async, req.message, query_vector=query_vector,
+                 error_detail="Failed to perform RAG search")
+
+
+def _extract_faq_media(kb_results: list[dict] | None) -> Tuple[str | None, str | None]:
+    """
+    Pull youtube_link / infographic_url from the first FAQ match that has either.
+    Returns (youtube_link, infographic_url).
+    """
+    infographic_url = None
+    youtube_link = None
+    if kb_results:
+        for item in kb_results:
+            if item.get("source_type") == "FAQ":
+                if item.get("infographic_url"):
+                    infographic_url = item["infographic_url"]
+                if item.get("youtube_link"):
+                    youtube_link = item["youtube_link"]
+                # If we found an FAQ match, we likely want to use its metadata
+                if infographic_url or youtube_link:
+                    break
+    return youtube_link, infographic_url
+
 
-    # Fetch user name for personalization
-    user_name = None
+def _lookup_cached_answer(req: ChatRequest, turn: dict, route: Route) -> dict | None:
+    """
+    Semantic answer cache lookup (needs the query embedding). Only SLM_RAG is
+    cached: its generation sees no conversation history.
+    """
+    if answer_cache is None or turn["query_vector"] is None:
+        return None
+    return answer_cache.lookup(turn["query_vector"], turn["detected_lang"], route.value, user_name=turn["user_name"])
+
+
+def _store_cached_answer(
+    turn: dict,
+    route: Route,
+    reply: str,
+    youtube_link: str | None,
+    infographic_url: str | None,
+    intent: str | None,
+) -> None:
+    if answer_cache is None or turn["query_vector"] is None:
+        return
+    answer_cache.store(
+        turn["query_vector"],
+        turn["detected_lang"],
+        route.value,
+        reply,
+        user_name=turn["user_name"],
+        youtube_link=youtube_link,
+        infographic_url=infographic_url,
+        intent=intent,
+    )
+
+
+async def _save_sakhi_reply(user_id: str, text: str, lang: str) -> None:
+    """
+    Persist Sakhi's reply. The reply is already generated, so a failed save is
+    logged instead of turning the response into a 500.
+    """
     try:
-        profile = get_user_profile(user_id)
-        if profile:
-            user_name = profile.get("name")
-    except Exception:
-        user_name = None
+        await save_sakhi_message_async(user_id, text, lang)
+    except Exception as e:
+        logger.error(f"Failed to save Sakhi message for {user_id}: {e}")
+
+
+async def _cached_answer_payload(req: ChatRequest, turn: dict, route: Route) -> dict | None:
+    """
+    Full /sakhi/chat response from the answer cache (reply saved like a generated one), or None.
+    """
+    cached = _lookup_cached_answer(req, turn, route)
+    if cached is None:
+        return None
+
+    await _save_sakhi_reply(turn["user_id"], cached["reply"], turn["detected_lang"])
+    turn["executed"].add("save_sakhi_message")
+    intent = cached["intent"]
+    if not intent:
+        intent = await intent_engine.get_intent_async(req.message, route, turn["detected_lang"])
+        turn["executed"].add("intent")
+
+    return {
+        "intent": intent,
+        "reply": cached["reply"],
+        "mode": "medical",
+        "language": turn["detected_lang"],
+        "youtube_link": cached["youtube_link"],
+        "infographic_url": cached["infographic_url"],
+        "route": route.value,
+    }
+
+
+async def _generate_once(req: ChatRequest, turn: dict, route: Route, generate) -> Tuple[dict, bool]:
+    """
+    Single-flight wrapper around a branch's retrieval + generation.
+
+    Requests with the same (normalized text, language, route) that arrive while
+    one is being answered wait for that answer; the leader's name is swapped for
+    the waiting user's name. When the leader's reply cannot be depersonalized
+    (see answer_cache.depersonalize) a waiting request generates its own.
+    Returns (result, generated); generated is False for a shared reply.
+    Only for history-free routes (SLM_DIRECT, SLM_RAG): the key does not cover
+    the conversation, so a history-conditioned reply must not be shared.
+    """
+    key = (normalize_text(req.message), turn["detected_lang"], route.value)
+
+    async def leader() -> dict:
+        result = await generate()
+        result["reply_template"] = depersonalize(result["reply"], turn["user_name"])
+        return result
+
+    result, is_leader = await chat_single_flight.run(key, leader)
+    if is_leader:
+        return result, True
+    if result["reply_template"] is None:
+        return await generate(), True
+    return dict(result, reply=personalize(result["reply_template"], turn["user_name"])), False
+
 
-    # Conversation history for both modes
-    history = get_last_messages(user_id, limit=5)
+@app.post("/sakhi/chat")
+async def sakhi_chat(req: ChatRequest):
+    # 1-2. Resolve user and handle onboarding
+    user, onboarding_reply = await _resolve_chat_user(req)
+    if onboarding_reply:
+        return onboarding_reply
+
+    # 3. Normal Flow
+    turn = await _prepare_chat_turn(req, user)
+    user_id = turn["user_id"]
+    route = turn["route"]
+    detected_lang = turn["detected_lang"]
+    signal = turn["signal"]
+    user_name = turn["user_name"]
+    query_vector = turn["query_vector"]
 
     # ===== ROUTE 1: SLM_DIRECT (Small talk, no RAG) =====
     if route == Route.SLM_DIRECT:
-        try:
-            final_ans = await slm_client.generate_chat(
-                message=req.message,
-                language=detected_lang,
-                user_name=user_name,
-            )
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to generate SLM chat response: {e}")
+        async def generate() -> dict:
+            turn["executed"].add("generation")
+            try:
+                reply = await slm_client.generate_chat(
+                    message=req.message,
+                    language=detected_lang,
+                    user_name=user_name,
+                )
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Failed to generate SLM chat response: {e}")
+            return {"reply": reply}
+
+        result, is_leader = await _generate_once(req, turn, route, generate)
+        final_ans = result["reply"]
         
-        try:
-            save_sakhi_message(user_id, final_ans, detected_lang)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to save Sakhi message: {e}")
+        await _save_sakhi_reply(user_id, final_ans, detected_lang)
         
-        # Generate intent description dynamically
-        intent = generate_intent(req.message)
+        # Curated intent sentence from the pre-generated library (LLM for languages it lacks)
+        intent = await intent_engine.get_intent_async(req.message, route, detected_lang)
+        turn["executed"].update(("save_sakhi_message", "intent"))
+        log_skipped_stages(route, turn["executed"])
         
         return {
             "intent": intent,
@@ -399,44 +655,47 @@ async def sakhi_chat(req: ChatRequest):
     
     # ===== ROUTE 2: SLM_RAG (Simple medical, RAG + SLM) =====
     elif route == Route.SLM_RAG:
-        # Perform RAG search
-        try:
-            kb_results = hierarchical_rag_query(req.message)
-            context_text = format_hierarchical_context(kb_results)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to perform RAG search: {e}")
-        
-        # Generate response using SLM with context
-        try:
-            final_ans = await slm_client.generate_rag_response(
-                context=context_text,
-                message=req.message,
-                language=detected_lang,
-                user_name=user_name,
-            )
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to generate SLM RAG response: {e}")
+        # Same question (in meaning) answered before: skip retrieval and generation
+        cached_payload = await _cached_answer_payload(req, turn, route)
+        if cached_payload:
+            log_skipped_stages(route, turn["executed"])
+            return cached_payload
+
+        async def generate() -> dict:
+            turn["executed"].update(("retrieval", "generation"))
+            # Perform RAG search
+            try:
+                kb_results = await hierarchical_rag_query_async(req.message, query_vector=query_vector)
+                context_text = format_hierarchical_context(kb_results, req.message, context_token_budget(route.value))
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Failed to perform RAG search: {e}")
+
+            # Generate response using SLM with context
+            try:
+                reply = await slm_client.generate_rag_response(
+                    context=context_text,
+                    message=req.message,
+                    language=detected_lang,
+                    user_name=user_name,
+                )
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Failed to generate SLM RAG response: {e}")
+            return {"reply": reply, "kb_results": kb_results}
+
+        result, is_leader = await _generate_once(req, turn, route, generate)
+        final_ans, kb_results = result["reply"], result["kb_results"]
         
-        try:
-            save_sakhi_message(user_id, final_ans, detected_lang)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to save Sakhi message: {e}")
+        await _save_sakhi_reply(user_id, final_ans, detected_lang)
         
         # Extract metadata from KB results
-        infographic_url = None
-        youtube_link = None
-        if kb_results:
-            for item in kb_results:
-                if item.get("source_type") == "FAQ":
-                    if item.get("infographic_url"):
-                        infographic_url = item["infographic_url"]
-                    if item.get("youtube_link"):
-                        youtube_link = item["youtube_link"]
-                    if infographic_url or youtube_link:
-                        break
+        youtube_link, infographic_url = _extract_faq_media(kb_results)
         
-        # Generate intent description dynamically
-        intent = generate_intent(req.message)
+        # Curated intent sentence from the pre-generated library (LLM for languages it lacks)
+        intent = await intent_engine.get_intent_async(req.message, route, detected_lang)
+        turn["executed"].update(("save_sakhi_message", "intent"))
+        log_skipped_stages(route, turn["executed"])
+        if is_leader:
+            _store_cached_answer(turn, route, final_ans, youtube_link, infographic_url, intent)
         
         response_payload = {
             "intent": intent,
@@ -453,8 +712,10 @@ async def sakhi_chat(req: ChatRequest):
     # Keep existing small talk logic as fallback (though routing should handle this)
     if signal != "YES":
         # Small-talk mode: no RAG
+        history = (await run_stages([_history_stage(user_id)]))["history"]
+        turn["executed"].update(("history", "generation"))
         try:
-            final_ans = generate_smalltalk_response(
+            final_ans = await generate_smalltalk_response_async(
                 req.message,
                 detected_lang,
                 history,
@@ -464,47 +725,58 @@ async def sakhi_chat(req: ChatRequest):
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to generate small-talk response: {e}")
 
-        try:
-            save_sakhi_message(user_id, final_ans, detected_lang)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to save Sakhi message: {e}")
+        await _save_sakhi_reply(user_id, final_ans, detected_lang)
+        turn["executed"].add("save_sakhi_message")
+        log_skipped_stages(route, turn["executed"], branch="smalltalk")
 
         return {"reply": final_ans, "mode": "general", "language": detected_lang}
 
     # ===== ROUTE 3: OPENAI_RAG (Complex medical or default, RAG + GPT-4) =====
-    # Medical mode: RAG
-    try:
-        final_ans, _kb = generate_medical_response(
-            prompt=req.message,
-            target_lang=detected_lang,
-            history=history,
-            user_name=user_name,
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to generate medical response: {e}")
+    # Medical mode: RAG. History and retrieval are independent, so fetch them together.
+    async def generate() -> dict:
+        stage_results = await run_stages([_history_stage(user_id), _retrieval_stage(req, query_vector)])
+        kb_results = stage_results["retrieval"]
+        turn["executed"].update(stage_results)
+        turn["executed"].add("generation")
+        try:
+            if FUSED_MEDICAL_GENERATION:
+                turn["executed"].add("intent")
+                # One structured call returns language, intent, reply and follow-ups
+                fused = await generate_medical_response_fused_async(
+                    prompt=req.message,
+                    target_lang=detected_lang,
+                    history=stage_results["history"],
+                    kb_results=kb_results,
+                    user_name=user_name,
+                )
+                return {"reply": fused["text"], "kb_results": kb_results,
+                        "language": fused["language"], "intent": fused["intent"]}
+            reply, kb_results = await generate_medical_response_async(
+                prompt=req.message,
+                target_lang=detected_lang,
+                history=stage_results["history"],
+                user_name=user_name,
+                kb_results=kb_results,
+            )
+            return {"reply": reply, "kb_results": kb_results, "language": detected_lang, "intent": None}
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to generate medical response: {e}")
 
-    try:
-        save_sakhi_message(user_id, final_ans, detected_lang)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to save Sakhi message: {e}")
+    # Not coalesced: the reply depends on this user's history and summary
+    result = await generate()
+    final_ans, _kb = result["reply"], result["kb_results"]
+    detected_lang, intent = result["language"], result["intent"]
 
-    # Extract infographic_url and youtube_link if available in kb_results
-    infographic_url = None
-    youtube_link = None
+    await _save_sakhi_reply(user_id, final_ans, detected_lang)
 
-    if _kb:
-        for item in _kb:
-            if item.get("source_type") == "FAQ":
-                if item.get("infographic_url"):
-                    infographic_url = item["infographic_url"]
-                if item.get("youtube_link"):
-                    youtube_link = item["youtube_link"]
-                # If we found an FAQ match, we likely want to use its metadata
-                if infographic_url or youtube_link:
-                    break
+    # Extract infographic_url and youtube_link if available in kb_results
+    youtube_link, infographic_url = _extract_faq_media(_kb)
 
-    # Generate intent description dynamically
-    intent = generate_intent(req.message)
+    # Curated intent sentence from the pre-generated library (unless the fused call wrote one;
+    # LLM for languages the library lacks)
+    intent = intent or await intent_engine.get_intent_async(req.message, route, detected_lang)
+    turn["executed"].update(("save_sakhi_message", "intent"))
+    log_skipped_stages(route, turn["executed"])
     
     response_payload = {
         "intent": intent,
@@ -519,6 +791,173 @@ async def sakhi_chat(req: ChatRequest):
     return response_payload
 
 
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _stream_onboarding_events(payload: dict) -> AsyncIterator[str]:
+    yield _sse_event("token", {"text": payload.get("reply", "")})
+    yield _sse_event("metadata", payload)
+
+
+async def _single_chunk(text: str) -> AsyncIterator[str]:
+    yield text
+
+
+async def _stream_chat_events(
+    chunks: AsyncIterator[str],
+    req: ChatRequest,
+    turn: dict,
+    mode: str,
+    route_name: str | None,
+    kb_results: list[dict] | None,
+    intent: str | asyncio.Task | None,
+    cached: dict | None = None,
+    branch: str | None = None,
+) -> AsyncIterator[str]:
+    """
+    Relay generated text as "token" events, then persist the reply and send one
+    "metadata" event. Failures after streaming has started are reported as an
+    "error" event because the HTTP status has already been sent.
+    `intent` may be a task still producing the sentence; `cached` is an answer
+    cache hit whose reply is being relayed; `branch` is the route's sub-branch,
+    for the stage log.
+    """
+    user_id = turn["user_id"]
+    detected_lang = turn["detected_lang"]
+    parts = []
+    try:
+        async for delta in chunks:
+            parts.append(delta)
+            yield _sse_event("token", {"text": delta})
+    except Exception as e:
+        detail = getattr(e, "detail", None) or str(e)
+        logger.error(f"Streaming generation failed: {detail}")
+        yield _sse_event("error", {"detail": f"Failed to generate response: {detail}"})
+        if isinstance(intent, asyncio.Task):
+            intent.cancel()
+        return
+
+    final_ans = truncate_response("".join(parts))
+    if isinstance(intent, asyncio.Task):
+        intent = await intent
+
+    await _save_sakhi_reply(user_id, final_ans, detected_lang)
+    turn["executed"].add("save_sakhi_message")
+    log_skipped_stages(turn["route"], turn["executed"], branch=branch)
+
+    if cached:
+        youtube_link, infographic_url = cached["youtube_link"], cached["infographic_url"]
+    else:
+        youtube_link, infographic_url = _extract_faq_media(kb_results)
+        if turn["route"] == Route.SLM_RAG:
+            _store_cached_answer(turn, turn["route"], final_ans, youtube_link, infographic_url, intent)
+    metadata = {
+        "reply": final_ans,
+        "mode": mode,
+        "language": detected_lang,
+    }
+    if route_name:
+        metadata.update({
+            "intent": intent,
+            "route": route_name,
+            "youtube_link": youtube_link,
+            "infographic_url": infographic_url,
+        })
+    yield _sse_event("metadata", metadata)
+
+
+@app.post("/sakhi/chat/stream")
+async def sakhi_chat_stream(req: ChatRequest):
+    """
+    Same pipeline as /sakhi/chat, but the reply is streamed as Server-Sent Events:
+    - event "token":    {"text": "<delta>"} as the model produces text
+    - event "metadata": final payload (reply, intent, route, youtube_link, infographic_url, ...)
+    - event "error":    {"detail": "..."} if generation fails after streaming started
+    """
+    user, onboarding_reply = await _resolve_chat_user(req)
+    if onboarding_reply:
+        return StreamingResponse(_stream_onboarding_events(onboarding_reply), media_type="text/event-stream")
+
+    turn = await _prepare_chat_turn(req, user)
+    route = turn["route"]
+    detected_lang = turn["detected_lang"]
+    user_name = turn["user_name"]
+    kb_results = None
+    cached = None
+    branch = None
+
+    if route == Route.SLM_DIRECT:
+        mode, route_name = "general", "slm_direct"
+        turn["executed"].add("generation")
+        chunks = slm_client.stream_chat(
+            message=req.message,
+            language=detected_lang,
+            user_name=user_name,
+        )
+    elif route == Route.SLM_RAG:
+        mode, route_name = "medical", "slm_rag"
+        cached = _lookup_cached_answer(req, turn, route)
+        if cached:
+            chunks = _single_chunk(cached["reply"])
+        else:
+            turn["executed"].update(("retrieval", "generation"))
+            try:
+                kb_results = await hierarchical_rag_query_async(req.message, query_vector=turn["query_vector"])
+                context_text = format_hierarchical_context(kb_results, req.message, context_token_budget(route.value))
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Failed to perform RAG search: {e}")
+            chunks = slm_client.stream_rag_response(
+                context=context_text,
+                message=req.message,
+                language=detected_lang,
+                user_name=user_name,
+            )
+    elif turn["signal"] != "YES":
+        # Legacy small-talk fallback (no intent/route in the payload, as in /sakhi/chat)
+        mode, route_name, branch = "general", None, "smalltalk"
+        history = (await run_stages([_history_stage(turn["user_id"])]))["history"]
+        turn["executed"].update(("history", "generation"))
+        chunks = stream_smalltalk_response(
+            req.message,
+            detected_lang,
+            history,
+            user_name=user_name,
+        )
+    else:
+        mode, route_name = "medical", "openai_rag"
+        # Not cached: the reply depends on this user's history and summary
+        stage_results = await run_stages([
+            _history_stage(turn["user_id"]),
+            _retrieval_stage(req, turn["query_vector"]),
+        ])
+        kb_results = stage_results["retrieval"]
+        turn["executed"].update(stage_results)
+        turn["executed"].add("generation")
+        chunks = stream_medical_response(
+            prompt=req.message,
+            target_lang=detected_lang,
+            history=stage_results["history"],
+            kb_results=kb_results,
+            user_name=user_name,
+        )
+
+    # Legacy small-talk replies carry no intent
+    intent = None
+    if cached and cached["intent"]:
+        intent = cached["intent"]
+    elif route_name:
+        # Library lookup, or an LLM call for a language the library lacks: runs while tokens stream
+        intent = asyncio.create_task(intent_engine.get_intent_async(req.message, route, detected_lang))
+        turn["executed"].add("intent")
+
+    return StreamingResponse(
+        _stream_chat_events(chunks, req, turn, mode, route_name, kb_results, intent, cached=cached, branch=branch),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.post("/user/answers")
 def save_user_answers(req: UserAnswersRequest):
     if not req.user_id:
@@ -0,0 +1,309 @@
+# modules/answer_cache.py
+"""
+Semantic cache of final answers for the SLM_RAG route.
+
+A new question whose embedding is close enough (cosine similarity) to an
+earlier question on the same route and language gets the earlier answer,
+together with its youtube_link / infographic_url, without retrieval or
+generation. Only history-free generations may be stored: OPENAI_RAG replies
+are conditioned on the user's conversation and are never cached.
+
+- Partitioned by (detected language, route).
+- Personalization-free: the user's name in the salutation is replaced by a
+  placeholder before storing and the current user's name is put back on
+  retrieval; answers naming the user anywhere else are not stored.
+- Entries expire after a TTL, and the whole cache is dropped when the KB is
+  re-ingested: the ingest scripts bump the version in the kb_meta table
+  (add_kb_meta.sql), which every worker polls every KB_VERSION_POLL_SECONDS.
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from supabase_client import supabase_select, supabase_upsert
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+NAME_PLACEHOLDER = "{{name}}"
+# Prompts address the user by the first name cut to this length (response_builder._friendly_name)
+FIRST_NAME_MAX_CHARS = 14
+KB_META_TABLE = "kb_meta"
+KB_VERSION_KEY = "kb_version"
+
+
+def read_kb_version() -> Optional[str]:
+    """
+    Current KB version from the kb_meta table ("" if the KB was never
+    re-ingested), or None when it could not be read (keep the last known one).
+    Blocking network call: do not use on the event loop.
+    """
+    try:
+        rows = supabase_select(KB_META_TABLE, select="value", filters=f"key=eq.{KB_VERSION_KEY}", limit=1)
+    except Exception as e:
+        logger.warning(f"Could not read the KB version from {KB_META_TABLE}: {e}")
+        return None
+    return (rows[0].get("value") or "") if rows else ""
+
+
+def bump_kb_version() -> str:
+    """
+    Record that the knowledge base changed. Call at the end of every ingest script;
+    running workers drop their cached answers and rebuild their indexes once
+    they see the new version.
+
+    Returns:
+        The new version stamp
+    """
+    version = time.strftime("%Y%m%d%H%M%S") + f"-{os.getpid()}"
+    supabase_upsert(
+        KB_META_TABLE,
+        {"key": KB_VERSION_KEY, "value": version, "updated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())},
+    )
+    return version
+
+
+def _name_forms(user_name: Optional[str]) -> List[str]:
+    """Full name, first name and shortened first name, longest first (how replies address the user)."""
+    name = (user_name or "").strip()
+    if not name or name.lower() in {"null", "none", "user", "test", "unknown"}:
+        return []
+    forms = [name]
+    first = name.split()[0]
+    for form in (first, first[:FIRST_NAME_MAX_CHARS]):
+        if form not in forms:
+            forms.append(form)
+    return forms
+
+
+def depersonalize(text: str, user_name: Optional[str]) -> Optional[str]:
+    """
+    Replace the user's name in an answer with NAME_PLACEHOLDER, or None when
+    that cannot be done safely.
+
+    Only the salutation is replaced: the exact (case-sensitive) name at the
+    start of the reply, after at most a few greeting words and followed by
+    "," or "!" ("Hi Priya, ...", "Priya! ..."). Names are often ordinary words
+    ("Hope", "Joy", "Asha"), so when the name also occurs anywhere else the
+    answer is not depersonalized and None is returned.
+    """
+    for form in _name_forms(user_name):
+        salutation = re.compile(rf"^(\s*(?:[^\s.!?,]+\s+){{0,3}}?){re.escape(form)}(?=[,!])")
+        text = salutation.sub(rf"\g<1>{NAME_PLACEHOLDER}", text, count=1)
+    for form in _name_forms(user_name):
+        if re.search(rf"\b{re.escape(form)}\b", text):
+            return None
+    return text
+
+
+def personalize(template: str, user_name: Optional[str]) -> str:
+    """Put the current user's (first) name back into a cached answer."""
+    forms = _name_forms(user_name)
+    if forms:
+        return template.replace(NAME_PLACEHOLDER, forms[-1])
+    # No usable name: "Hi {{name}}, ..." -> "Hi, ..." and "{{name}}, I understand." -> "I understand."
+    text = re.sub(r"^\s*\{\{name\}\}[,!.]?\s*", "", template)
+    text = re.sub(r" \{\{name\}\}(?=[,!.?])", "", text)
+    return text.replace(NAME_PLACEHOLDER, "")
+
+
+class _Partition:
+    """
+    Fixed-capacity ring of normalized query vectors for one (language, route).
+    The oldest entry is overwritten when the ring is full.
+    """
+
+    def __init__(self, dim: int, capacity: int):
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.expires_at = np.zeros(capacity, dtype=np.float64)  # 0 = empty slot
+        self.entries: List[Optional[Dict[str, Any]]] = [None] * capacity
+        self.next_slot = 0
+
+    def add(self, vector: np.ndarray, entry: Dict[str, Any], expires_at: float) -> None:
+        slot = self.next_slot
+        self.vectors[slot] = vector
+        self.expires_at[slot] = expires_at
+        self.entries[slot] = entry
+        self.next_slot = (slot + 1) % len(self.entries)
+
+    def best_match(self, vector: np.ndarray, now: float) -> Tuple[int, float]:
+        similarities = self.vectors @ vector
+        similarities[self.expires_at <= now] = -np.inf
+        slot = int(np.argmax(similarities))
+        return slot, float(similarities[slot])
+
+
+class AnswerCache:
+    """
+    Thread-safe in-process semantic answer cache.
+    """
+
+    def __init__(
+        self,
+        similarity_threshold: float = 0.95,
+        ttl_seconds: float = 24 * 3600,
+        max_entries: int = 2000,
+        kb_version_poll_seconds: float = 30.0,
+    ):
+        """
+        Args:
+            similarity_threshold: Minimum cosine similarity between the questions
+            ttl_seconds: How long an answer may be served
+            max_entries: Capacity of each (language, route) partition
+            kb_version_poll_seconds: How often the KB version is re-read from kb_meta
+        """
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self.kb_version_poll_seconds = kb_version_poll_seconds
+        self._partitions: Dict[Tuple[str, str], _Partition] = {}
+        self._lock = threading.Lock()
+        self._kb_version: Optional[str] = None  # None = not read yet
+        self._kb_version_polled_at = 0.0
+        self._polling = False
+        self.hits = 0
+        self.misses = 0
+
+    def _check_kb_version(self) -> None:
+        # Called under the lock on the event loop: the kb_meta read runs in a thread
+        if self._polling or time.time() - self._kb_version_polled_at < self.kb_version_poll_seconds:
+            return
+        self._polling = True
+        self._kb_version_polled_at = time.time()
+        threading.Thread(target=self._poll_kb_version, name="kb-version-poll", daemon=True).start()
+
+    def _poll_kb_version(self) -> None:
+        try:
+            version = read_kb_version()
+            if version is None:
+                return
+            with self._lock:
+                if self._kb_version is not None and version != self._kb_version:
+                    logger.info(f"KB version changed ({self._kb_version or 'none'} -> {version}), clearing answer cache")
+                    self._partitions.clear()
+                self._kb_version = version
+        finally:
+            self._polling = False
+
+    @staticmethod
+    def _normalize(query_vector: Sequence[float]) -> Optional[np.ndarray]:
+        vector = np.asarray(query_vector, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        if norm == 0.0:
+            return None
+        return vector / norm
+
+    def lookup(
+        self,
+        query_vector: Sequence[float],
+        language: str,
+        route: str,
+        user_name: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Find a cached answer for a semantically equivalent question.
+
+        Args:
+            query_vector: Embedding of the current question
+            language: Detected language label
+            route: Route value ("slm_rag", "openai_rag")
+            user_name: Name to re-apply to the answer
+
+        Returns:
+            {"reply", "youtube_link", "infographic_url", "intent", "similarity"} or None
+        """
+        vector = self._normalize(query_vector)
+        if vector is None:
+            return None
+
+        with self._lock:
+            self._check_kb_version()
+            partition = self._partitions.get((language, route))
+            if partition is None or partition.vectors.shape[1] != vector.shape[0]:
+                self.misses += 1
+                return None
+            slot, similarity = partition.best_match(vector, time.time())
+            if similarity < self.similarity_threshold:
+                self.misses += 1
+                return None
+            entry = dict(partition.entries[slot])
+            self.hits += 1
+
+        entry["reply"] = personalize(entry.pop("template"), user_name)
+        entry["similarity"] = similarity
+        logger.info(f"Answer cache hit ({language}/{route}, similarity {similarity:.3f})")
+        return entry
+
+    def store(
+        self,
+        query_vector: Sequence[float],
+        language: str,
+        route: str,
+        reply: str,
+        user_name: Optional[str] = None,
+        youtube_link: Optional[str] = None,
+        infographic_url: Optional[str] = None,
+        intent: Optional[str] = None,
+    ) -> None:
+        """
+        Cache a final answer under the question's embedding (name removed).
+        Answers that mention the name outside the salutation are not cached.
+        """
+        vector = self._normalize(query_vector)
+        if vector is None or not reply:
+            return
+        template = depersonalize(reply, user_name)
+        if template is None:
+            logger.info("Answer not cached: it uses the user's name outside the salutation")
+            return
+
+        entry = {
+            "template": template,
+            "youtube_link": youtube_link,
+            "infographic_url": infographic_url,
+            "intent": intent,
+        }
+        with self._lock:
+            self._check_kb_version()
+            key = (language, route)
+            partition = self._partitions.get(key)
+            if partition is None or partition.vectors.shape[1] != vector.shape[0]:
+                partition = _Partition(vector.shape[0], self.max_entries)
+                self._partitions[key] = partition
+            partition.add(vector, entry, time.time() + self.ttl_seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = sum(int(np.count_nonzero(p.expires_at > time.time())) for p in self._partitions.values())
+            return {"hits": self.hits, "misses": self.misses, "entries": entries, "kb_version": self._kb_version}
+
+
+# Module-level singleton instance
+_cache_instance = None
+
+
+def get_answer_cache() -> Optional[AnswerCache]:
+    """
+    Get or create the process-wide AnswerCache, or None when ANSWER_CACHE_ENABLED is false.
+
+    Configured with ANSWER_CACHE_SIMILARITY, ANSWER_CACHE_TTL_SECONDS,
+    ANSWER_CACHE_MAX_ENTRIES and KB_VERSION_POLL_SECONDS.
+    """
+    global _cache_instance
+    if os.getenv("ANSWER_CACHE_ENABLED", "true").lower() not in ("1", "true", "yes"):
+        return None
+    if _cache_instance is None:
+        _cache_instance = AnswerCache(
+            similarity_threshold=float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95")),
+            ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(24 * 3600))),
+            max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "2000")),
+            kb_version_poll_seconds=float(os.getenv("KB_VERSION_POLL_SECONDS", "30")),
+        )
+    return _cache_instance
@@ -0,0 +1,179 @@
+# modules/chat_pipeline.py
+"""
+Concurrent stage runner for the /sakhi/chat pipeline.
+Independent network-bound steps (Supabase reads/writes, OpenAI calls) are
+declared as stages and awaited together instead of one after another.
+
+Each Route declares the stages it needs (ROUTE_STAGES plus their
+dependencies), so a branch never waits on work whose result it does not use.
+The handlers record the stages a turn actually ran; log_skipped_stages
+reports those and warns when a handler ran a stage its route does not declare.
+"""
+
+import asyncio
+import inspect
+import logging
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from fastapi import HTTPException
+
+from modules.model_gateway import Route
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class Stage:
+    """
+    A single step of the chat pipeline.
+
+    Failure policy:
+    - required=True: a failure aborts the request with HTTP 500 and `error_detail`.
+    - required=False: a failure is logged and the stage resolves to `default`.
+    """
+    def __init__(
+        self,
+        name: str,
+        func: Callable[..., Any],
+        *args: Any,
+        required: bool = True,
+        default: Any = None,
+        error_detail: Optional[str] = None,
+        **kwargs: Any,
+    ):
+        self.name = name
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.required = required
+        self.default = default
+        self.error_detail = error_detail or f"Failed to run {name}"
+
+    async def run(self) -> Any:
+        """Await coroutine functions directly; push blocking functions to a worker thread."""
+        if inspect.iscoroutinefunction(self.func):
+            return await self.func(*self.args, **self.kwargs)
+        return await asyncio.to_thread(self.func, *self.args, **self.kwargs)
+
+
+async def run_stages(stages: List[Stage]) -> Dict[str, Any]:
+    """
+    Run all stages concurrently and apply each stage's failure policy.
+
+    Args:
+        stages: Independent stages (no stage may depend on another's result)
+
+    Returns:
+        Dict mapping stage name to its result (or its default on tolerated failure)
+
+    Raises:
+        HTTPException: 500 if any required stage failed
+    """
+    started = time.time()
+    outcomes = await asyncio.gather(*(stage.run() for stage in stages), return_exceptions=True)
+
+    results: Dict[str, Any] = {}
+    for stage, outcome in zip(stages, outcomes):
+        if isinstance(outcome, HTTPException):
+            raise outcome
+        if isinstance(outcome, BaseException) and not isinstance(outcome, Exception):
+            # Cancellation must propagate untouched
+            raise outcome
+        if isinstance(outcome, Exception):
+            if stage.required:
+                raise HTTPException(status_code=500, detail=f"{stage.error_detail}: {outcome}")
+            logger.warning(f"Stage '{stage.name}' failed, using default: {outcome}")
+            results[stage.name] = stage.default
+        else:
+            results[stage.name] = outcome
+
+    logger.info(f"Fan-out stage [{', '.join(s.name for s in stages)}] finished in {time.time() - started:.2f}s")
+    return results
+
+
+# Declared dependency graph of the chat pipeline: stage -> stages whose results it consumes.
+# "route" is not a stage; it is decided locally from the embedding (or the lexical fast path).
+STAGE_DEPENDENCIES: Dict[str, Tuple[str, ...]] = {
+    "save_user_message": (),
+    "embedding": (),
+    "language": (),
+    "signal": ("embedding",),
+    "history": ("save_user_message",),
+    "retrieval": ("embedding",),
+    "generation": ("language",),
+    "intent": ("language",),
+    "save_sakhi_message": ("generation",),
+}
+
+# Stages started before the route is known (routing itself needs the embedding,
+# unless the lexical fast path decided it), so they are never skipped by route.
+PRE_ROUTE_STAGES: Tuple[str, ...] = ("save_user_message", "embedding")
+
+# Stages each route's branch consumes, directly or through STAGE_DEPENDENCIES.
+# OPENAI_RAG also hosts the legacy small-talk branch (signal != "YES"), which
+# uses history but not retrieval or intent; see ROUTE_BRANCH_STAGES.
+ROUTE_STAGES: Dict[Route, Tuple[str, ...]] = {
+    Route.SLM_DIRECT: ("save_user_message", "language", "generation", "intent", "save_sakhi_message"),
+    Route.SLM_RAG: ("save_user_message", "language", "retrieval", "generation", "intent", "save_sakhi_message"),
+    Route.OPENAI_RAG: ("save_user_message", "language", "signal", "history", "retrieval",
+                       "generation", "intent", "save_sakhi_message"),
+}
+
+ROUTE_BRANCH_STAGES: Dict[str, Tuple[str, ...]] = {
+    "smalltalk": ("save_user_message", "language", "signal", "history", "generation", "save_sakhi_message"),
+}
+
+
+def stages_for_route(route: Route, branch: Optional[str] = None) -> Set[str]:
+    """
+    All stages a route (or one of its sub-branches) needs, including transitive dependencies.
+    """
+    needed: Set[str] = set()
+    pending = list(ROUTE_BRANCH_STAGES[branch] if branch else ROUTE_STAGES[route])
+    while pending:
+        name = pending.pop()
+        if name not in needed:
+            needed.add(name)
+            pending.extend(STAGE_DEPENDENCIES[name])
+    return needed
+
+
+def route_needs(route: Route, stage_name: str, branch: Optional[str] = None) -> bool:
+    return stage_name in stages_for_route(route, branch)
+
+
+def log_skipped_stages(
+    route: Route,
+    executed: Iterable[str],
+    branch: Optional[str] = None,
+) -> List[str]:
+    """
+    Log which pipeline stages this turn ran and which it did not. Call once the
+    turn has finished, with the names of the stages that actually ran, so
+    short-circuits (answer cache hit, single-flight follower, lexical fast path)
+    show up as skips.
+
+    Stages that ran although the route does not declare them (stages_for_route)
+    are logged as a warning: ROUTE_STAGES no longer matches the handlers.
+
+    Args:
+        route: Route chosen by the ModelGateway
+        executed: Names of the stages run for this turn
+        branch: Sub-branch of the route, if any (e.g. "smalltalk")
+
+    Returns:
+        Sorted list of skipped stage names
+    """
+    ran = set(executed)
+    skipped_list = sorted(set(STAGE_DEPENDENCIES) - ran)
+    undeclared = sorted(ran - stages_for_route(route, branch) - set(PRE_ROUTE_STAGES))
+    label = f"{route.value}/{branch}" if branch else route.value
+    logger.info(
+        f"Pipeline route={label} ran stages: {', '.join(sorted(ran)) or 'none'}; "
+        f"skipped: {', '.join(skipped_list) or 'none'}"
+    )
+    if undeclared:
+        logger.warning(f"Pipeline route={label} ran stages not declared in ROUTE_STAGES: {', '.join(undeclared)}")
+    return skipped_list
@@ -0,0 +1,195 @@
+# modules/context_builder.py
+"""
+Token-budgeted selection of retrieved section text for the RAG prompts.
+
+Retrieval returns whole parent sections, and a few long ones can dominate the
+prompt. fit_sections_to_budget keeps, per route budget, the sentences most
+related to the question:
+
+- Tokens are counted locally (tiktoken when installed, otherwise a
+  character-based estimate).
+- Every retrieved section keeps at least its best sentence, so no source is
+  dropped; the remaining budget goes to the best sentences overall.
+- Sentences repeated across (overlapping) sections are kept once.
+- Selected sentences stay in their original order within a section.
+"""
+
+import logging
+import math
+import os
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from bm25_index import tokenize
+
+try:
+    import tiktoken
+except ImportError:  # optional: token counts fall back to an estimate
+    tiktoken = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Encoding of gpt-4o / gpt-4o-mini
+TIKTOKEN_ENCODING = "o200k_base"
+
+# Section-text budget per route; 0 disables trimming for that route
+DEFAULT_CONTEXT_TOKEN_BUDGETS = {
+    "slm_rag": 600,
+    "openai_rag": 1200,
+}
+
+# Sentences whose token sets overlap this much with a kept sentence are duplicates
+NEAR_DUPLICATE_JACCARD = 0.8
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?।])\s+|\n+")
+
+_encoding = None
+_encoding_failed = False
+
+
+def _get_encoding():
+    global _encoding, _encoding_failed
+    if _encoding is None and tiktoken is not None and not _encoding_failed:
+        try:
+            _encoding = tiktoken.get_encoding(TIKTOKEN_ENCODING)
+        except Exception as e:
+            # The BPE file is downloaded on first use; offline hosts use the estimate
+            logger.warning(f"tiktoken unavailable ({e}), estimating token counts")
+            _encoding_failed = True
+    return _encoding
+
+
+def load_encoding() -> bool:
+    """
+    Load the tiktoken encoding now. Without TIKTOKEN_CACHE_DIR holding the BPE
+    file (the Docker image bakes it in) the first load downloads it, so the
+    server calls this at startup instead of on the first chat turn.
+
+    Returns:
+        True when exact token counts are available
+    """
+    return _get_encoding() is not None
+
+
+def count_tokens(text: str) -> int:
+    """Token count of text for the OpenAI chat models (estimated without tiktoken)."""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    # ~4 characters per token for Latin script; Telugu script is much denser
+    ascii_chars = sum(1 for c in text if ord(c) < 128)
+    return math.ceil(ascii_chars / 4 + (len(text) - ascii_chars) / 2)
+
+
+def context_token_budget(route: str) -> Optional[int]:
+    """
+    Section-text budget for a route value ("slm_rag", "openai_rag"), from
+    RAG_CONTEXT_TOKENS_<ROUTE>; None means whole sections.
+    """
+    default = DEFAULT_CONTEXT_TOKEN_BUDGETS.get(route, 0)
+    budget = int(os.getenv(f"RAG_CONTEXT_TOKENS_{route.upper()}", str(default)))
+    return budget if budget > 0 else None
+
+
+def split_sentences(text: str) -> List[str]:
+    """Sentences and list items of a section, whitespace-trimmed."""
+    return [s.strip() for s in SENTENCE_BOUNDARY.split(text or "") if s.strip()]
+
+
+def _normalize(sentence: str) -> str:
+    return " ".join(sentence.lower().split())
+
+
+def fit_sections_to_budget(
+    sections: Sequence[str], query: str, token_budget: int
+) -> Tuple[List[str], Dict[str, int]]:
+    """
+    Trim section texts (most relevant section first) to a total token budget.
+
+    Args:
+        sections: Section contents in retrieval order
+        query: The user's question (sentences sharing its terms rank first)
+        token_budget: Tokens allowed for all section texts together
+
+    Returns:
+        (trimmed section texts, {"tokens_before", "tokens_after", "tokens_saved"})
+    """
+    tokens_before = sum(count_tokens(s) for s in sections)
+
+    # (section index, position, text, tokens, token set); duplicates dropped
+    candidates = []
+    seen_texts = set()
+    kept_token_sets: List[set] = []
+    for section_index, content in enumerate(sections):
+        for position, sentence in enumerate(split_sentences(content)):
+            normalized = _normalize(sentence)
+            terms = set(tokenize(sentence))
+            if normalized in seen_texts or any(
+                terms and len(terms & other) / len(terms | other) >= NEAR_DUPLICATE_JACCARD for other in kept_token_sets
+            ):
+                continue
+            seen_texts.add(normalized)
+            kept_token_sets.append(terms)
+            candidates.append((section_index, position, sentence, count_tokens(sentence), terms))
+
+    # Query terms weighted by how rare they are among the retrieved sentences
+    query_terms = set(tokenize(query))
+    document_frequency = {t: sum(1 for c in candidates if t in c[4]) for t in query_terms}
+    n_sentences = max(len(candidates), 1)
+
+    def relevance(candidate) -> float:
+        return sum(math.log(1 + n_sentences / document_frequency[t]) for t in query_terms & candidate[4])
+
+    # Best first; ties go to the more relevant section, then the earlier sentence
+    ranked = sorted(candidates, key=lambda c: (-relevance(c), c[0], c[1]))
+
+    selected = set()
+    used = 0
+    # Pass 1: the best sentence of every section, so every source stays in the prompt
+    for section_index in range(len(sections)):
+        best = next((c for c in ranked if c[0] == section_index), None)
+        if best is not None:
+            selected.add((best[0], best[1]))
+            used += best[3]
+    # Pass 2: fill the remaining budget with the best sentences overall
+    for candidate in ranked:
+        if (candidate[0], candidate[1]) in selected or used + candidate[3] > token_budget:
+            continue
+        selected.add((candidate[0], candidate[1]))
+        used += candidate[3]
+
+    trimmed = [
+        " ".join(c[2] for c in candidates if c[0] == section_index and (c[0], c[1]) in selected)
+        for section_index in range(len(sections))
+    ]
+    tokens_after = sum(count_tokens(s) for s in trimmed)
+    stats = {
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "tokens_saved": max(tokens_before - tokens_after, 0),
+    }
+    if stats["tokens_saved"]:
+        logger.info(
+            f"Context trimmed to budget {token_budget}: {tokens_before} -> {tokens_after} tokens "
+            f"(saved {stats['tokens_saved']}, {len(sections)} sections kept)"
+        )
+    return trimmed, stats
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to at most max_tokens (on a word boundary when estimating)."""
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+    encoding = _get_encoding()
+    if encoding is not None:
+        return encoding.decode(encoding.encode(text)[:max_tokens]).rstrip() + "…"
+    words = text.split()
+    while words and count_tokens(" ".join(words)) > max_tokens:
+        words = words[: min(len(words) * max_tokens // max(count_tokens(" ".join(words)), 1), len(words) - 1)]
+    return " ".join(words) + "…"
@@ -1,11 +1,24 @@
 # modules/conversation.py
+import asyncio
 from datetime import datetime
+import logging
 import uuid
 
-from supabase_client import supabase_insert, supabase_select
+from modules.recent_turns import get_recent_turns, merge_history, normalize_timestamp
+from modules.write_behind import get_conversation_queue
+from supabase_client import (
+    supabase_insert,
+    supabase_insert_async,
+    supabase_select,
+    supabase_select_async,
+)
 
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
-def _save_message(user_id: str, message: str, lang: str, message_type: str, chat_id: str | None = None):
+
+def _message_payload(user_id: str, message: str, lang: str, message_type: str, chat_id: str | None = None):
     payload = {
         "user_id": user_id,
         "message_text": message,
@@ -15,7 +28,45 @@ def _save_message(user_id: str, message: str, lang: str, message_type: str, chat
     }
     if chat_id:
         payload["chat_id"] = chat_id
-    return supabase_insert("sakhi_conversations", payload)
+    return payload
+
+
+def _role(message_type: str) -> str:
+    return "user" if message_type == "user" else "sakhi"
+
+
+def _remember(user_id: str, payload: dict) -> None:
+    recent = get_recent_turns()
+    if recent is not None:
+        recent.append(user_id, _role(payload["message_type"]), payload["message_text"], payload["created_at"])
+
+
+def _save_message(user_id: str, message: str, lang: str, message_type: str, chat_id: str | None = None):
+    payload = _message_payload(user_id, message, lang, message_type, chat_id=chat_id)
+    result = supabase_insert("sakhi_conversations", payload)
+    _remember(user_id, payload)
+    return result
+
+
+async def _save_message_async(user_id: str, message: str, lang: str, message_type: str, chat_id: str | None = None):
+    """
+    With the write-behind queue the message is only queued: insert failures are
+    retried and dead-lettered in the background and never reach the caller.
+    Raises only when the direct insert (queue disabled or full) fails.
+    """
+    payload = _message_payload(user_id, message, lang, message_type, chat_id=chat_id)
+    queue = get_conversation_queue()
+    if queue is not None:
+        # Write-behind: inserted in a batch by the background writer (modules/write_behind.py)
+        try:
+            queue.enqueue(payload, key=user_id)
+            _remember(user_id, payload)
+            return [payload]
+        except asyncio.QueueFull:
+            logger.warning(f"Write-behind queue full, inserting message for {user_id} directly")
+    result = await supabase_insert_async("sakhi_conversations", payload)
+    _remember(user_id, payload)
+    return result
 
 
 def save_user_message(user_id: str, text: str, lang: str = "en"):
@@ -27,31 +78,125 @@ def save_sakhi_message(user_id: str, text: str, lang: str = "en"):
     return _save_message(user_id, text, lang, "sakhi", chat_id=chat_id)
 
 
+async def save_user_message_async(user_id: str, text: str, lang: str = "en"):
+    return await _save_message_async(user_id, text, lang, "user")
+
+
+async def save_sakhi_message_async(user_id: str, text: str, lang: str = "en"):
+    chat_id = str(uuid.uuid4())
+    return await _save_message_async(user_id, text, lang, "sakhi", chat_id=chat_id)
+
+
 def save_conversation(user_id: str, message: str, message_type: str, language: str):
     return _save_message(user_id, message, language, message_type)
 
 
-def get_last_messages(user_id: str, limit: int = 5):
+_HISTORY_SELECT = "user_id,message_text,message_type,language,created_at"
+
+
+def _history_query(user_id: str, limit: int):
     """
-    Fetch last N messages for a user ordered by created_at descending.
-    Returns list of {"role": "user"|"sakhi", "content": "..."}.
+    Newest rows first, ordered and limited by PostgREST
+    (served by the (user_id, created_at desc) index, add_conversation_history_index.sql).
+    Reads at least a full ring buffer so the result can seed it.
     """
-    rows = supabase_select(
-        "sakhi_conversations",
-        select="user_id,message_text,message_type,language,created_at",
-        filters=f"user_id=eq.{user_id}",
-        limit=50,  # grab recent chunk, then trim
-    )
+    recent = get_recent_turns()
+    fetch = max(limit, recent.capacity) if recent is not None else limit
+    return {
+        "select": _HISTORY_SELECT,
+        "filters": f"user_id=eq.{user_id}&order=created_at.desc",
+        "limit": fetch,
+    }
+
 
+def _rows_to_history(rows, limit: int | None = None):
+    """Rows (newest first) as {"role", "content", "created_at"} messages, oldest first."""
     if not rows or not isinstance(rows, list):
         return []
 
-    sorted_rows = sorted(rows, key=lambda r: r.get("created_at", ""), reverse=True)
-    recent = sorted_rows[:limit]
+    recent = rows if limit is None else rows[:limit]  # rows arrive newest first
 
     history = []
     for r in reversed(recent):  # oldest to newest
-        role = "user" if r.get("message_type") == "user" else "sakhi"
-        history.append({"role": role, "content": r.get("message_text", "")})
+        history.append({
+            "role": _role(r.get("message_type")),
+            "content": r.get("message_text", ""),
+            "created_at": normalize_timestamp(r.get("created_at")),
+        })
 
     return history
+
+
+def _seed_and_trim(user_id: str, rows, limit: int, since: int | None, queued=()):
+    # Messages still in the write-behind queue when the read started follow the rows read
+    history = merge_history(_rows_to_history(rows), _rows_to_history(list(reversed(queued))))
+    recent = get_recent_turns()
+    if recent is not None:
+        recent.seed(user_id, history, since=since)
+    history = [{"role": m["role"], "content": m["content"]} for m in history]
+    return history[-limit:] if limit > 0 else []
+
+
+def _newest_query(user_id: str):
+    # created_at of the user's newest row, used to validate the ring buffer
+    return {"select": "created_at", "filters": f"user_id=eq.{user_id}&order=created_at.desc", "limit": 1}
+
+
+def _buffered_history(user_id: str, limit: int):
+    recent = get_recent_turns()
+    if recent is None:
+        return None
+    if not recent.servable(user_id, limit) or not recent.validate:
+        return recent.get(user_id, limit)
+    try:
+        rows = supabase_select("sakhi_conversations", **_newest_query(user_id))
+    except Exception as e:
+        logger.warning(f"Ring buffer validation read failed for {user_id}: {e}")
+        return None
+    return recent.get(user_id, limit, rows[0].get("created_at") if rows else None)
+
+
+async def _buffered_history_async(user_id: str, limit: int):
+    recent = get_recent_turns()
+    if recent is None:
+        return None
+    if not recent.servable(user_id, limit) or not recent.validate:
+        return recent.get(user_id, limit)
+    try:
+        rows = await supabase_select_async("sakhi_conversations", **_newest_query(user_id))
+    except Exception as e:
+        logger.warning(f"Ring buffer validation read failed for {user_id}: {e}")
+        return None
+    return recent.get(user_id, limit, rows[0].get("created_at") if rows else None)
+
+
+def get_last_messages(user_id: str, limit: int = 5):
+    """
+    Fetch last N messages for a user ordered by created_at descending.
+    Returns list of {"role": "user"|"sakhi", "content": "..."} (oldest first).
+    Served from the in-process ring buffer (modules/recent_turns.py) when possible.
+    """
+    recent = get_recent_turns()
+    buffered = _buffered_history(user_id, limit)
+    if buffered is not None:
+        return buffered
+    since = recent.mark(user_id) if recent is not None else None
+    rows = supabase_select("sakhi_conversations", **_history_query(user_id, limit))
+    return _seed_and_trim(user_id, rows, limit, since)
+
+
+async def get_last_messages_async(user_id: str, limit: int = 5):
+    """
+    Async version of get_last_messages.
+    """
+    recent = get_recent_turns()
+    buffered = await _buffered_history_async(user_id, limit)
+    if buffered is not None:
+        return buffered
+    # The read does not wait for the write-behind queue: this user's queued rows
+    # are merged in, and messages saved while the read is in flight go to the buffer
+    queue = get_conversation_queue()
+    queued = queue.pending_rows(user_id) if queue is not None else []
+    since = recent.mark(user_id) if recent is not None else None
+    rows = await supabase_select_async("sakhi_conversations", **_history_query(user_id, limit))
+    return _seed_and_trim(user_id, rows, limit, since, queued)
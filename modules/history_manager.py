@@ -0,0 +1,198 @@
+# modules/history_manager.py
+"""
+Bounded conversation history for the medical and small-talk prompts.
+
+The raw history (last messages from sakhi_conversations) is reduced before it
+is rendered by response_builder._build_history_block:
+
+- " Follow ups : " blocks are stripped from Sakhi replies.
+- Messages are kept newest first until HISTORY_TOKEN_BUDGET is used.
+- A rolling per-user summary of the conversation is prepended as a
+  {"role": "summary"} item. It is refreshed in the background every
+  HISTORY_SUMMARY_EVERY_TURNS turns (counted per worker), so no chat turn
+  waits for it.
+
+The prompt size therefore stays bounded however long a conversation runs.
+"""
+
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set
+
+from modules.context_builder import count_tokens, truncate_to_tokens
+from modules.conversation import get_last_messages_async
+from modules.text_utils import FOLLOW_UPS_MARKER
+from rag import async_client
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = """
+You maintain a short memory of a chat between a user and Sakhi, a fertility and pregnancy companion.
+Update the previous summary with the new messages. Keep only what helps future replies:
+the user's journey stage, concerns, symptoms, tests, treatments, preferences and open questions.
+Write plain English, third person, at most 80 words. Output only the summary.
+"""
+
+
+def strip_follow_ups(text: str) -> str:
+    """Drop the " Follow ups : " block from a Sakhi reply."""
+    reply, _, _ = (text or "").partition(FOLLOW_UPS_MARKER.strip())
+    return reply.strip()
+
+
+class HistoryManager:
+    """
+    Per-process history reducer and rolling summary store.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = 600,
+        fetch_messages: int = 10,
+        summary_every: int = 6,
+        max_users: int = 5000,
+        summaries_enabled: bool = True,
+    ):
+        """
+        Args:
+            token_budget: Tokens for the summary plus raw messages together
+            fetch_messages: Raw messages read from sakhi_conversations per turn
+            summary_every: Refresh a user's summary after this many turns
+            max_users: Users whose summary / turn count is kept (least recent dropped)
+            summaries_enabled: Keep rolling summaries at all
+        """
+        self.token_budget = token_budget
+        self.fetch_messages = fetch_messages
+        self.summary_every = max(1, summary_every)
+        self.max_users = max_users
+        self.summaries_enabled = summaries_enabled
+        self._summaries: "OrderedDict[str, str]" = OrderedDict()
+        self._turns: "OrderedDict[str, int]" = OrderedDict()
+        self._refreshing: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self.summary_refreshes = 0
+
+    def _remember(self, store: OrderedDict, user_id: str, value) -> None:
+        store[user_id] = value
+        store.move_to_end(user_id)
+        while len(store) > self.max_users:
+            store.popitem(last=False)
+
+    def bound(self, messages: List[Dict[str, str]], summary: Optional[str] = None) -> List[Dict[str, str]]:
+        """
+        Strip follow-ups and fit the summary and the newest messages into token_budget.
+
+        Args:
+            messages: History items oldest to newest ({"role", "content"})
+            summary: Rolling summary of the conversation, if any
+
+        Returns:
+            History items oldest to newest, the summary item first
+        """
+        remaining = self.token_budget
+        summary_items = []
+        if summary:
+            # The summary may use at most a third of the budget
+            summary = truncate_to_tokens(summary, self.token_budget // 3)
+            summary_items = [{"role": "summary", "content": summary}]
+            remaining -= count_tokens(summary)
+
+        kept: List[Dict[str, str]] = []
+        for message in reversed(messages or []):
+            content = message.get("content", "")
+            if message.get("role") != "user":
+                content = strip_follow_ups(content)
+            tokens = count_tokens(content)
+            if tokens > remaining:
+                if not kept:
+                    # Always keep (the start of) the latest message
+                    kept.append({"role": message.get("role", "user"), "content": truncate_to_tokens(content, remaining)})
+                break
+            kept.append({"role": message.get("role", "user"), "content": content})
+            remaining -= tokens
+        return summary_items + list(reversed(kept))
+
+    async def get_history(self, user_id: str) -> List[Dict[str, str]]:
+        """Bounded history for this turn's prompt (summary item first when available)."""
+        messages = await get_last_messages_async(user_id, limit=self.fetch_messages)
+        return self.bound(messages, self._summaries.get(user_id))
+
+    def note_turn(self, user_id: str) -> None:
+        """
+        Count a chat turn; every summary_every turns, refresh the user's summary in
+        the background. Must be called from the event loop.
+        """
+        if not self.summaries_enabled or not async_client or not user_id:
+            return
+        turns = self._turns.get(user_id, 0) + 1
+        self._remember(self._turns, user_id, turns)
+        if turns % self.summary_every or user_id in self._refreshing:
+            return
+        self._refreshing.add(user_id)
+        task = asyncio.get_running_loop().create_task(self._refresh_summary(user_id))
+        # Keep a reference until done so the task is not garbage-collected
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refresh_summary(self, user_id: str) -> None:
+        try:
+            messages = await get_last_messages_async(user_id, limit=2 * self.summary_every)
+            if not messages:
+                return
+            transcript = "\n".join(
+                f"{m['role'].capitalize()}: {strip_follow_ups(m['content']) if m['role'] != 'user' else m['content']}"
+                for m in messages
+            )
+            previous = self._summaries.get(user_id) or "None."
+            completion = await async_client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[
+                    {"role": "system", "content": SUMMARY_PROMPT},
+                    {"role": "user", "content": f"Previous summary: {previous}\n\nNew messages:\n{transcript}"},
+                ],
+                temperature=0.2,
+                max_tokens=160,
+            )
+            summary = (completion.choices[0].message.content or "").strip()
+            if summary:
+                self._remember(self._summaries, user_id, summary)
+                self.summary_refreshes += 1
+                logger.info(f"Conversation summary refreshed for {user_id} ({count_tokens(summary)} tokens)")
+        except Exception as e:
+            # The previous summary (if any) stays in use
+            logger.warning(f"Conversation summary refresh failed for {user_id}: {e}")
+        finally:
+            self._refreshing.discard(user_id)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "summaries": len(self._summaries),
+            "refreshing": len(self._refreshing),
+            "summary_refreshes": self.summary_refreshes,
+        }
+
+
+# Module-level singleton instance
+_manager_instance = None
+
+
+def get_history_manager() -> HistoryManager:
+    """
+    Get or create the process-wide HistoryManager, configured with
+    HISTORY_TOKEN_BUDGET, HISTORY_FETCH_MESSAGES, HISTORY_SUMMARY_EVERY_TURNS,
+    HISTORY_SUMMARY_MAX_USERS and HISTORY_SUMMARY_ENABLED.
+    """
+    global _manager_instance
+    if _manager_instance is None:
+        _manager_instance = HistoryManager(
+            token_budget=int(os.getenv("HISTORY_TOKEN_BUDGET", "600")),
+            fetch_messages=int(os.getenv("HISTORY_FETCH_MESSAGES", "10")),
+            summary_every=int(os.getenv("HISTORY_SUMMARY_EVERY_TURNS", "6")),
+            max_users=int(os.getenv("HISTORY_SUMMARY_MAX_USERS", "5000")),
+            summaries_enabled=os.getenv("HISTORY_SUMMARY_ENABLED", "true").lower() in ("1", "true", "yes"),
+        )
+    return _manager_instance
@@ -0,0 +1,168 @@
+# modules/intent_engine.py
+"""
+Serves the patient-facing "intent" sentence of a chat response from a
+pre-generated library instead of an LLM call per turn.
+
+The library (intent_library.json) holds curated sentences per
+(route, topic, language) and is refreshed offline with
+generate_intent_library.py. Topics come from ModelGateway.get_intent_topic.
+Several variants per key are served round-robin so repeat visitors do not
+see the same sentence every time.
+
+A language the library has no sentences for (e.g. Telugu while only the
+--seed-only English library is committed) still gets an LLM-generated
+sentence in that language (get_intent_async, INTENT_LLM_FALLBACK) rather
+than the English one.
+"""
+
+import json
+import logging
+import os
+import threading
+from typing import Dict, List, Optional
+
+from modules.model_gateway import ModelGateway, Route, get_model_gateway
+from modules.response_builder import generate_intent_async
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+INTENT_LIBRARY_PATH = os.getenv(
+    "INTENT_LIBRARY_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "intent_library.json"),
+)
+INTENT_LANGUAGES = ("English", "Telugu", "Tinglish")
+FALLBACK_LANGUAGE = "English"
+INTENT_LLM_FALLBACK = os.getenv("INTENT_LLM_FALLBACK", "true").lower() in ("1", "true", "yes")
+
+
+def seed_library(gateway: ModelGateway) -> Dict[str, Dict[str, Dict[str, List[str]]]]:
+    """
+    Build the English-only library from the gateway's curated sentences.
+    Used when no library file exists and as the starting point of generate_intent_library.py.
+
+    Returns:
+        {route: {topic: {language: [sentences]}}}
+    """
+    library: Dict[str, Dict[str, Dict[str, List[str]]]] = {}
+    for route in Route:
+        topics = library.setdefault(route.value, {})
+        for topic, sentence in gateway.ROUTE_INTENTS.get(route, {}).items():
+            topics[topic] = {FALLBACK_LANGUAGE: [sentence]}
+        if route != Route.SLM_DIRECT:
+            for topic, sentence in gateway.TOPIC_INTENTS.items():
+                topics[topic] = {FALLBACK_LANGUAGE: [sentence]}
+    return library
+
+
+class IntentEngine:
+    """
+    Deterministic, in-memory intent lookup with per-key rotation.
+    """
+
+    def __init__(
+        self,
+        library_path: Optional[str] = INTENT_LIBRARY_PATH,
+        gateway: Optional[ModelGateway] = None,
+        llm_fallback: bool = INTENT_LLM_FALLBACK,
+    ):
+        """
+        Args:
+            library_path: JSON library written by generate_intent_library.py
+            gateway: ModelGateway used for topic detection (defaults to the singleton)
+            llm_fallback: Generate the sentence with the LLM for languages the library lacks
+        """
+        self.gateway = gateway or get_model_gateway()
+        self.llm_fallback = llm_fallback
+        self._rotation: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.library = self._load(library_path)
+
+    def _load(self, path: Optional[str]) -> Dict[str, Dict[str, Dict[str, List[str]]]]:
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                library = data.get("intents", {})
+                logger.info(f"Loaded intent library {path} (version {data.get('version')})")
+                return library
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not read intent library {path}, using built-in sentences: {e}")
+        else:
+            logger.info("No intent library file found, using built-in sentences")
+        return seed_library(self.gateway)
+
+    def _variants(self, route: Route, topic: str, language: str) -> List[str]:
+        topics = self.library.get(route.value, {})
+        # The user's language first (exact topic, then the route's general
+        # sentence), then the same in English
+        for lang in (language, FALLBACK_LANGUAGE):
+            for key in (topic, "general"):
+                variants = (topics.get(key) or {}).get(lang)
+                if variants:
+                    return variants
+        return []
+
+    def covers(self, route: Route, topic: str, language: str) -> bool:
+        """Whether the library has sentences in `language` for this route and topic."""
+        topics = self.library.get(route.value, {})
+        return any((topics.get(key) or {}).get(language) for key in (topic, "general"))
+
+    def get_intent(self, user_text: str, route: Route, language: str = FALLBACK_LANGUAGE) -> str:
+        """
+        Intent sentence for a response, from the library only (English when
+        the library lacks the language).
+
+        Args:
+            user_text: User's input message
+            route: Route the response was generated on
+            language: Detected language label ("English", "Telugu", "Tinglish")
+
+        Returns:
+            One curated sentence, rotating through the variants of its key
+        """
+        return self._pick(route, self.gateway.get_intent_topic(user_text, route), language, user_text)
+
+    async def get_intent_async(self, user_text: str, route: Route, language: str = FALLBACK_LANGUAGE) -> str:
+        """
+        Intent sentence for a response: from the library, or generated by the
+        LLM (llm_fallback) when the library has nothing in the user's language.
+        """
+        topic = self.gateway.get_intent_topic(user_text, route)
+        if (
+            self.llm_fallback
+            and language in INTENT_LANGUAGES
+            and language != FALLBACK_LANGUAGE
+            and not self.covers(route, topic, language)
+        ):
+            return await generate_intent_async(user_text, language)
+        return self._pick(route, topic, language, user_text)
+
+    def _pick(self, route: Route, topic: str, language: str, user_text: str) -> str:
+        variants = self._variants(route, topic, language)
+        if not variants:
+            return self.gateway.get_intent_description(user_text, route)
+
+        key = f"{route.value}|{topic}|{language}"
+        with self._lock:
+            index = self._rotation.get(key, 0)
+            self._rotation[key] = index + 1
+        return variants[index % len(variants)]
+
+
+# Module-level singleton instance
+_engine_instance = None
+
+
+def get_intent_engine() -> IntentEngine:
+    """
+    Get or create a singleton IntentEngine instance.
+
+    Returns:
+        IntentEngine instance
+    """
+    global _engine_instance
+    if _engine_instance is None:
+        _engine_instance = IntentEngine()
+    return _engine_instance
@@ -0,0 +1,164 @@
+# modules/lexical_router.py
+"""
+Keyword/phrase router that runs before any embedding call.
+
+Obvious messages ("hi", "thanks", "ok", "clinic address in vizag") are
+routed from a precompiled Aho-Corasick automaton in microseconds. The same
+matcher provides a best-effort route when embeddings are unavailable.
+"""
+
+import re
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+_NON_WORD = re.compile(r"[^\w\s']+", re.UNICODE)
+_SPACES = re.compile(r"\s+")
+
+# Words that may accompany a greeting without changing its meaning ("hi sakhi", "thanks dear")
+FILLER_WORDS = {"sakhi", "dear", "so", "very", "much", "and", "again", "ji", "madam", "mam", "maam"}
+
+
+def normalize(text: str) -> str:
+    """Lowercase, drop punctuation/emojis and collapse whitespace."""
+    text = _NON_WORD.sub(" ", (text or "").lower())
+    return _SPACES.sub(" ", text).strip()
+
+
+class AhoCorasick:
+    """
+    Minimal Aho-Corasick automaton over characters.
+    Matches are reported only on word boundaries so "hi" does not fire inside "this".
+    """
+
+    def __init__(self, patterns: Dict[str, str]):
+        """
+        Args:
+            patterns: Mapping of (normalized) phrase -> label
+        """
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[str, str]]] = [[]]
+
+        for phrase, label in patterns.items():
+            phrase = normalize(phrase)
+            if not phrase:
+                continue
+            state = 0
+            for char in phrase:
+                nxt = self._goto[state].get(char)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][char] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = nxt
+            self._out[state].append((phrase, label))
+
+        # Breadth-first construction of failure links
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find_all(self, text: str) -> List[Tuple[int, int, str, str]]:
+        """
+        Find all whole-word phrase occurrences in an already-normalized text.
+
+        Returns:
+            List of (start, end, phrase, label)
+        """
+        matches = []
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for phrase, label in self._out[state]:
+                start = index - len(phrase) + 1
+                end = index + 1
+                if (start == 0 or text[start - 1] == " ") and (end == len(text) or text[end] == " "):
+                    matches.append((start, end, phrase, label))
+        return matches
+
+
+class LexicalRouter:
+    """
+    Decides a routing category from keywords alone when it is confident.
+
+    Categories returned: "small_talk", "facility_info", "medical_complex", "medical_simple".
+    """
+
+    def __init__(
+        self,
+        small_talk_phrases: Iterable[str],
+        facility_keywords: Iterable[str],
+        medical_keywords: Iterable[str],
+        urgent_keywords: Iterable[str],
+    ):
+        patterns: Dict[str, str] = {}
+        # Later assignments win, so the more safety-relevant labels are added last
+        for phrase in small_talk_phrases:
+            patterns[normalize(phrase)] = "small_talk"
+        for phrase in facility_keywords:
+            patterns[normalize(phrase)] = "facility_info"
+        for phrase in medical_keywords:
+            patterns[normalize(phrase)] = "medical"
+        for phrase in urgent_keywords:
+            patterns[normalize(phrase)] = "urgent"
+        self._automaton = AhoCorasick(patterns)
+
+    def _labels(self, text: str) -> Tuple[str, List[Tuple[int, int, str, str]], Set[str]]:
+        normalized = normalize(text)
+        matches = self._automaton.find_all(normalized)
+        return normalized, matches, {label for _, _, _, label in matches}
+
+    def match(self, text: str) -> Optional[str]:
+        """
+        Confident category for obvious messages, or None to fall through to embeddings.
+
+        - small_talk: every word of the message is covered by small-talk phrases or fillers
+        - facility_info: a facility keyword with no medical or urgent term present
+        """
+        normalized, matches, labels = self._labels(text)
+        if not normalized:
+            return None
+
+        if labels == {"small_talk"}:
+            covered = [False] * len(normalized)
+            for start, end, _, _ in matches:
+                for i in range(start, end):
+                    covered[i] = True
+            leftover = "".join(" " if covered[i] else c for i, c in enumerate(normalized)).split()
+            if all(word in FILLER_WORDS for word in leftover):
+                return "small_talk"
+
+        if "facility_info" in labels and not labels & {"medical", "urgent"}:
+            return "facility_info"
+
+        return None
+
+    def fallback(self, text: str) -> str:
+        """
+        Best-effort category when embeddings are unavailable. Leans towards the
+        safest route: anything medical-looking or unknown goes to medical_complex.
+        """
+        confident = self.match(text)
+        if confident:
+            return confident
+
+        _, _, labels = self._labels(text)
+        if "urgent" in labels:
+            return "medical_complex"
+        if "medical" in labels:
+            return "medical_simple"
+        if labels == {"small_talk"} and len(normalize(text).split()) <= 4:
+            return "small_talk"
+        return "medical_complex"
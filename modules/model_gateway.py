@@ -1,10 +1,14 @@
 # modules/model_gateway.py
+import hashlib
+import json
 import logging
+import os
 from enum import Enum
-from typing import List
+from typing import Dict, List, Optional, Sequence, Tuple
 import numpy as np
 
-from rag import generate_embedding, generate_embeddings
+from modules.lexical_router import LexicalRouter
+from rag import EMBEDDING_MODEL, generate_embedding, generate_embedding_async, generate_embeddings
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -242,97 +246,338 @@ class ModelGateway:
         "how to reach the clinic",
     ]
     
+    # Keyword lists per medical topic (used for intent text and the lexical router)
+    TOPIC_KEYWORDS = {
+        "IVF": ["ivf", "in vitro", "vitro fertilization"],
+        "IUI": ["iui", "intrauterine insemination"],
+        "ICSI": ["icsi", "intracytoplasmic"],
+        "PCOS": ["pcos", "polycystic ovary"],
+        "PCOD": ["pcod", "polycystic ovarian disease"],
+        "Fertility": ["fertility", "fertile", "infertility", "infertile"],
+        "Pregnancy": ["pregnancy", "pregnant", "conception", "conceive"],
+        "Egg Freezing": ["egg freezing", "oocyte freezing", "freeze eggs"],
+        "Sperm Freezing": ["sperm freezing", "freeze sperm"],
+        "Embryo Freezing": ["embryo freezing", "freeze embryo"],
+        "Laparoscopy": ["laparoscopy", "laparoscopic"],
+        "Hysteroscopy": ["hysteroscopy", "hysteroscopic"],
+        "Surrogacy": ["surrogacy", "surrogate"],
+        "C-Section": ["c section", "c-section", "cesarean", "caesarean"],
+        "Natural Birth": ["natural birth", "normal delivery", "vaginal delivery"],
+        "Postpartum": ["postpartum", "after delivery", "post pregnancy"],
+        "Male Infertility": ["male infertility", "sperm count", "sperm quality", "low sperm"],
+        "Female Infertility": ["female infertility", "ovulation", "anovulation"],
+    }
+    
+    # Lexical fast-path vocabulary (see modules/lexical_router.py)
+    LEXICAL_FACILITY_KEYWORDS = [
+        "clinic", "clinics", "address", "location", "branch", "branches",
+        "phone number", "contact number", "contact details", "timings", "clinic timings",
+        "vizag", "visakhapatnam", "hyderabad", "vijayawada", "near me",
+    ]
+    LEXICAL_MEDICAL_KEYWORDS = [
+        "period", "periods", "sperm", "egg", "eggs", "embryo", "hormone", "hormones",
+        "medicine", "medicines", "tablet", "tablets", "scan", "test", "tests",
+        "symptom", "symptoms", "treatment", "doctor", "cost", "diet",
+    ]
+    LEXICAL_URGENT_KEYWORDS = [
+        "bleeding", "severe", "emergency", "urgent", "not moving", "pain",
+        "breathing", "vision", "preeclampsia", "miscarriage", "fever", "faint", "fainted",
+    ]
+    
+    # Lexical category -> Route
+    CATEGORY_ROUTES = {
+        "small_talk": Route.SLM_DIRECT,
+        "facility_info": Route.SLM_RAG,
+        "medical_simple": Route.SLM_RAG,
+        "medical_complex": Route.OPENAI_RAG,
+    }
+    
     # Similarity thresholds for routing decisions
+    # Tuned for the "mean" vote (cosine similarity to the category's mean anchor
+    # vector). The kNN votes score higher, so these still need recalibrating with
+    # test_routing.py against live embeddings before "topk" / "max" are used.
     SMALL_TALK_THRESHOLD = 0.75  # High confidence needed for small talk
     MEDICAL_SIMPLE_THRESHOLD = 0.65  # Moderate confidence for simple medical
     FACILITY_INFO_THRESHOLD = 0.50  # Lower threshold for facility/location queries to catch more
     
+    # "mean" = similarity to the category's mean anchor vector (what the thresholds
+    # were tuned for), "topk" = mean of the k best example similarities per
+    # category, "max" = best single example
+    ROUTING_VOTE = os.getenv("ROUTING_VOTE", "mean")
+    ROUTING_TOP_K = int(os.getenv("ROUTING_TOP_K", "3"))
+    
+    CATEGORIES = ("small_talk", "medical_simple", "medical_complex", "facility_info")
+    
+    # Directory holding the precomputed anchor embedding artifact
+    ANCHOR_ARTIFACT_DIR = os.getenv("MODEL_GATEWAY_ANCHOR_DIR", "artifacts")
+    
     def __init__(self):
-        """Initialize the gateway by computing anchor vectors."""
+        """Initialize the gateway by loading (or computing) anchor vectors."""
+        medical_keywords = [kw for keywords in self.TOPIC_KEYWORDS.values() for kw in keywords]
+        self.lexical_router = LexicalRouter(
+            small_talk_phrases=self.SMALL_TALK_EXAMPLES,
+            facility_keywords=self.LEXICAL_FACILITY_KEYWORDS,
+            medical_keywords=medical_keywords + self.LEXICAL_MEDICAL_KEYWORDS,
+            urgent_keywords=self.LEXICAL_URGENT_KEYWORDS,
+        )
+        
+        anchor_matrix = self._load_or_build_anchor_matrix()
+        if anchor_matrix is None:
+            logger.warning("OPENAI_API_KEY missing and no anchor artifact found. ModelGateway initialized without anchor vectors. decide_route will use the lexical fallback.")
+            self.anchor_matrix = None
+            self.anchor_labels = None
+            return
+        
+        # One row per example, L2-normalized so a single matmul yields cosine similarities
+        matrix = np.asarray(anchor_matrix, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self.anchor_matrix = np.ascontiguousarray(matrix / norms, dtype=np.float32)
+        
+        # Category index of every row (rows are stored category by category)
+        labels = []
+        for index, name in enumerate(self.CATEGORIES):
+            labels.extend([index] * len(self._anchor_sets()[name]))
+        self.anchor_labels = np.asarray(labels, dtype=np.int8)
+        self._category_rows = [np.flatnonzero(self.anchor_labels == i) for i in range(len(self.CATEGORIES))]
+        
+        # Normalized category mean vectors, one row per category (ROUTING_VOTE=mean)
+        means = np.stack([matrix[rows].mean(axis=0) for rows in self._category_rows])
+        mean_norms = np.linalg.norm(means, axis=1, keepdims=True)
+        mean_norms[mean_norms == 0] = 1.0
+        self._category_means = np.ascontiguousarray(means / mean_norms, dtype=np.float32)
+        
+        logger.info(f"ModelGateway initialized successfully ({self.anchor_matrix.shape[0]} anchor examples)")
+    
+    @classmethod
+    def _anchor_sets(cls) -> Dict[str, List[str]]:
+        """Example texts per category, in the row order of the anchor matrix."""
+        medical_simple = []
+        for category_list in cls.MEDICAL_SIMPLE_EXAMPLES.values():
+            medical_simple.extend(category_list)
+        return {
+            "small_talk": list(cls.SMALL_TALK_EXAMPLES),
+            "medical_simple": medical_simple,
+            "medical_complex": list(cls.MEDICAL_COMPLEX_EXAMPLES),
+            "facility_info": list(cls.FACILITY_INFO_EXAMPLES),
+        }
+    
+    @classmethod
+    def anchor_artifact_path(cls) -> str:
+        """
+        Path of the anchor artifact for the current example lists and embedding model.
+        The file name embeds a hash of both, so editing any example list (or the model)
+        points to a new file and triggers a one-time re-embed.
+        """
+        fingerprint = json.dumps(
+            {"model": EMBEDDING_MODEL, "anchor_sets": cls._anchor_sets()},
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        version = hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(cls.ANCHOR_ARTIFACT_DIR, f"model_gateway_anchors_{version}.npy")
+    
+    def _load_or_build_anchor_matrix(self) -> Optional[np.ndarray]:
+        """
+        Load the stacked float32 anchor embeddings (one row per example) with mmap,
+        or embed all examples in one batch and save them when no artifact exists.
+        
+        Returns:
+            Matrix of shape (n_examples, dim), or None if it cannot be obtained
+        """
         from rag import client
+        
+        path = self.anchor_artifact_path()
+        expected_rows = sum(len(texts) for texts in self._anchor_sets().values())
+        
+        if os.path.exists(path):
+            try:
+                matrix = np.load(path, mmap_mode="r")
+                if matrix.ndim == 2 and matrix.shape[0] == expected_rows:
+                    logger.info(f"Loaded ModelGateway anchor vectors from {path}")
+                    return matrix
+                logger.warning(f"Anchor artifact {path} has shape {matrix.shape}, expected {expected_rows} rows. Re-embedding.")
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not load anchor artifact {path}: {e}. Re-embedding.")
+        
         if client is None:
-            logger.warning("OPENAI_API_KEY missing. ModelGateway initialized without anchor vectors. decide_route will fail.")
-            self.small_talk_anchor = None
-            self.medical_simple_anchor = None
-            self.medical_complex_anchor = None
-            self.facility_info_anchor = None
-            return
-
+            return None
+        
         logger.info("Initializing ModelGateway with anchor vectors...")
+        texts = [text for texts in self._anchor_sets().values() for text in texts]
+        # Use batched embeddings for performance
+        matrix = np.asarray(generate_embeddings(texts), dtype=np.float32)
         
-        # Compute mean anchor vectors for each category
-        self.small_talk_anchor = self._compute_mean_vector(self.SMALL_TALK_EXAMPLES)
-        self.medical_simple_anchor = self._compute_mean_vector(self.MEDICAL_SIMPLE_EXAMPLES)
-        self.medical_complex_anchor = self._compute_mean_vector(self.MEDICAL_COMPLEX_EXAMPLES)
-        self.facility_info_anchor = self._compute_mean_vector(self.FACILITY_INFO_EXAMPLES)
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            # Write to a temp file and rename so concurrently booting workers never read a partial file
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, matrix)
+            os.replace(tmp_path, path)
+            logger.info(f"Saved ModelGateway anchor vectors to {path}")
+        except OSError as e:
+            logger.warning(f"Could not save anchor artifact {path}: {e}")
         
-        logger.info("ModelGateway initialized successfully")
+        return matrix
     
-    def _compute_mean_vector(self, examples) -> np.ndarray:
+    def score_vectors(self, query_vectors) -> List[Dict[str, float]]:
         """
-        Compute the mean embedding vector for a collection of example texts.
+        Score a batch of query embeddings against every anchor example with one matmul.
         
         Args:
-            examples: List of example texts or dict of lists of example texts
+            query_vectors: Array-like of shape (n_queries, dim) or (dim,)
             
         Returns:
-            Mean embedding vector as numpy array
+            One {category: vote} dict per query (see ROUTING_VOTE / ROUTING_TOP_K)
+        """
+        queries = np.atleast_2d(np.asarray(query_vectors, dtype=np.float32))
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        queries = queries / norms
+        
+        if self.ROUTING_VOTE not in ("topk", "max"):
+            votes = queries @ self._category_means.T  # (n_queries, n_categories)
+            return [
+                {name: float(row[index]) for index, name in enumerate(self.CATEGORIES)}
+                for row in votes
+            ]
+        
+        similarities = queries @ self.anchor_matrix.T  # (n_queries, n_examples)
+        votes = np.empty((queries.shape[0], len(self.CATEGORIES)), dtype=np.float32)
+        for index, rows in enumerate(self._category_rows):
+            category_sims = similarities[:, rows]
+            if self.ROUTING_VOTE == "max":
+                votes[:, index] = category_sims.max(axis=1)
+            else:
+                k = min(max(self.ROUTING_TOP_K, 1), category_sims.shape[1])
+                top_k = np.partition(category_sims, -k, axis=1)[:, -k:]
+                votes[:, index] = top_k.mean(axis=1)
+        
+        return [
+            {name: float(row[index]) for index, name in enumerate(self.CATEGORIES)}
+            for row in votes
+        ]
+    
+    def fast_route(self, user_text: str) -> Optional[Route]:
         """
-        # Flatten if it's a dictionary
-        if isinstance(examples, dict):
-            flattened = []
-            for category_list in examples.values():
-                flattened.extend(category_list)
-            texts = flattened
-        else:
-            texts = examples
+        Route obvious messages (plain greetings/thanks, clinic address or timing
+        questions) from keywords alone, without an embedding call.
+        
+        Args:
+            user_text: User's input message
             
-        if not texts:
+        Returns:
+            Route when the lexical match is confident, otherwise None
+        """
+        category = self.lexical_router.match(user_text)
+        if category is None:
             return None
-            
-        # Use batched embeddings for performance
-        embeddings = generate_embeddings(texts)
-        mean_vector = np.mean(embeddings, axis=0)
-        return mean_vector
+        route = self.CATEGORY_ROUTES[category]
+        logger.info(f"→ Routing to: {route.name} (lexical fast path: {category})")
+        return route
+    
+    def fallback_route(self, user_text: str, reason: str = "embedding unavailable") -> Route:
+        """Keyword-only routing used when embeddings are unavailable."""
+        route = self.CATEGORY_ROUTES[self.lexical_router.fallback(user_text)]
+        logger.warning(f"→ Routing to: {route.name} (lexical fallback, {reason})")
+        return route
     
-    def _cosine_similarity(self, vec1: np.ndarray, vec2: np.ndarray) -> float:
+    def decide_route(self, user_text: str, query_vector: Optional[Sequence[float]] = None) -> Route:
         """
-        Calculate cosine similarity between two vectors.
+        Determine the appropriate route for a user query based on semantic similarity.
+        Obvious messages are routed lexically first; if no embedding can be obtained,
+        the lexical router's fallback decides.
         
         Args:
-            vec1: First vector
-            vec2: Second vector
+            user_text: User's input message
+            query_vector: Precomputed embedding of user_text (skips the embedding call)
             
         Returns:
-            Cosine similarity score (0 to 1)
+            Route enum indicating which model to use
         """
-        dot_product = np.dot(vec1, vec2)
-        norm1 = np.linalg.norm(vec1)
-        norm2 = np.linalg.norm(vec2)
+        return self.decide_route_with_scores(user_text, query_vector)[0]
+    
+    def decide_route_with_scores(
+        self, user_text: str, query_vector: Optional[Sequence[float]] = None
+    ) -> Tuple[Route, Optional[Dict[str, float]]]:
+        """
+        Same as decide_route, but also returns the per-category kNN votes so callers
+        (e.g. the local signal classifier) can reuse them.
         
-        if norm1 == 0 or norm2 == 0:
-            return 0.0
+        Returns:
+            (route, scores); scores is None when routing was lexical
+        """
+        fast = self.fast_route(user_text)
+        if fast is not None:
+            return fast, None
+        if self.anchor_matrix is None:
+            return self.fallback_route(user_text, "no anchor vectors"), None
         
-        return dot_product / (norm1 * norm2)
+        # Generate embedding for user input unless the caller already has it
+        if query_vector is None:
+            try:
+                query_vector = generate_embedding(user_text)
+            except Exception as e:
+                return self.fallback_route(user_text, f"embedding failed: {e}"), None
+        scores = self.score_vectors(query_vector)[0]
+        return self._route_from_scores(user_text, scores), scores
     
-    def decide_route(self, user_text: str) -> Route:
+    async def decide_route_async(self, user_text: str, query_vector: Optional[Sequence[float]] = None) -> Route:
         """
-        Determine the appropriate route for a user query based on semantic similarity.
+        Async version of decide_route; the embedding call does not block the event loop.
         
         Args:
             user_text: User's input message
+            query_vector: Precomputed embedding of user_text (skips the embedding call)
             
         Returns:
             Route enum indicating which model to use
         """
-        # Generate embedding for user input
-        user_vector = np.array(generate_embedding(user_text))
+        fast = self.fast_route(user_text)
+        if fast is not None:
+            return fast
+        if self.anchor_matrix is None:
+            return self.fallback_route(user_text, "no anchor vectors")
+        
+        if query_vector is None:
+            try:
+                query_vector = await generate_embedding_async(user_text)
+            except Exception as e:
+                return self.fallback_route(user_text, f"embedding failed: {e}")
+        return self._route_from_scores(user_text, self.score_vectors(query_vector)[0])
+    
+    def decide_routes(self, texts: List[str]) -> List[Route]:
+        """
+        Route many messages at once: lexical fast path first, then one batched
+        embedding call and one matmul for the rest.
+        
+        Args:
+            texts: User messages
+            
+        Returns:
+            Route for each message, in input order
+        """
+        routes: List[Optional[Route]] = [self.fast_route(text) for text in texts]
+        pending = [i for i, route in enumerate(routes) if route is None]
+        if not pending:
+            return routes
+        if self.anchor_matrix is None:
+            return [route or self.fallback_route(text, "no anchor vectors") for text, route in zip(texts, routes)]
         
-        # Calculate similarities to each anchor
-        small_talk_sim = self._cosine_similarity(user_vector, self.small_talk_anchor)
-        medical_simple_sim = self._cosine_similarity(user_vector, self.medical_simple_anchor)
-        medical_complex_sim = self._cosine_similarity(user_vector, self.medical_complex_anchor)
-        facility_info_sim = self._cosine_similarity(user_vector, self.facility_info_anchor)
+        scores = self.score_vectors(generate_embeddings([texts[i] for i in pending]))
+        for i, score in zip(pending, scores):
+            routes[i] = self._route_from_scores(texts[i], score)
+        return routes
+    
+    def _route_from_scores(self, user_text: str, scores: Dict[str, float]) -> Route:
+        """
+        Apply the routing thresholds to the category votes of one message.
+        """
+        small_talk_sim = scores["small_talk"]
+        medical_simple_sim = scores["medical_simple"]
+        medical_complex_sim = scores["medical_complex"]
+        facility_info_sim = scores["facility_info"]
         
         # Log similarity scores for debugging
         logger.info(f"Query: '{user_text[:50]}...'")
@@ -366,70 +611,56 @@ class ModelGateway:
         logger.info(f"→ Routing to: OPENAI_RAG (low confidence, defaulting to safe option)")
         return Route.OPENAI_RAG
     
-    def get_intent_description(self, user_text: str, route: Route) -> str:
+    # Curated intent sentences (English seed of the intent library, see modules/intent_engine.py)
+    TOPIC_INTENTS = {
+        "IVF": "We're here to gently guide you through understanding IVF, so you feel informed and supported every step of the way.",
+        "IUI": "We want to help you understand IUI in a way that feels clear and reassuring as you explore your options.",
+        "ICSI": "We're here to explain ICSI with care, helping you feel confident and informed about this treatment approach.",
+        "PCOS": "We understand that PCOS can feel overwhelming, and we're here to provide gentle, clear information to support you.",
+        "PCOD": "We're here to help you understand PCOD with compassion, offering information that feels supportive and easy to understand.",
+        "Fertility": "We're here to walk alongside you on your fertility journey, offering information with warmth and understanding.",
+        "Pregnancy": "We're here to support you with caring information about pregnancy, helping you feel confident and nurtured.",
+        "Egg Freezing": "We're here to help you understand egg freezing in a supportive way, so you can make decisions that feel right for you.",
+        "Sperm Freezing": "We're here to provide clear, compassionate guidance about sperm freezing to help you plan for the future.",
+        "Embryo Freezing": "We're here to gently explain embryo freezing, helping you understand your options with care and clarity.",
+        "Laparoscopy": "We're here to help you understand laparoscopy with reassurance, so you know what to expect and feel prepared.",
+        "Hysteroscopy": "We want to help you feel at ease by explaining hysteroscopy in a gentle, supportive manner.",
+        "Surrogacy": "We're here to provide thoughtful, compassionate information about surrogacy to help you explore this path.",
+        "C-Section": "We're here to help you understand C-sections with care, so you feel informed and prepared for your journey.",
+        "Natural Birth": "We're here to support your understanding of natural birth with warmth and encouragement.",
+        "Postpartum": "We're here to gently guide you through the postpartum period with care and understanding.",
+        "Male Infertility": "We're here to provide supportive, compassionate information about male fertility, helping you feel understood.",
+        "Female Infertility": "We're here to walk with you through understanding female fertility with empathy and care.",
+    }
+    
+    ROUTE_INTENTS = {
+        Route.SLM_DIRECT: {
+            "greeting": "We're so glad you're here — this is a safe space where you can ask anything, and we're ready to listen.",
+            "thanks": "We're touched by your gratitude, and we're always here whenever you need support or guidance.",
+            "bye": "We're here whenever you need us — take care of yourself, and remember, you're never alone on this journey.",
+            "general": "We're here to listen and support you with warmth and understanding, no matter what's on your mind.",
+        },
+        Route.SLM_RAG: {
+            "facility": "We want to make it easy for you to connect with us, so here's the information you need to reach our care team.",
+            "general": "We're here to provide you with clear, caring information to help you feel more confident and supported.",
+        },
+        Route.OPENAI_RAG: {
+            "general": "We're here to offer you thoughtful, detailed guidance to help you understand your journey with clarity and compassion.",
+        },
+    }
+    
+    DEFAULT_INTENT = "We're here to support you with care and understanding — you're in a safe space."
+    
+    def get_intent_topic(self, user_text: str, route: Route) -> str:
         """
-        Generate a warm, empathetic, patient-facing intent description.
+        Pick the intent topic key for a message on a given route.
         
-        Args:
-            user_text: User's input message
-            route: The determined route for the query
-            
         Returns:
-            Empathetic, application-voice intent description
+            A TOPIC_INTENTS key (e.g. "IVF") or a ROUTE_INTENTS key
+            ("greeting", "thanks", "bye", "facility", "general")
         """
         user_lower = user_text.lower()
         
-        # Check for specific medical topics
-        topic_intents = {
-            "IVF": "We're here to gently guide you through understanding IVF, so you feel informed and supported every step of the way.",
-            "IUI": "We want to help you understand IUI in a way that feels clear and reassuring as you explore your options.",
-            "ICSI": "We're here to explain ICSI with care, helping you feel confident and informed about this treatment approach.",
-            "PCOS": "We understand that PCOS can feel overwhelming, and we're here to provide gentle, clear information to support you.",
-            "PCOD": "We're here to help you understand PCOD with compassion, offering information that feels supportive and easy to understand.",
-            "Fertility": "We're here to walk alongside you on your fertility journey, offering information with warmth and understanding.",
-            "Pregnancy": "We're here to support you with caring information about pregnancy, helping you feel confident and nurtured.",
-            "Egg Freezing": "We're here to help you understand egg freezing in a supportive way, so you can make decisions that feel right for you.",
-            "Sperm Freezing": "We're here to provide clear, compassionate guidance about sperm freezing to help you plan for the future.",
-            "Embryo Freezing": "We're here to gently explain embryo freezing, helping you understand your options with care and clarity.",
-            "Laparoscopy": "We're here to help you understand laparoscopy with reassurance, so you know what to expect and feel prepared.",
-            "Hysteroscopy": "We want to help you feel at ease by explaining hysteroscopy in a gentle, supportive manner.",
-            "Surrogacy": "We're here to provide thoughtful, compassionate information about surrogacy to help you explore this path.",
-            "C-Section": "We're here to help you understand C-sections with care, so you feel informed and prepared for your journey.",
-            "Natural Birth": "We're here to support your understanding of natural birth with warmth and encouragement.",
-            "Postpartum": "We're here to gently guide you through the postpartum period with care and understanding.",
-            "Male Infertility": "We're here to provide supportive, compassionate information about male fertility, helping you feel understood.",
-            "Female Infertility": "We're here to walk with you through understanding female fertility with empathy and care.",
-        }
-        
-        # Check for detected topic
-        topic_keywords = {
-            "IVF": ["ivf", "in vitro", "vitro fertilization"],
-            "IUI": ["iui", "intrauterine insemination"],
-            "ICSI": ["icsi", "intracytoplasmic"],
-            "PCOS": ["pcos", "polycystic ovary"],
-            "PCOD": ["pcod", "polycystic ovarian disease"],
-            "Fertility": ["fertility", "fertile", "infertility", "infertile"],
-            "Pregnancy": ["pregnancy", "pregnant", "conception", "conceive"],
-            "Egg Freezing": ["egg freezing", "oocyte freezing", "freeze eggs"],
-            "Sperm Freezing": ["sperm freezing", "freeze sperm"],
-            "Embryo Freezing": ["embryo freezing", "freeze embryo"],
-            "Laparoscopy": ["laparoscopy", "laparoscopic"],
-            "Hysteroscopy": ["hysteroscopy", "hysteroscopic"],
-            "Surrogacy": ["surrogacy", "surrogate"],
-            "C-Section": ["c section", "c-section", "cesarean", "caesarean"],
-            "Natural Birth": ["natural birth", "normal delivery", "vaginal delivery"],
-            "Postpartum": ["postpartum", "after delivery", "post pregnancy"],
-            "Male Infertility": ["male infertility", "sperm count", "sperm quality", "low sperm"],
-            "Female Infertility": ["female infertility", "ovulation", "anovulation"],
-        }
-        
-        detected_topic = None
-        for topic, keywords in topic_keywords.items():
-            if any(kw in user_lower for kw in keywords):
-                detected_topic = topic
-                break
-        
-        # Generate intent based on route and topic
         if route == Route.SLM_DIRECT:
             # Small talk / greetings
             greetings = ["hi", "hello", "hey", "good morning", "good afternoon", "good evening"]
@@ -437,30 +668,43 @@ class ModelGateway:
             bye = ["bye", "goodbye", "see you"]
             
             if any(g in user_lower for g in greetings):
-                return "We're so glad you're here — this is a safe space where you can ask anything, and we're ready to listen."
+                return "greeting"
             elif any(t in user_lower for t in thanks):
-                return "We're touched by your gratitude, and we're always here whenever you need support or guidance."
+                return "thanks"
             elif any(b in user_lower for b in bye):
-                return "We're here whenever you need us — take care of yourself, and remember, you're never alone on this journey."
-            else:
-                return "We're here to listen and support you with warmth and understanding, no matter what's on your mind."
+                return "bye"
+            return "general"
         
-        elif route == Route.SLM_RAG:
+        if route == Route.SLM_RAG:
             # Check for facility/location queries
             facility_keywords = ["clinic", "address", "location", "phone", "contact", "branch", "vizag", "hyderabad", "vijayawada", "where", "timing"]
             if any(fk in user_lower for fk in facility_keywords):
-                return "We want to make it easy for you to connect with us, so here's the information you need to reach our care team."
-            
-            if detected_topic:
-                return topic_intents.get(detected_topic, "We're here to provide you with clear, caring information to help you feel more confident and supported.")
-            return "We're here to provide you with clear, caring information to help you feel more confident and supported."
+                return "facility"
         
-        elif route == Route.OPENAI_RAG:
-            if detected_topic:
-                return topic_intents.get(detected_topic, "We're here to offer you thoughtful, detailed guidance to help you understand your journey with clarity and compassion.")
-            return "We're here to offer you thoughtful, detailed guidance to help you understand your journey with clarity and compassion."
+        # Check for specific medical topics
+        for topic, keywords in self.TOPIC_KEYWORDS.items():
+            if any(kw in user_lower for kw in keywords):
+                return topic
+        return "general"
+    
+    def get_intent_description(self, user_text: str, route: Route) -> str:
+        """
+        Generate a warm, empathetic, patient-facing intent description.
         
-        return "We're here to support you with care and understanding — you're in a safe space."
+        Args:
+            user_text: User's input message
+            route: The determined route for the query
+            
+        Returns:
+            Empathetic, application-voice intent description
+        """
+        topic = self.get_intent_topic(user_text, route)
+        route_intents = self.ROUTE_INTENTS.get(route, {})
+        if topic in route_intents:
+            return route_intents[topic]
+        if topic in self.TOPIC_INTENTS:
+            return self.TOPIC_INTENTS[topic]
+        return route_intents.get("general", self.DEFAULT_INTENT)
 
 
 # Module-level singleton instance
@@ -477,4 +721,13 @@ def get_model_gateway() -> ModelGateway:
     global _gateway_instance
     if _gateway_instance is None:
         _gateway_instance = ModelGateway()
-    return _gateway_instance
\ No newline at end of file
+    return _gateway_instance
+
+
+if __name__ == "__main__":
+    # Build (or verify) the anchor artifact ahead of deployment:
+    #   python -m modules.model_gateway
+    gateway = get_model_gateway()
+    if gateway.anchor_matrix is None:
+        raise SystemExit("Could not build anchor vectors (OPENAI_API_KEY missing?)")
+    print(f"Anchor artifact ready: {ModelGateway.anchor_artifact_path()}")
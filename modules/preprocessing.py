@@ -1,7 +1,10 @@
 # modules/preprocessing.py
 
 import re
-from langdetect import detect
+from langdetect import DetectorFactory, detect, detect_langs
+
+# Make langdetect deterministic across calls
+DetectorFactory.seed = 0
 
 def clean_text(text: str) -> str:
     """
@@ -33,3 +36,77 @@ def detect_language(text: str) -> str:
         return lang
     except:
         return "en"
+
+
+# ================== LOCAL LANGUAGE DETECTION ==================
+# Labels match what the LLM classifier returns ("Telugu", "English", "Tinglish", ...)
+
+_TELUGU_CHAR = re.compile(r"[\u0C00-\u0C7F]")
+_LATIN_CHAR = re.compile(r"[A-Za-z]")
+
+# Common romanized Telugu words (and spelling variants) seen in Tinglish chats
+TINGLISH_LEXICON = {
+    "nenu", "naku", "naaku", "nannu", "naa", "maa", "memu", "meeru", "miru", "mee", "nuvvu", "nee", "neeku",
+    "ela", "elaa", "enti", "emiti", "emi", "entha", "enta", "ekkada", "eppudu", "enduku", "evaru",
+    "undi", "unnaru", "unnanu", "unnava", "unnara", "ledu", "leru", "kadu", "kaadu", "avunu", "sare",
+    "cheppandi", "cheppu", "cheyali", "cheyyali", "chesanu", "chesaru", "kavali", "kaavali", "vaddu",
+    "ante", "aithe", "ayite", "ayindi", "ayyindi", "avutundi", "vachindi", "vastundi", "raledu", "ravatledu",
+    "chala", "chaala", "chaalaa", "baga", "baaga", "bagundi", "bagunnara", "bagunnanu", "konchem", "inka",
+    "andi", "garu", "amma", "akka", "papa", "babu", "pilla", "pillalu", "bidda", "kadupu", "noppi", "neppi",
+    "tho", "kuda", "kooda", "ippudu", "appudu", "roju", "rojulu", "nela", "nelalu",
+    "dhanyavadalu", "namaskaram", "bayam", "bhayam", "tinali", "tagali", "vellali", "telusu", "teliyadu",
+}
+
+_LANGDETECT_LABELS = {
+    "en": "English",
+    "te": "Telugu",
+    "hi": "Hindi",
+    "ta": "Tamil",
+    "kn": "Kannada",
+    "ml": "Malayalam",
+}
+
+# Labels the local detector may decide on its own; anything else (langdetect
+# often reports "so", "tl", "id", ... for short Tinglish) goes to the LLM classifier
+LOCAL_LANGUAGE_LABELS = {"English", "Telugu", "Tinglish"}
+
+
+def detect_language_label(text: str) -> tuple:
+    """
+    Detect Telugu / Tinglish / English locally, without an LLM call.
+
+    Order: Telugu script (Unicode block) -> Tinglish lexicon -> langdetect.
+
+    Returns:
+        (label, confidence) where confidence is in [0, 1]
+    """
+    if not text or not text.strip():
+        return "English", 0.0
+
+    telugu_chars = len(_TELUGU_CHAR.findall(text))
+    latin_chars = len(_LATIN_CHAR.findall(text))
+    if telugu_chars and telugu_chars >= latin_chars:
+        return "Telugu", 0.95
+
+    tokens = re.findall(r"[a-z]+", text.lower())
+    if tokens:
+        hits = sum(1 for token in tokens if token in TINGLISH_LEXICON)
+        ratio = hits / len(tokens)
+        if hits >= 2 or (hits == 1 and ratio >= 0.34):
+            return "Tinglish", min(0.95, 0.6 + ratio)
+        if hits == 1:
+            # One Telugu-looking word in an otherwise English sentence is ambiguous
+            return "Tinglish", 0.4
+
+    if len(tokens) <= 3 and telugu_chars == 0:
+        # Too short for langdetect; romanized Telugu would normally hit the lexicon
+        return "English", 0.8
+
+    try:
+        best = detect_langs(text)[0]
+        label = _LANGDETECT_LABELS.get(best.lang, best.lang)
+        if label not in LOCAL_LANGUAGE_LABELS:
+            return label, 0.0
+        return label, float(best.prob)
+    except Exception:
+        return "English", 0.0
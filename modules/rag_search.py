@@ -1,11 +1,19 @@
 # modules/rag_search.py
 import os
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 import supabase_client  # ensures .env is loaded once
 from openai import OpenAI
 
-from supabase_client import supabase_rpc, supabase_insert
+from supabase_client import supabase_insert
+from embedding_cache import get_embedding_cache
+from rag import generate_embedding_async
+from search_hierarchical import (
+    DOC_RPC_TIMEOUT,
+    FAQ_RPC_TIMEOUT,
+    run_rpcs_concurrently,
+    run_rpcs_concurrently_async,
+)
 
 EMBEDDING_MODEL = "text-embedding-3-small"
 
@@ -20,25 +28,48 @@ def _clean_text(text: str) -> str:
 
 
 def _generate_embedding(text: str) -> List[float]:
+    cache = get_embedding_cache()
+    cached = cache.get(text, EMBEDDING_MODEL)
+    if cached is not None:
+        return cached
     if not _client:
         raise ValueError("OPENAI_API_KEY missing. Cannot generate embeddings.")
     cleaned = _clean_text(text)
     resp = _client.embeddings.create(model=EMBEDDING_MODEL, input=cleaned)
-    return resp.data[0].embedding
+    embedding = resp.data[0].embedding
+    cache.put(text, EMBEDDING_MODEL, embedding)
+    return embedding
+
+
+def _kb_rpc_calls(embedding: List[float], limit: int) -> Dict[str, tuple]:
+    payload = {"query_embedding": embedding, "match_count": limit}
+    return {
+        "KB search": ("match_sakhi_kb", payload, DOC_RPC_TIMEOUT),
+        "FAQ search": ("match_faq", payload, FAQ_RPC_TIMEOUT),
+    }
 
 
 def search_sakhi_kb(text: str, limit: int = 3) -> List[dict]:
     """
-    Generate an embedding and query both match_sakhi_kb and match_faq RPCs.
+    Generate an embedding and query both match_sakhi_kb and match_faq RPCs (concurrently).
     Returns merged top-N results sorted by similarity.
     """
     embedding = _generate_embedding(text)
+    rows = run_rpcs_concurrently(_kb_rpc_calls(embedding, limit))
+    return _merge_kb_results(rows["KB search"], rows["FAQ search"], limit)
 
-    payload = {"query_embedding": embedding, "match_count": limit}
 
-    kb_results = supabase_rpc("match_sakhi_kb", payload)
-    faq_results = supabase_rpc("match_faq", payload)
+async def search_sakhi_kb_async(text: str, limit: int = 3, query_vector: Optional[List[float]] = None) -> List[dict]:
+    """
+    Async version of search_sakhi_kb; pass query_vector to reuse an existing embedding.
+    """
+    if query_vector is None:
+        query_vector = await generate_embedding_async(text)
+    rows = await run_rpcs_concurrently_async(_kb_rpc_calls(list(query_vector), limit))
+    return _merge_kb_results(rows["KB search"], rows["FAQ search"], limit)
+
 
+def _merge_kb_results(kb_results, faq_results, limit: int) -> List[dict]:
     merged: List[Dict] = []
 
     if isinstance(kb_results, list):
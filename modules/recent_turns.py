@@ -0,0 +1,202 @@
+# modules/recent_turns.py
+"""
+In-process ring buffer of each active user's most recent messages.
+
+modules/conversation.py appends every saved message and answers
+get_last_messages from here when it can, so most chat turns skip the
+sakhi_conversations history read.
+
+A user's buffer is only used once it was seeded from the database (it then
+holds everything since that read). Messages saved by another worker or pod
+are not appended here, so before a buffer is trusted the newest created_at of
+the user's rows is read (one indexed single-column row) and must be a message
+the buffer holds; otherwise the history is read again. With sticky routing
+(all of a user's requests reach one worker) RECENT_TURNS_VALIDATE=false skips
+that check. RECENT_TURNS_TTL_SECONDS bounds how long a buffer is used without
+any database confirmation.
+
+Messages appended while a seeding read is in flight are kept: take mark()
+before the read and pass it to seed().
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+
+def normalize_timestamp(value: Any) -> Optional[str]:
+    """
+    created_at as a naive-UTC ISO string with microseconds, so the payload value
+    ("2026-01-01T10:00:00.120000") and the PostgREST one
+    ("2026-01-01T10:00:00.12+00:00") compare equal.
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return str(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.isoformat(timespec="microseconds")
+
+
+def merge_history(history: List[Dict[str, Any]], newer: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    history followed by the messages of newer (both oldest first) that it does
+    not already end with. newer holds messages saved after or while history was
+    read, so the ones the read already returned are a prefix of it.
+    """
+    overlap = next(
+        (j for j in range(min(len(newer), len(history)), 0, -1) if history[-j:] == newer[:j]),
+        0,
+    )
+    return list(history) + list(newer[overlap:])
+
+
+class _UserBuffer:
+    def __init__(self, capacity: int):
+        # {"role", "content", "created_at"} oldest first
+        self.messages: deque = deque(maxlen=capacity)
+        self.checked_at = 0.0  # last seeded or validated against the database; 0 = never seeded
+        self.appended = 0  # messages appended so far (see RecentTurns.mark)
+
+
+class RecentTurns:
+    """
+    Thread-safe per-user ring buffers of {"role", "content"} messages, oldest first.
+    """
+
+    def __init__(self, capacity: int = 20, max_users: int = 10000, ttl_seconds: float = 300.0, validate: bool = True):
+        """
+        Args:
+            capacity: Messages kept per user (largest history limit that can be served)
+            max_users: Users kept; the least recently active user is dropped first
+            ttl_seconds: How long a buffer is used without a database read or validation
+            validate: Check the newest stored created_at before serving a buffer
+        """
+        self.capacity = capacity
+        self.max_users = max_users
+        self.ttl_seconds = ttl_seconds
+        self.validate = validate
+        self._buffers: "OrderedDict[str, _UserBuffer]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def _buffer(self, user_id: str) -> _UserBuffer:
+        buffer = self._buffers.get(user_id)
+        if buffer is None:
+            buffer = _UserBuffer(self.capacity)
+            self._buffers[user_id] = buffer
+            while len(self._buffers) > self.max_users:
+                self._buffers.popitem(last=False)
+        self._buffers.move_to_end(user_id)
+        return buffer
+
+    def append(self, user_id: str, role: str, content: str, created_at: Any = None) -> None:
+        """Record a message that was just saved."""
+        with self._lock:
+            buffer = self._buffer(user_id)
+            buffer.messages.append({"role": role, "content": content, "created_at": normalize_timestamp(created_at)})
+            buffer.appended += 1
+
+    def mark(self, user_id: str) -> int:
+        """Append position to pass to seed() when starting a database read."""
+        with self._lock:
+            buffer = self._buffers.get(user_id)
+            return buffer.appended if buffer is not None else 0
+
+    def seed(self, user_id: str, history: List[Dict[str, Any]], since: Optional[int] = None) -> None:
+        """
+        Reset a user's buffer to history read from the database (oldest first,
+        with "created_at"), followed by the messages appended after mark()
+        returned `since` (those the read already returned are not repeated).
+        """
+        with self._lock:
+            buffer = self._buffer(user_id)
+            newer: List[Dict[str, Any]] = []
+            if since is not None:
+                count = min(max(buffer.appended - since, 0), len(buffer.messages))
+                newer = list(buffer.messages)[len(buffer.messages) - count:] if count else []
+            merged = merge_history(history, newer)
+            buffer.messages.clear()
+            buffer.messages.extend(merged[-self.capacity:])
+            buffer.checked_at = time.time()
+
+    def servable(self, user_id: str, limit: int) -> bool:
+        """Whether get() could answer, before any validation read is spent on it."""
+        with self._lock:
+            buffer = self._buffers.get(user_id)
+            return (
+                buffer is not None
+                and bool(buffer.checked_at)
+                and time.time() - buffer.checked_at <= self.ttl_seconds
+                and limit <= self.capacity
+            )
+
+    def get(self, user_id: str, limit: int, newest_created_at: Any = None) -> Optional[List[Dict[str, str]]]:
+        """
+        Last `limit` messages (oldest first), or None when the buffer cannot answer
+        (never seeded, expired, limit above capacity, or - with validation - the
+        newest stored message is not one it holds).
+
+        Args:
+            newest_created_at: created_at of the user's newest row in the database
+                (None when there is none); only read when validate is set
+        """
+        with self._lock:
+            buffer = self._buffers.get(user_id)
+            if (
+                buffer is None
+                or not buffer.checked_at
+                or time.time() - buffer.checked_at > self.ttl_seconds
+                or limit > self.capacity
+            ):
+                self.misses += 1
+                return None
+            if self.validate:
+                newest = normalize_timestamp(newest_created_at)
+                if newest is not None and all(m["created_at"] != newest for m in buffer.messages):
+                    # Another worker saved a message for this user
+                    self.stale += 1
+                    self.misses += 1
+                    return None
+                buffer.checked_at = time.time()
+            self._buffers.move_to_end(user_id)
+            self.hits += 1
+            messages = list(buffer.messages)
+            if limit <= 0:
+                return []
+            return [{"role": m["role"], "content": m["content"]} for m in messages[-limit:]]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"users": len(self._buffers), "hits": self.hits, "misses": self.misses, "stale": self.stale}
+
+
+# Module-level singleton instance
+_buffer_instance = None
+
+
+def get_recent_turns() -> Optional[RecentTurns]:
+    """
+    Get or create the process-wide RecentTurns, or None when RECENT_TURNS_ENABLED
+    is false. Configured with RECENT_TURNS_CAPACITY, RECENT_TURNS_MAX_USERS,
+    RECENT_TURNS_TTL_SECONDS and RECENT_TURNS_VALIDATE.
+    """
+    global _buffer_instance
+    if os.getenv("RECENT_TURNS_ENABLED", "true").lower() not in ("1", "true", "yes"):
+        return None
+    if _buffer_instance is None:
+        _buffer_instance = RecentTurns(
+            capacity=int(os.getenv("RECENT_TURNS_CAPACITY", "20")),
+            max_users=int(os.getenv("RECENT_TURNS_MAX_USERS", "10000")),
+            ttl_seconds=float(os.getenv("RECENT_TURNS_TTL_SECONDS", "300")),
+            validate=os.getenv("RECENT_TURNS_VALIDATE", "true").lower() in ("1", "true", "yes"),
+        )
+    return _buffer_instance
@@ -1,19 +1,34 @@
 # modules/response_builder.py
+import json
 import os
-from typing import List, Optional, Dict, Tuple
+import re
+from typing import Any, AsyncIterator, List, Optional, Dict, Sequence, Tuple
 
 import supabase_client  # ensures .env is loaded once
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 
+from modules.answer_cache import FIRST_NAME_MAX_CHARS
+from modules.context_builder import context_token_budget
+from modules.model_gateway import Route
+from modules.preprocessing import detect_language_label
 from modules.rag_search import add_kb_entry
-from modules.text_utils import truncate_response
+from modules.text_utils import FOLLOW_UPS_MARKER, format_follow_ups, truncate_response
 # Import from root (assuming running from main.py)
-from search_hierarchical import hierarchical_rag_query, format_hierarchical_context
+from search_hierarchical import (
+    hierarchical_rag_query,
+    hierarchical_rag_query_async,
+    format_hierarchical_context,
+)
 
 _api_key = os.getenv("OPENAI_API_KEY")
 client = None
+async_client = None
 if _api_key:
     client = OpenAI(api_key=_api_key)
+    async_client = AsyncOpenAI(api_key=_api_key)
+
+# OPENAI_RAG turns get language, intent, reply and follow-ups from one structured call
+FUSED_MEDICAL_GENERATION = os.getenv("FUSED_MEDICAL_GENERATION", "true").lower() in ("1", "true", "yes")
 
 # Classifier system prompt (must be exact)
 CLASSIFIER_PROMPT = """
@@ -57,7 +72,91 @@ def classify_message(message: str) -> Dict[str, str]:
         temperature=0.2,
     )
 
-    content = completion.choices[0].message.content
+    return _parse_classification(completion.choices[0].message.content)
+
+
+async def classify_message_async(message: str) -> Dict[str, str]:
+    """
+    Async version of classify_message.
+    """
+    if not async_client:
+        return {"language": "en", "signal": "NO"}
+
+    completion = await async_client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "system", "content": CLASSIFIER_PROMPT},
+            {"role": "user", "content": message},
+        ],
+        temperature=0.2,
+    )
+
+    return _parse_classification(completion.choices[0].message.content)
+
+
+# Local classifier settings: below these confidences the LLM classifier is used instead
+LOCAL_LANGUAGE_MIN_CONFIDENCE = 0.75
+SIGNAL_YES_SIMILARITY = 0.55  # topical (medical/facility) category score needed for YES
+SIGNAL_NO_SIMILARITY = 0.75  # small-talk category score needed for NO
+SIGNAL_MARGIN = 0.10  # winning side must beat the other by this much
+
+# Topics from CLASSIFIER_PROMPT, as keywords
+SIGNAL_KEYWORDS = re.compile(
+    r"\b(ivf|iui|icsi|fertility|fertile|infertility|infertile|parenthood|pregnan\w*|ovulat\w*|"
+    r"treatment|cost|success rate|finance|emi|clinic\w*|doctor\w*|hospital\w*)\b",
+    re.IGNORECASE,
+)
+
+
+def classify_message_local(
+    message: str,
+    scores: Optional[Dict[str, float]] = None,
+    fast_route: Optional[Route] = None,
+    need_signal: bool = True,
+) -> Optional[Dict[str, str]]:
+    """
+    Classify language and signal without an LLM call.
+
+    Language comes from detect_language_label (Telugu script, Tinglish lexicon,
+    langdetect). The signal reuses the ModelGateway category scores of this message
+    (or the route chosen by the lexical fast path) plus the classifier's topic keywords.
+
+    Args:
+        need_signal: False when the route never reads the signal; only the
+            language then has to be confident ("signal" is None)
+
+    Returns:
+        {"language", "signal"} like classify_message, or None when either part is
+        low-confidence and the LLM classifier should decide.
+    """
+    language, language_confidence = detect_language_label(message)
+    if language_confidence < LOCAL_LANGUAGE_MIN_CONFIDENCE:
+        return None
+    if not need_signal:
+        return {"language": language, "signal": None}
+
+    signal = None
+    if SIGNAL_KEYWORDS.search(message or ""):
+        signal = "YES"
+    elif fast_route == Route.SLM_DIRECT:
+        signal = "NO"
+    elif fast_route == Route.SLM_RAG:
+        # The lexical fast path only picks SLM_RAG for clinic/facility questions
+        signal = "YES"
+    elif scores:
+        topical = max(scores["medical_simple"], scores["medical_complex"], scores["facility_info"])
+        small_talk = scores["small_talk"]
+        if topical >= SIGNAL_YES_SIMILARITY and topical - small_talk >= SIGNAL_MARGIN:
+            signal = "YES"
+        elif small_talk >= SIGNAL_NO_SIMILARITY and small_talk - topical >= SIGNAL_MARGIN:
+            signal = "NO"
+
+    if signal is None:
+        return None
+    return {"language": language, "signal": signal}
+
+
+def _parse_classification(content: str) -> Dict[str, str]:
     language = ""
     signal = ""
 
@@ -90,8 +189,8 @@ def _friendly_name(name: Optional[str]) -> Optional[str]:
     # shorten if very long
     parts = trimmed.split()
     candidate = parts[0]
-    if len(candidate) > 14:
-        candidate = candidate[:14]
+    if len(candidate) > FIRST_NAME_MAX_CHARS:
+        candidate = candidate[:FIRST_NAME_MAX_CHARS]
     return candidate
 
 
@@ -102,16 +201,18 @@ def _build_history_block(history: Optional[List[Dict[str, str]]]) -> str:
     for msg in history:
         role = msg.get("role", "user").capitalize()
         content = msg.get("content", "")
+        if role == "Summary":
+            # Rolling summary from modules/history_manager.py
+            lines.append(f"Summary of earlier conversation: {content}")
+            continue
         lines.append(f"{role}: {content}")
     return "\n".join(lines)
 
 
-def generate_smalltalk_response(
-    prompt: str,
+def _build_smalltalk_system_content(
     target_lang: str,
     history: Optional[List[Dict[str, str]]],
     user_name: Optional[str] = None,
-    store_to_kb: bool = False,
 ) -> str:
     user_name = _friendly_name(user_name)
     history_block = _build_history_block(history)
@@ -137,6 +238,17 @@ def generate_smalltalk_response(
         "Maintain continuity using the conversation history.\n"
         f"{history_block}"
     )
+    return system_content
+
+
+def generate_smalltalk_response(
+    prompt: str,
+    target_lang: str,
+    history: Optional[List[Dict[str, str]]],
+    user_name: Optional[str] = None,
+    store_to_kb: bool = False,
+) -> str:
+    system_content = _build_smalltalk_system_content(target_lang, history, user_name)
 
     if not client:
         return "I'm here to support you with warmth and care. (Missing API Key for full response)"
@@ -158,20 +270,121 @@ def generate_smalltalk_response(
     return final_text
 
 
-def generate_medical_response(
+async def generate_smalltalk_response_async(
     prompt: str,
     target_lang: str,
     history: Optional[List[Dict[str, str]]],
     user_name: Optional[str] = None,
-) -> Tuple[str, List[dict]]:
+    store_to_kb: bool = False,
+) -> str:
     """
-    Medical path: RAG + history.
-    Returns (final_text, kb_results)
+    Async version of generate_smalltalk_response.
     """
-    # Use Hierarchical RAG
-    kb_results = hierarchical_rag_query(prompt)
-    context_text = format_hierarchical_context(kb_results)
-    
+    system_content = _build_smalltalk_system_content(target_lang, history, user_name)
+
+    if not async_client:
+        return "I'm here to support you with warmth and care. (Missing API Key for full response)"
+
+    completion = await async_client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "system", "content": system_content},
+            {"role": "user", "content": prompt},
+        ],
+        temperature=0.4,
+    )
+
+    return truncate_response(completion.choices[0].message.content)
+
+
+async def stream_smalltalk_response(
+    prompt: str,
+    target_lang: str,
+    history: Optional[List[Dict[str, str]]],
+    user_name: Optional[str] = None,
+) -> AsyncIterator[str]:
+    """
+    Streaming version of generate_smalltalk_response.
+    Yields text deltas as the model produces them.
+    """
+    system_content = _build_smalltalk_system_content(target_lang, history, user_name)
+
+    if not async_client:
+        yield "I'm here to support you with warmth and care. (Missing API Key for full response)"
+        return
+
+    stream = await async_client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "system", "content": system_content},
+            {"role": "user", "content": prompt},
+        ],
+        temperature=0.4,
+        stream=True,
+    )
+    async for delta in _iter_stream_deltas(stream):
+        yield delta
+
+
+# Output layout of the medical prompt: plain text with a " Follow ups : " section
+TEXT_RESPONSE_RULES = (
+    "MANDATORY RESPONSE STRUCTURE:\n"
+    "1. Write your main conversational reply with caring tone. If a usable name is available, open with it naturally.\n"
+    "2. After the main reply, add EXACTLY two newline characters.\n"
+    "3. Write ' Follow ups : ' (space before 'Follow', space after 'ups', space after colon).\n"
+    "4. Immediately after the colon and space (NO extra newlines), write the first question.\n"
+    "5. Each subsequent question goes on a new line.\n"
+    "\n"
+    "EXACT FORMAT TO FOLLOW:\n"
+    "[Your main reply here, ending with punctuation.]\n"
+    "\n"
+    " Follow ups : What is your first question?\n"
+    "What is your second question?\n"
+    "What is your third question?\n"
+    "\n"
+    "CRITICAL: Do NOT add blank lines after ' Follow ups : ' - the first question must appear immediately.\n"
+    "IMPORTANT: Each follow-up question MUST be under 65 characters long.\n"
+)
+
+# Output layout of the fused (structured) medical call, see MEDICAL_RESPONSE_SCHEMA
+STRUCTURED_RESPONSE_RULES = (
+    "MANDATORY RESPONSE STRUCTURE (JSON fields):\n"
+    "- language: the language of the user's message: English, Telugu or Tinglish.\n"
+    "- intent: ONE warm sentence, in English, in the application's voice (e.g. \"We're here to...\"), "
+    "saying why we are responding. Do not mention \"user\", \"message\" or \"intent\"; no medical advice.\n"
+    "- reply: your main conversational reply with caring tone. If a usable name is available, open with it naturally. "
+    "Do NOT include follow-up questions here.\n"
+    "- follow_ups: exactly three short follow-up questions the user might ask next, "
+    "each under 65 characters, in the reply language.\n"
+)
+
+MEDICAL_RESPONSE_SCHEMA = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "sakhi_medical_response",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "language": {"type": "string", "enum": ["English", "Telugu", "Tinglish"]},
+                "intent": {"type": "string"},
+                "reply": {"type": "string"},
+                "follow_ups": {"type": "array", "items": {"type": "string"}},
+            },
+            "required": ["language", "intent", "reply", "follow_ups"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+def _build_medical_system_content(
+    target_lang: str,
+    history: Optional[List[Dict[str, str]]],
+    user_name: Optional[str],
+    context_text: str,
+    structured: bool = False,
+) -> str:
     history_block = _build_history_block(history)
 
     user_name = _friendly_name(user_name)
@@ -191,22 +404,7 @@ def generate_medical_response(
         "If target_lang is Tinglish, write Telugu words using Roman letters; do not switch to English.\n"
         "Keep sentences short, clear, and grammatically simple. For Tinglish, use natural, easy-to-read Roman Telugu (no awkward transliterations).\n"
         "\n"
-        "MANDATORY RESPONSE STRUCTURE:\n"
-        "1. Write your main conversational reply with caring tone. If a usable name is available, open with it naturally.\n"
-        "2. After the main reply, add EXACTLY two newline characters.\n"
-        "3. Write ' Follow ups : ' (space before 'Follow', space after 'ups', space after colon).\n"
-        "4. Immediately after the colon and space (NO extra newlines), write the first question.\n"
-        "5. Each subsequent question goes on a new line.\n"
-        "\n"
-        "EXACT FORMAT TO FOLLOW:\n"
-        "[Your main reply here, ending with punctuation.]\n"
-        "\n"
-        " Follow ups : What is your first question?\n"
-        "What is your second question?\n"
-        "What is your third question?\n"
-        "\n"
-        "CRITICAL: Do NOT add blank lines after ' Follow ups : ' - the first question must appear immediately.\n"
-        "IMPORTANT: Each follow-up question MUST be under 65 characters long.\n"
+        f"{STRUCTURED_RESPONSE_RULES if structured else TEXT_RESPONSE_RULES}"
         f"Always answer in {target_lang}.\n"
         f"{name_line}\n"
         "Address the user by name when available; if the name is long, use a shorter friendly form.\n"
@@ -225,6 +423,25 @@ def generate_medical_response(
             "\nNo KB retrieved. Provide general, high-level, medically safe guidance."
             "\nState clearly that advice is general and suggest consulting a doctor for specifics."
         )
+    return system_content
+
+
+def generate_medical_response(
+    prompt: str,
+    target_lang: str,
+    history: Optional[List[Dict[str, str]]],
+    user_name: Optional[str] = None,
+    query_vector: Optional[Sequence[float]] = None,
+) -> Tuple[str, List[dict]]:
+    """
+    Medical path: RAG + history.
+    Pass query_vector (the turn's embedding of prompt) to avoid re-embedding.
+    Returns (final_text, kb_results)
+    """
+    # Use Hierarchical RAG
+    kb_results = hierarchical_rag_query(prompt, query_vector=query_vector)
+    context_text = format_hierarchical_context(kb_results, prompt, context_token_budget(Route.OPENAI_RAG.value))
+    system_content = _build_medical_system_content(target_lang, history, user_name, context_text)
 
     if not client:
         return "I understand your concern. Since my medical brain is currently offline (Missing API Key), I recommend consulting a doctor for specific guidance.", []
@@ -246,6 +463,150 @@ def generate_medical_response(
     return final_text, kb_results
 
 
+async def generate_medical_response_async(
+    prompt: str,
+    target_lang: str,
+    history: Optional[List[Dict[str, str]]],
+    user_name: Optional[str] = None,
+    query_vector: Optional[Sequence[float]] = None,
+    kb_results: Optional[List[dict]] = None,
+) -> Tuple[str, List[dict]]:
+    """
+    Async version of generate_medical_response.
+    Pass kb_results when retrieval was already done by the caller.
+    Returns (final_text, kb_results)
+    """
+    if kb_results is None:
+        kb_results = await hierarchical_rag_query_async(prompt, query_vector=query_vector)
+    context_text = format_hierarchical_context(kb_results, prompt, context_token_budget(Route.OPENAI_RAG.value))
+    system_content = _build_medical_system_content(target_lang, history, user_name, context_text)
+
+    if not async_client:
+        return "I understand your concern. Since my medical brain is currently offline (Missing API Key), I recommend consulting a doctor for specific guidance.", []
+
+    completion = await async_client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "system", "content": system_content},
+            {"role": "user", "content": prompt},
+        ],
+        temperature=0.4,
+    )
+
+    return truncate_response(completion.choices[0].message.content), kb_results
+
+
+async def generate_medical_response_fused_async(
+    prompt: str,
+    target_lang: str,
+    history: Optional[List[Dict[str, str]]],
+    kb_results: List[dict],
+    user_name: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Fused OPENAI_RAG generation: a single JSON-schema call returns the
+    language, intent, main reply and follow-up questions.
+    Retrieval is done by the caller.
+
+    Returns:
+        {"language", "intent", "reply", "follow_ups", "text"}; "text" is the reply
+        in the usual " Follow ups : " layout, length-limited like the text mode
+    """
+    if not async_client:
+        return parse_fused_response(
+            "I understand your concern. Since my medical brain is currently offline (Missing API Key), I recommend consulting a doctor for specific guidance.",
+            target_lang,
+        )
+
+    context_text = format_hierarchical_context(kb_results, prompt, context_token_budget(Route.OPENAI_RAG.value))
+    system_content = _build_medical_system_content(target_lang, history, user_name, context_text, structured=True)
+
+    completion = await async_client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "system", "content": system_content},
+            {"role": "user", "content": prompt},
+        ],
+        temperature=0.4,
+        response_format=MEDICAL_RESPONSE_SCHEMA,
+    )
+
+    return parse_fused_response(completion.choices[0].message.content, target_lang)
+
+
+def parse_fused_response(content: Optional[str], target_lang: str) -> Dict[str, Any]:
+    """
+    Parse the structured output of generate_medical_response_fused_async.
+
+    Plain text (e.g. a refusal or a non-JSON reply) is accepted as the reply,
+    splitting off an existing " Follow ups : " section if present.
+
+    Returns:
+        {"language", "intent", "reply", "follow_ups", "text"}; intent is None when missing
+    """
+    content = (content or "").strip()
+    try:
+        data = json.loads(content)
+        if not isinstance(data, dict):
+            raise ValueError("structured response is not an object")
+    except ValueError:
+        reply, _, tail = content.partition(FOLLOW_UPS_MARKER.strip())
+        data = {"reply": reply, "follow_ups": tail.splitlines()}
+
+    reply = str(data.get("reply") or "").strip()
+    follow_ups = [str(q).strip() for q in data.get("follow_ups") or [] if str(q).strip()][:3]
+    language = data.get("language") or target_lang
+    intent = str(data.get("intent") or "").strip().strip('"\'') or None
+
+    return {
+        "language": language,
+        "intent": intent,
+        "reply": reply,
+        "follow_ups": follow_ups,
+        "text": truncate_response(format_follow_ups(reply, follow_ups)),
+    }
+
+
+async def stream_medical_response(
+    prompt: str,
+    target_lang: str,
+    history: Optional[List[Dict[str, str]]],
+    kb_results: List[dict],
+    user_name: Optional[str] = None,
+) -> AsyncIterator[str]:
+    """
+    Streaming version of generate_medical_response.
+    Retrieval is done by the caller (so it can report metadata); this yields text deltas.
+    """
+    context_text = format_hierarchical_context(kb_results, prompt, context_token_budget(Route.OPENAI_RAG.value))
+    system_content = _build_medical_system_content(target_lang, history, user_name, context_text)
+
+    if not async_client:
+        yield "I understand your concern. Since my medical brain is currently offline (Missing API Key), I recommend consulting a doctor for specific guidance."
+        return
+
+    stream = await async_client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "system", "content": system_content},
+            {"role": "user", "content": prompt},
+        ],
+        temperature=0.4,
+        stream=True,
+    )
+    async for delta in _iter_stream_deltas(stream):
+        yield delta
+
+
+async def _iter_stream_deltas(stream) -> AsyncIterator[str]:
+    async for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            yield delta
+
+
 # Intent generation system prompt
 INTENT_GENERATOR_PROMPT = """You are generating intent for a patient-facing fertility care application.
 
@@ -264,6 +625,13 @@ Based on the patient's question, generate a single warm, empathetic sentence tha
 
 IMPORTANT: Output ONLY the intent sentence, nothing else. No quotes, no labels, just the sentence."""
 
+# Language of a generated intent sentence, by detected language label
+INTENT_LANGUAGE_INSTRUCTIONS = {
+    "English": "Write in English.",
+    "Telugu": "Write in Telugu script.",
+    "Tinglish": "Write in Tinglish (Telugu words typed in English letters, mixed with simple English).",
+}
+
 
 def generate_intent(query: str) -> str:
     """
@@ -298,3 +666,35 @@ def generate_intent(query: str) -> str:
     except Exception as e:
         # Fallback intent if generation fails
         return "We're here to support you with care and understanding — you're in a safe space."
+
+
+async def generate_intent_async(query: str, language: Optional[str] = None) -> str:
+    """
+    Async version of generate_intent.
+
+    Args:
+        query: The patient's message/question
+        language: Language label to write the sentence in (see INTENT_LANGUAGE_INSTRUCTIONS)
+    """
+    if not async_client:
+        return "We're here to support you with care and understanding — you're in a safe space."
+
+    user_content = f"Patient's question: {query}"
+    if language in INTENT_LANGUAGE_INSTRUCTIONS:
+        user_content += f"\n{INTENT_LANGUAGE_INSTRUCTIONS[language]}"
+
+    try:
+        completion = await async_client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[
+                {"role": "system", "content": INTENT_GENERATOR_PROMPT},
+                {"role": "user", "content": user_content},
+            ],
+            temperature=0.7,
+            max_tokens=100,
+        )
+
+        return completion.choices[0].message.content.strip().strip('"\'')
+
+    except Exception:
+        return "We're here to support you with care and understanding — you're in a safe space."
@@ -0,0 +1,58 @@
+# modules/single_flight.py
+"""
+Single-flight coalescing for concurrent identical work.
+
+The first caller for a key starts the computation; callers arriving with the
+same key while it is still running wait for that result instead of starting
+their own. Nothing is kept once the computation finishes (that is the answer
+cache's job), so only truly concurrent duplicates are merged.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Per-process registry of in-flight computations keyed by any hashable key.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Run `factory()` once per key among concurrent callers.
+
+        Args:
+            key: Identity of the computation
+            factory: Coroutine function producing the result
+
+        Returns:
+            (result, is_leader); is_leader is False for callers that reused
+            another caller's result. Exceptions are raised to every caller.
+        """
+        task = self._in_flight.get(key)
+        is_leader = task is None
+        if is_leader:
+            # A task (not a bare coroutine) so followers still get the result
+            # if the leader's own request is cancelled
+            task = asyncio.ensure_future(factory())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+            self.leaders += 1
+        else:
+            self.followers += 1
+            logger.info(f"Single-flight: joined in-flight computation for {key!r}")
+
+        return await asyncio.shield(task), is_leader
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": len(self._in_flight), "leaders": self.leaders, "followers": self.followers}
@@ -1,7 +1,8 @@
 # modules/slm_client.py
+import json
 import logging
 import os
-from typing import Optional
+from typing import AsyncIterator, Optional
 import httpx
 from fastapi import HTTPException
 
@@ -221,6 +222,125 @@ class SLMClient:
         logger.info(f"SLM mock RAG response: {mock_response[:100]}...")
         return mock_response
     
+    async def stream_chat(
+        self,
+        message: str,
+        language: str = "en",
+        user_name: Optional[str] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Streaming version of generate_chat.
+        
+        Yields text chunks as they arrive. If the SLM endpoint does not stream
+        (plain JSON response), the whole reply is yielded as one chunk.
+        """
+        logger.info(f"SLM stream_chat called - Message: '{message[:50]}...', Language: {language}")
+        
+        if not self.endpoint_url:
+            yield await self.generate_chat(message=message, language=language, user_name=user_name)
+            return
+        
+        payload = {
+            "question": message,
+            "chat_history": "",
+        }
+        async for chunk in self._stream_request(payload):
+            yield chunk
+    
+    async def stream_rag_response(
+        self,
+        context: str,
+        message: str,
+        language: str = "en",
+        user_name: Optional[str] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Streaming version of generate_rag_response.
+        
+        Yields text chunks as they arrive. If the SLM endpoint does not stream
+        (plain JSON response), the whole reply is yielded as one chunk.
+        """
+        logger.info(f"SLM stream_rag_response called - Message: '{message[:50]}...', Language: {language}")
+        
+        if not self.endpoint_url:
+            yield await self.generate_rag_response(
+                context=context, message=message, language=language, user_name=user_name
+            )
+            return
+        
+        payload = {
+            "question": message,
+            "chat_history": "",
+            "context": context,
+        }
+        async for chunk in self._stream_request(payload):
+            yield chunk
+    
+    async def _stream_request(self, payload: dict) -> AsyncIterator[str]:
+        """
+        POST to the SLM endpoint and yield reply text incrementally.
+        
+        Handles Server-Sent Events ("data: ..." lines, either raw text, OpenAI-style
+        {"choices": [{"delta": {"content": ...}}]} or {"reply"/"token"/"text": ...})
+        and falls back to a single chunk for non-streaming JSON responses.
+        """
+        headers = {"Content-Type": "application/json", "Accept": "text/event-stream, application/json"}
+        if self.api_key and self.api_key != "your-api-key-if-needed":
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        
+        try:
+            async with httpx.AsyncClient(timeout=30.0) as client:
+                async with client.stream("POST", self.endpoint_url, json=payload, headers=headers) as response:
+                    response.raise_for_status()
+                    
+                    if "text/event-stream" not in response.headers.get("content-type", ""):
+                        await response.aread()
+                        yield self._extract_reply(response.json())
+                        return
+                    
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[len("data:"):].strip()
+                        if not data or data == "[DONE]":
+                            continue
+                        try:
+                            parsed = json.loads(data)
+                        except ValueError:
+                            yield data
+                            continue
+                        chunk = self._extract_stream_chunk(parsed)
+                        if chunk:
+                            yield chunk
+        
+        except httpx.HTTPStatusError as e:
+            logger.error(f"SLM API error: {e.response.status_code}")
+            raise HTTPException(status_code=502, detail=f"SLM API error: {e.response.status_code}")
+        except httpx.TimeoutException:
+            logger.error("SLM API timeout")
+            raise HTTPException(status_code=504, detail="SLM API timeout")
+    
+    @staticmethod
+    def _extract_reply(result) -> str:
+        """Extract response text from a non-streaming SLM response (SLM returns {"reply": "..."})."""
+        if isinstance(result, dict):
+            return result.get("reply") or result.get("response") or result.get("text") or result.get("message") or str(result)
+        return str(result)
+    
+    @staticmethod
+    def _extract_stream_chunk(parsed) -> str:
+        """Extract the text delta from one parsed SSE event."""
+        if isinstance(parsed, dict):
+            choices = parsed.get("choices")
+            if choices:
+                choice = choices[0] or {}
+                delta = choice.get("delta") or {}
+                return delta.get("content") or choice.get("text") or ""
+            return parsed.get("token") or parsed.get("reply") or parsed.get("text") or parsed.get("response") or ""
+        if isinstance(parsed, str):
+            return parsed
+        return ""
+    
     def is_mock(self) -> bool:
         """
         Check if client is running in mock mode.
@@ -4,6 +4,7 @@ Utility functions for text processing.
 """
 
 MAX_RESPONSE_LENGTH = 2000
+FOLLOW_UPS_MARKER = " Follow ups : "
 
 
 def truncate_response(text: str, max_length: int = MAX_RESPONSE_LENGTH) -> str:
@@ -24,7 +25,7 @@ def truncate_response(text: str, max_length: int = MAX_RESPONSE_LENGTH) -> str:
         return text
     
     # Check if response contains follow-up questions
-    follow_ups_marker = " Follow ups : "
+    follow_ups_marker = FOLLOW_UPS_MARKER
     
     if follow_ups_marker in text:
         # Split into main reply and follow-ups
@@ -78,3 +79,24 @@ def _truncate_text(text: str, max_length: int) -> str:
         truncated += "..."
     
     return truncated
+
+
+def format_follow_ups(reply: str, follow_ups: list[str] | None) -> str:
+    """
+    Join a main reply and its follow-up questions in the same layout the
+    medical prompt asks the model for (and truncate_response understands):
+
+        <reply>\n\n Follow ups : <question 1>\n<question 2>\n<question 3>
+
+    Args:
+        reply: The main reply text
+        follow_ups: Follow-up questions (empty entries are dropped)
+
+    Returns:
+        Combined text; just the reply when there are no follow-ups
+    """
+    reply = (reply or "").strip()
+    questions = [q.strip() for q in (follow_ups or []) if q and q.strip()]
+    if not questions:
+        return reply
+    return f"{reply}\n\n{FOLLOW_UPS_MARKER}" + "\n".join(questions)
@@ -4,8 +4,11 @@ import re
 from supabase_client import (
     generate_user_id,
     supabase_insert,
+    supabase_insert_async,
     supabase_select,
+    supabase_select_async,
     supabase_update,
+    supabase_update_async,
 )
 
 
@@ -88,6 +91,18 @@ def get_user_profile(user_id: str):
     return rows[0]
 
 
+async def get_user_profile_async(user_id: str):
+    """
+    Async version of get_user_profile.
+    """
+    rows = await supabase_select_async("sakhi_users", select="*", filters=f"user_id=eq.{user_id}")
+
+    if not rows or not isinstance(rows, list):
+        return None
+
+    return rows[0]
+
+
 def get_user_by_phone(phone_number: str):
     """
     Fetch user by phone_number (or phone).
@@ -104,6 +119,21 @@ def get_user_by_phone(phone_number: str):
     return None
 
 
+async def get_user_by_phone_async(phone_number: str):
+    """
+    Async version of get_user_by_phone.
+    """
+    if not phone_number:
+        return None
+    norm = _normalize_phone(phone_number)
+    if not norm:
+        return None
+    rows = await supabase_select_async("sakhi_users", select="*", filters=f"phone_number=eq.{norm}")
+    if rows and isinstance(rows, list) and rows:
+        return rows[0]
+    return None
+
+
 def resolve_user_id_by_phone(phone_number: str) -> str | None:
     user = get_user_by_phone(phone_number)
     if user:
@@ -132,6 +162,24 @@ def create_partial_user(phone_number: str):
         return inserted
     return data
 
+
+async def create_partial_user_async(phone_number: str):
+    """
+    Async version of create_partial_user.
+    """
+    data = {
+        "user_id": generate_user_id(),
+        "phone_number": _normalize_phone(phone_number),
+        "role": "USER",
+    }
+
+    inserted = await supabase_insert_async("sakhi_users", data)
+    if isinstance(inserted, list) and inserted:
+        return inserted[0]
+    if isinstance(inserted, dict):
+        return inserted
+    return data
+
 def update_user_profile(user_id: str, updates: dict):
     """
     Update specific fields in user profile.
@@ -143,6 +191,17 @@ def update_user_profile(user_id: str, updates: dict):
     return supabase_update("sakhi_users", match, updates)
 
 
+async def update_user_profile_async(user_id: str, updates: dict):
+    """
+    Async version of update_user_profile.
+    """
+    if not user_id:
+        raise ValueError("user_id is required")
+
+    match = f"user_id=eq.{user_id}"
+    return await supabase_update_async("sakhi_users", match, updates)
+
+
 def login_user(email: str, password: str):
     """
     Authenticate user by email and password.
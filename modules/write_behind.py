@@ -0,0 +1,221 @@
+# modules/write_behind.py
+"""
+Write-behind queue for rows that do not have to be in the database before
+the response is sent (sakhi_conversations messages).
+
+Rows are queued in memory and a background task inserts them in batches
+(one multi-row PostgREST insert per batch):
+
+- A batch is sent when WRITE_BEHIND_BATCH_SIZE rows are waiting, or
+  WRITE_BEHIND_FLUSH_SECONDS after its first row arrived.
+- A failed batch is retried with exponential backoff; after
+  WRITE_BEHIND_MAX_RETRIES it is appended to a dead-letter JSONL file so the
+  rows can be re-inserted by hand.
+- drain() (called on application shutdown) writes what is still queued.
+- Readers merge pending_rows(key) (queued or being written) with what they
+  read from the database instead of waiting for the write.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from supabase_client import supabase_insert_async
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEAD_LETTER_PATH = os.path.join(".cache", "write_behind_failed.jsonl")
+
+
+class WriteBehindQueue:
+    """
+    Batched, retrying background inserter for one table. Use from the event loop only.
+    """
+
+    def __init__(
+        self,
+        table: str,
+        batch_size: int = 50,
+        flush_seconds: float = 0.2,
+        max_retries: int = 5,
+        backoff_seconds: float = 0.5,
+        max_queued: int = 10000,
+        dead_letter_path: str = DEFAULT_DEAD_LETTER_PATH,
+    ):
+        """
+        Args:
+            table: Target table
+            batch_size: Maximum rows per insert
+            flush_seconds: Longest time a row waits for its batch to fill
+            max_retries: Retries of a failed batch before it is dead-lettered
+            backoff_seconds: First retry delay (doubles per retry, with jitter)
+            max_queued: Rows accepted before enqueue() refuses new ones
+            dead_letter_path: JSONL file receiving rows that could not be written
+        """
+        self.table = table
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = flush_seconds
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_queued = max_queued
+        self.dead_letter_path = dead_letter_path
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._pending: Dict[str, Dict[asyncio.Future, Dict[str, Any]]] = {}  # key -> {future: row}, enqueue order
+        self._in_flight = 0
+        self.written = 0
+        self.retries = 0
+        self.dead_lettered = 0
+
+    def _ensure_worker(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queued)
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+        return self._queue
+
+    def enqueue(self, row: Dict[str, Any], key: Optional[str] = None) -> None:
+        """
+        Queue a row for insertion.
+
+        Args:
+            row: Row payload
+            key: Optional grouping key (e.g. user_id) for pending_rows
+
+        Raises:
+            asyncio.QueueFull: when max_queued rows are already waiting
+        """
+        queue = self._ensure_worker()
+        done = asyncio.get_running_loop().create_future()
+        queue.put_nowait((row, done))
+        if key is not None:
+            self._pending.setdefault(key, {})[done] = row
+            done.add_done_callback(lambda f: self._forget(key, f))
+
+    def _forget(self, key: str, future: asyncio.Future) -> None:
+        rows = self._pending.get(key)
+        if rows is not None:
+            rows.pop(future, None)
+            if not rows:
+                del self._pending[key]
+
+    def pending_rows(self, key: str) -> List[Dict[str, Any]]:
+        """Rows queued under key that are not written yet (or being written), oldest first."""
+        return list(self._pending.get(key, {}).values())
+
+    async def _next_batch(self) -> List[Tuple[Dict[str, Any], asyncio.Future]]:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.flush_seconds
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            self._in_flight = len(batch)
+            try:
+                await self._write(batch)
+            finally:
+                self._in_flight = 0
+                for _, done in batch:
+                    if not done.done():
+                        done.set_result(None)
+                    self._queue.task_done()
+
+    async def _write(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]) -> None:
+        # PostgREST needs the same keys in every row of one insert
+        groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        for row, _ in batch:
+            groups.setdefault(tuple(sorted(row)), []).append(row)
+
+        for rows in groups.values():
+            for attempt in range(self.max_retries + 1):
+                try:
+                    await supabase_insert_async(self.table, rows)
+                    self.written += len(rows)
+                    break
+                except Exception as e:
+                    if attempt == self.max_retries:
+                        logger.error(f"Write-behind insert into {self.table} failed, dead-lettering {len(rows)} rows: {e}")
+                        self._dead_letter(rows)
+                        break
+                    self.retries += 1
+                    delay = self.backoff_seconds * (2 ** attempt) * (0.5 + random.random())
+                    logger.warning(f"Write-behind insert into {self.table} failed ({e}), retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+
+    def _dead_letter(self, rows: List[Dict[str, Any]]) -> None:
+        self.dead_lettered += len(rows)
+        try:
+            directory = os.path.dirname(self.dead_letter_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps({"table": self.table, "row": row}, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.error(f"Could not write dead-letter file {self.dead_letter_path}: {e}")
+
+    async def drain(self, timeout: float = 10.0) -> None:
+        """Write everything still queued (call on shutdown), then stop the worker."""
+        if self._queue is None:
+            return
+        if self.depth():
+            logger.info(f"Draining write-behind queue for {self.table} ({self.depth()} rows)")
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.error(f"Write-behind drain timed out with {self.depth()} rows unwritten")
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+
+    def depth(self) -> int:
+        """Rows queued or being written."""
+        return (self._queue.qsize() if self._queue is not None else 0) + self._in_flight
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "depth": self.depth(),
+            "written": self.written,
+            "retries": self.retries,
+            "dead_lettered": self.dead_lettered,
+        }
+
+
+# Module-level singleton instance
+_conversation_queue = None
+
+
+def get_conversation_queue() -> Optional[WriteBehindQueue]:
+    """
+    Get or create the write-behind queue for sakhi_conversations, or None when
+    WRITE_BEHIND_ENABLED is false (messages are then inserted directly).
+    """
+    global _conversation_queue
+    if os.getenv("WRITE_BEHIND_ENABLED", "true").lower() not in ("1", "true", "yes"):
+        return None
+    if _conversation_queue is None:
+        _conversation_queue = WriteBehindQueue(
+            "sakhi_conversations",
+            batch_size=int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "50")),
+            flush_seconds=float(os.getenv("WRITE_BEHIND_FLUSH_SECONDS", "0.2")),
+            max_retries=int(os.getenv("WRITE_BEHIND_MAX_RETRIES", "5")),
+            backoff_seconds=float(os.getenv("WRITE_BEHIND_BACKOFF_SECONDS", "0.5")),
+            max_queued=int(os.getenv("WRITE_BEHIND_MAX_QUEUED", "10000")),
+            dead_letter_path=os.getenv("WRITE_BEHIND_DEAD_LETTER_PATH", DEFAULT_DEAD_LETTER_PATH),
+        )
+    return _conversation_queue
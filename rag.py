@@ -2,21 +2,37 @@
 import os
 
 import supabase_client  # ensures .env is loaded once
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
+
+from embedding_batcher import EmbeddingBatcher
+from embedding_cache import get_embedding_cache
 
 EMBEDDING_MODEL = "text-embedding-3-small"  # 1536 dimensions
 
 _api_key = os.getenv("OPENAI_API_KEY")
 client = None
+async_client = None
 if _api_key:
     client = OpenAI(api_key=_api_key)
+    async_client = AsyncOpenAI(api_key=_api_key)
 
+# Concurrent generate_embedding_async calls are merged into one batched request.
+# EMBEDDING_BATCH_WINDOW_MS=0 sends every request on its own.
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "256"))
+_batcher = None
 
 
 def generate_embedding(text: str):
     """
     Converts text into a 1536-dimensional embedding vector using OpenAI.
+    Served from the embedding cache when the same text was embedded before.
     """
+    cache = get_embedding_cache()
+    cached = cache.get(text, EMBEDDING_MODEL)
+    if cached is not None:
+        return cached
+
     if not client:
         raise Exception("OPENAI_API_KEY missing. Cannot generate embeddings.")
     cleaned = text.strip().replace("\n", " ")
@@ -26,23 +42,103 @@ def generate_embedding(text: str):
         input=cleaned
     )
 
-    return resp.data[0].embedding
+    embedding = resp.data[0].embedding
+    cache.put(text, EMBEDDING_MODEL, embedding)
+    return embedding
 
 
 def generate_embeddings(texts: list[str]):
     """
     Converts a list of texts into embedding vectors in a single batch call.
+    Only cache misses are sent to OpenAI.
     """
+    cache = get_embedding_cache()
+    results = cache.get_many(texts, EMBEDDING_MODEL)
+    missing = [i for i, vector in enumerate(results) if vector is None]
+    if not missing:
+        return results
+
     if not client:
         raise Exception("OPENAI_API_KEY missing. Cannot generate embeddings.")
-    
-    cleaned_texts = [t.strip().replace("\n", " ") for t in texts]
-    
+
+    cleaned_texts = [texts[i].strip().replace("\n", " ") for i in missing]
+
     # OpenAI supports up to 2048 inputs per request (ours will be much less)
     resp = client.embeddings.create(
         model=EMBEDDING_MODEL,
         input=cleaned_texts
     )
-    
+
     # Match embeddings to input order
-    return [item.embedding for item in resp.data]
+    fresh = [item.embedding for item in resp.data]
+    cache.put_many([texts[i] for i in missing], EMBEDDING_MODEL, fresh)
+    for i, vector in zip(missing, fresh):
+        results[i] = vector
+    return results
+
+
+async def generate_embedding_async(text: str):
+    """
+    Async version of generate_embedding; does not block the event loop.
+    Cache misses from concurrent requests are micro-batched into one
+    generate_embeddings_async call.
+    """
+    cache = get_embedding_cache()
+    cached = (await cache.get_many_async([text], EMBEDDING_MODEL))[0]
+    if cached is not None:
+        return cached
+
+    if not async_client:
+        raise Exception("OPENAI_API_KEY missing. Cannot generate embeddings.")
+
+    if EMBEDDING_BATCH_WINDOW_MS > 0:
+        return await _get_batcher().embed(text)
+
+    cleaned = text.strip().replace("\n", " ")
+
+    resp = await async_client.embeddings.create(
+        model=EMBEDDING_MODEL,
+        input=cleaned
+    )
+
+    embedding = resp.data[0].embedding
+    cache.put(text, EMBEDDING_MODEL, embedding, write_behind=True)
+    return embedding
+
+
+async def generate_embeddings_async(texts: list[str]):
+    """
+    Async version of generate_embeddings (single batched call for cache misses).
+    """
+    cache = get_embedding_cache()
+    results = await cache.get_many_async(texts, EMBEDDING_MODEL)
+    missing = [i for i, vector in enumerate(results) if vector is None]
+    if not missing:
+        return results
+
+    if not async_client:
+        raise Exception("OPENAI_API_KEY missing. Cannot generate embeddings.")
+
+    cleaned_texts = [texts[i].strip().replace("\n", " ") for i in missing]
+
+    resp = await async_client.embeddings.create(
+        model=EMBEDDING_MODEL,
+        input=cleaned_texts
+    )
+
+    fresh = [item.embedding for item in resp.data]
+    cache.put_many([texts[i] for i in missing], EMBEDDING_MODEL, fresh, write_behind=True)
+    for i, vector in zip(missing, fresh):
+        results[i] = vector
+    return results
+
+
+def _get_batcher() -> EmbeddingBatcher:
+    global _batcher
+    if _batcher is None:
+        _batcher = EmbeddingBatcher(
+            generate_embeddings_async,
+            window_ms=EMBEDDING_BATCH_WINDOW_MS,
+            max_batch_size=EMBEDDING_BATCH_MAX_SIZE,
+        )
+    return _batcher
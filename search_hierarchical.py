@@ -1,19 +1,249 @@
-from typing import List, Dict, Any
-from supabase_client import supabase_rpc
-from rag import generate_embedding
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+from supabase_client import supabase_rpc, supabase_rpc_async
+from rag import generate_embedding, generate_embedding_async
+from kb_index import get_kb_index
+from bm25_index import get_lexical_index, reciprocal_rank_fusion
+from modules.context_builder import fit_sections_to_budget
 
-def hierarchical_rag_query(user_question: str, match_threshold: float = 0.3, match_count: int = 4) -> List[Dict[str, Any]]:
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Both retrieval RPCs are issued at once; each has its own time budget so a slow
+# FAQ search cannot hold up the document context (a timed-out RPC contributes nothing).
+DOC_RPC_TIMEOUT = float(os.getenv("RAG_DOC_RPC_TIMEOUT", "10"))
+FAQ_RPC_TIMEOUT = float(os.getenv("RAG_FAQ_RPC_TIMEOUT", "3"))
+
+# hierarchical_search_with_faq.sql returns sections and the FAQ hit from one RPC
+# (one embedding payload, one round trip). If it is not installed or fails, the
+# two concurrent RPCs above are used instead (for RAG_COMBINED_RPC_COOLDOWN
+# seconds after a failure). A timed-out combined RPC is not retried as two
+# RPCs: its time budget is spent, so the query gets no vector rows.
+USE_COMBINED_RPC = os.getenv("RAG_COMBINED_RPC", "true").lower() in ("1", "true", "yes")
+COMBINED_RPC_COOLDOWN = float(os.getenv("RAG_COMBINED_RPC_COOLDOWN", "60"))
+_combined_rpc_missing = False
+_combined_rpc_retry_at = 0.0
+
+# Hybrid retrieval (RAG_HYBRID_ENABLED): BM25 hits are fused with the vector hits by RRF
+RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+
+# Shared by the blocking callers (hierarchical_rag_query, rag_search.search_sakhi_kb)
+rpc_executor = ThreadPoolExecutor(max_workers=int(os.getenv("RAG_RPC_THREADS", "16")), thread_name_prefix="rag-rpc")
+
+
+def run_rpcs_concurrently(calls: Dict[str, tuple]) -> Dict[str, Any]:
+    """
+    Run blocking supabase_rpc calls in parallel threads.
+
+    Args:
+        calls: {label: (function_name, params, timeout_seconds)}
+
+    Returns:
+        {label: rows}; a failed or timed-out RPC is logged and maps to None
+    """
+    started = time.monotonic()
+    futures = {
+        label: (rpc_executor.submit(supabase_rpc, fn, params), timeout)
+        for label, (fn, params, timeout) in calls.items()
+    }
+    results: Dict[str, Any] = {}
+    for label, (future, timeout) in futures.items():
+        try:
+            # Budgets count from submission, not from when the previous RPC returned
+            results[label] = future.result(timeout=max(0.0, started + timeout - time.monotonic()))
+        except FutureTimeoutError:
+            future.cancel()
+            print(f"{label} timed out after {timeout:.1f}s")
+            results[label] = None
+        except Exception as e:
+            print(f"{label} failed: {e}")
+            results[label] = None
+    return results
+
+
+async def run_rpcs_concurrently_async(calls: Dict[str, tuple]) -> Dict[str, Any]:
+    """
+    Async twin of run_rpcs_concurrently (supabase_rpc_async + asyncio.wait_for).
+    """
+    labels = list(calls)
+    outcomes = await asyncio.gather(
+        *(asyncio.wait_for(supabase_rpc_async(fn, params), timeout) for fn, params, timeout in calls.values()),
+        return_exceptions=True,
+    )
+    results: Dict[str, Any] = {}
+    for label, outcome in zip(labels, outcomes):
+        if isinstance(outcome, asyncio.TimeoutError):
+            print(f"{label} timed out after {calls[label][2]:.1f}s")
+            results[label] = None
+        elif isinstance(outcome, BaseException):
+            if not isinstance(outcome, Exception):
+                raise outcome
+            print(f"{label} failed: {outcome}")
+            results[label] = None
+        else:
+            results[label] = outcome
+    return results
+
+
+def _local_search(params: Dict[str, Any]) -> Optional[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+    """
+    Answer from the in-process KB index (kb_index.py) when KB_INDEX_ENABLED is set.
+    """
+    index = get_kb_index()
+    if index is None:
+        return None
+    index.maybe_refresh()
+    return index.search(params["query_embedding"], params["match_threshold"], params["match_count"])
+
+
+def _fuse_lexical(
+    user_question: str, doc_rows, faq_rows, match_count: int
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Fuse the vector rows with BM25 rows (bm25_index.py) by reciprocal rank fusion.
+    Returns the inputs unchanged when hybrid retrieval is disabled.
+
+    A FAQ row that only BM25 matched (it has a bm25_score) can still serve as
+    context, but its youtube_link / infographic_url are dropped: a keyword-only
+    match is not reliable enough to attach media to the reply.
+    """
+    index = get_lexical_index()
+    if index is None:
+        return doc_rows, faq_rows
+    index.maybe_refresh()
+    lexical_docs = index.search_sections(user_question, match_count)
+    lexical_faqs = index.search_faq(user_question, 1)
+    if lexical_docs or lexical_faqs:
+        logger.debug("BM25 hits: %d sections, %d FAQ", len(lexical_docs), len(lexical_faqs))
+    fused_faqs = [
+        dict(row, youtube_link=None, infographic_url=None) if row.get("bm25_score") is not None else row
+        for row in reciprocal_rank_fusion([faq_rows, lexical_faqs], lambda r: r.get("id"), 1, RRF_K)
+    ]
+    return (
+        reciprocal_rank_fusion([doc_rows, lexical_docs], lambda r: (r.get("header_path"), r.get("section_content")), match_count, RRF_K),
+        fused_faqs,
+    )
+
+
+def _split_combined_rows(rows) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Split hierarchical_search_with_faq rows back into hierarchical_search-shaped
+    and match_faq-shaped rows.
+    """
+    doc_rows, faq_rows = [], []
+    for row in rows or []:
+        if row.get("source_type") == "FAQ":
+            faq_rows.append({
+                "id": row.get("id"),
+                "question": row.get("question"),
+                "answer": row.get("answer"),
+                "youtube_link": row.get("youtube_link"),
+                "infographic_url": row.get("infographic_url"),
+                "similarity": row.get("similarity"),
+            })
+        else:
+            doc_rows.append({
+                "section_content": row.get("section_content"),
+                "header_path": row.get("header_path"),
+                "similarity": row.get("similarity"),
+            })
+    return doc_rows, faq_rows
+
+
+def _combined_rpc_usable() -> bool:
+    return USE_COMBINED_RPC and not _combined_rpc_missing and time.monotonic() >= _combined_rpc_retry_at
+
+
+def _combined_rpc_failed(e: BaseException, timed_out: bool = False):
+    """
+    Latch the failure and return the result for this query: ([], []) after a
+    timeout, None (use the separate RPCs) otherwise.
+    """
+    global _combined_rpc_missing, _combined_rpc_retry_at
+    # PostgREST answers PGRST202 when the function does not exist; stop trying it
+    if "PGRST202" in str(e) or "Could not find the function" in str(e):
+        _combined_rpc_missing = True
+        print("hierarchical_search_with_faq is not installed, using separate RPCs")
+        return None
+    _combined_rpc_retry_at = time.monotonic() + COMBINED_RPC_COOLDOWN
+    if timed_out:
+        print(f"Combined search timed out after {DOC_RPC_TIMEOUT:.1f}s, using separate RPCs for {COMBINED_RPC_COOLDOWN:.0f}s")
+        return [], []
+    print(f"Combined search failed, using separate RPCs for {COMBINED_RPC_COOLDOWN:.0f}s: {e!r}")
+    return None
+
+
+def _combined_search(params: Dict[str, Any]) -> Optional[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+    if not _combined_rpc_usable():
+        return None
+    future = rpc_executor.submit(supabase_rpc, "hierarchical_search_with_faq", params)
+    try:
+        return _split_combined_rows(future.result(timeout=DOC_RPC_TIMEOUT))
+    except FutureTimeoutError as e:
+        future.cancel()
+        return _combined_rpc_failed(e, timed_out=True)
+    except Exception as e:
+        return _combined_rpc_failed(e)
+
+
+async def _combined_search_async(params: Dict[str, Any]) -> Optional[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+    if not _combined_rpc_usable():
+        return None
+    try:
+        rows = await asyncio.wait_for(supabase_rpc_async("hierarchical_search_with_faq", params), DOC_RPC_TIMEOUT)
+        return _split_combined_rows(rows)
+    except asyncio.TimeoutError as e:
+        return _combined_rpc_failed(e, timed_out=True)
+    except Exception as e:
+        return _combined_rpc_failed(e)
+
+
+def _tag_doc_results(doc_results, merged_results: List[Dict[str, Any]]) -> None:
+    if doc_results:
+        for item in doc_results:
+            item["source_type"] = "DOCUMENT"
+            merged_results.append(item)
+
+
+def _tag_faq_results(faq_results, merged_results: List[Dict[str, Any]]) -> None:
+    if faq_results:
+        for item in faq_results:
+            # Only add if it has a YouTube link or if we have no other results
+            if item.get("youtube_link") or not merged_results:
+                item["source_type"] = "FAQ"
+                # Ensure infographic_url is preserved if present
+                if "infographic_url" not in item:
+                    item["infographic_url"] = None 
+
+                merged_results.append(item)
+
+
+def hierarchical_rag_query(
+    user_question: str,
+    match_threshold: float = 0.3,
+    match_count: int = 4,
+    query_vector: Optional[Sequence[float]] = None,
+) -> List[Dict[str, Any]]:
     """
     Performs a hierarchical search:
-    1. Embeds the user question.
+    1. Embeds the user question (unless query_vector is already provided).
     2. Searches 'section_chunks' for matches (Hierarchical) -> Primary Source for Answer.
     3. Searches 'faq' table for matches (FAQ) -> Primary Source for YouTube Link.
-    4. Merges and returns results.
+       (2 and 3 are answered by the in-process KB index when enabled, otherwise by
+       one hierarchical_search_with_faq call when it is installed.)
+    4. With RAG_HYBRID_ENABLED, fuses BM25 hits into both rankings (RRF).
+    5. Merges and returns results.
     """
     print(f"Querying: {user_question}...")
     
-    # 1. Embed user query
-    query_vector = generate_embedding(user_question)
+    # 1. Embed user query (reuse the per-turn embedding when the caller has one)
+    if query_vector is None:
+        query_vector = generate_embedding(user_question)
+    query_vector = list(query_vector)
     
     # 2. Call Supabase RPC functions
     params = {
@@ -22,48 +252,91 @@ def hierarchical_rag_query(user_question: str, match_threshold: float = 0.3, mat
         "match_count": match_count
     }
     
+    # B. FAQ search (For YouTube Link)
+    # We only need the top match to find a relevant video
+    # match_faq likely only accepts query_embedding and match_count
+    faq_params = {
+        "query_embedding": query_vector,
+        "match_count": 1
+    }
+
+    # A + B in-process, or in one round trip
+    combined = _local_search(params) or _combined_search({**params, "faq_match_count": 1})
+    if combined is not None:
+        doc_rows, faq_rows = combined
+    else:
+        # A + B run concurrently: Hierarchical Docs (Primary Content) and FAQ
+        rows = run_rpcs_concurrently({
+            "Hierarchical search": ("hierarchical_search", params, DOC_RPC_TIMEOUT),
+            "FAQ search": ("match_faq", faq_params, FAQ_RPC_TIMEOUT),
+        })
+        doc_rows, faq_rows = rows["Hierarchical search"], rows["FAQ search"]
+
+    # C. Lexical (BM25) hits for abbreviations / Tinglish the embedding misses
+    doc_rows, faq_rows = _fuse_lexical(user_question, doc_rows, faq_rows, match_count)
+
+    # Docs are merged first: FAQ rows without a video are only kept when there are no docs
     merged_results = []
+    _tag_doc_results(doc_rows, merged_results)
+    _tag_faq_results(faq_rows, merged_results)
+    return merged_results
 
-    # A. Search Hierarchical Docs (Primary Content)
-    try:
-        doc_results = supabase_rpc("hierarchical_search", params)
-        if doc_results:
-            for item in doc_results:
-                item["source_type"] = "DOCUMENT"
-                merged_results.append(item)
-    except Exception as e:
-        print(f"Hierarchical search failed: {e}")
 
-    # B. Search FAQ (For YouTube Link)
-    # We only need the top match to find a relevant video
-    # match_faq likely only accepts query_embedding and match_count
+async def hierarchical_rag_query_async(
+    user_question: str,
+    match_threshold: float = 0.3,
+    match_count: int = 4,
+    query_vector: Optional[Sequence[float]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Async version of hierarchical_rag_query (AsyncOpenAI + concurrent async PostgREST RPCs).
+    """
+    print(f"Querying: {user_question}...")
+
+    if query_vector is None:
+        query_vector = await generate_embedding_async(user_question)
+    query_vector = list(query_vector)
+
+    params = {
+        "query_embedding": query_vector,
+        "match_threshold": match_threshold,
+        "match_count": match_count
+    }
+
     faq_params = {
         "query_embedding": query_vector,
         "match_count": 1
     }
-    
-    try:
-        faq_results = supabase_rpc("match_faq", faq_params)
-        if faq_results:
-            for item in faq_results:
-                # Only add if it has a YouTube link or if we have no other results
-                if item.get("youtube_link") or not merged_results:
-                    item["source_type"] = "FAQ"
-                    # Ensure infographic_url is preserved if present
-                    if "infographic_url" not in item:
-                        item["infographic_url"] = None 
-
-                    merged_results.append(item)
-    except Exception as e:
-        print(f"FAQ search failed: {e}")
-    
+
+    combined = _local_search(params) or await _combined_search_async({**params, "faq_match_count": 1})
+    if combined is not None:
+        doc_rows, faq_rows = combined
+    else:
+        rows = await run_rpcs_concurrently_async({
+            "Hierarchical search": ("hierarchical_search", params, DOC_RPC_TIMEOUT),
+            "FAQ search": ("match_faq", faq_params, FAQ_RPC_TIMEOUT),
+        })
+        doc_rows, faq_rows = rows["Hierarchical search"], rows["FAQ search"]
+
+    doc_rows, faq_rows = _fuse_lexical(user_question, doc_rows, faq_rows, match_count)
+
+    merged_results = []
+    _tag_doc_results(doc_rows, merged_results)
+    _tag_faq_results(faq_rows, merged_results)
     return merged_results
 
-def format_hierarchical_context(results: List[Dict[str, Any]]) -> str:
+def format_hierarchical_context(
+    results: List[Dict[str, Any]],
+    query: Optional[str] = None,
+    token_budget: Optional[int] = None,
+) -> str:
     """
     Formats the raw results into a context string for the LLM.
     Prioritizes Document content for the answer.
     Appends YouTube link if found in FAQ results.
+
+    With a token_budget (see modules/context_builder.context_token_budget), section
+    contents are cut to the sentences most relevant to `query`; every section is kept.
     """
     if not results:
         return "No relevant information found."
@@ -71,6 +344,16 @@ def format_hierarchical_context(results: List[Dict[str, Any]]) -> str:
     doc_context = ""
     youtube_link_found = None
 
+    if token_budget:
+        # Trim the texts the loop below emits: the documents, or the first FAQ answer without them
+        targets = [(i, "section_content") for i, m in enumerate(results) if m.get("source_type") != "FAQ"]
+        if not targets:
+            targets = [(i, "answer") for i, m in enumerate(results) if m.get("source_type") == "FAQ"][:1]
+        trimmed, _ = fit_sections_to_budget([results[i].get(f) or "" for i, f in targets], query or "", token_budget)
+        results = list(results)
+        for (i, f), text in zip(targets, trimmed):
+            results[i] = dict(results[i], **{f: text})
+
     for match in results:
         source_type = match.get("source_type", "UNKNOWN")
         
@@ -89,10 +372,14 @@ def format_hierarchical_context(results: List[Dict[str, Any]]) -> str:
             # Document source
             path = match.get("header_path", "Unknown Path")
             content = match.get("section_content", "")
-            similarity = match.get("similarity", 0)
+            # BM25-only rows (bm25_score, similarity 0.0) have no vector relevance to show
+            if match.get("bm25_score") is None:
+                label = f"DOCUMENT (Relevance: {match.get('similarity') or 0:.2f})"
+            else:
+                label = "DOCUMENT (keyword match)"
             
             doc_context += f"""
---- SOURCE: DOCUMENT (Relevance: {similarity:.2f}) ---
+--- SOURCE: {label} ---
 Path: {path}
 Content: {content}
 --------------------------------------------------
@@ -2,8 +2,9 @@
 
 import os
 import uuid
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Union
 
+import httpx
 import requests
 from dotenv import load_dotenv
 from supabase import create_client, Client
@@ -53,6 +54,18 @@ def supabase_insert(table: str, data: Dict[str, Any]):
     return resp.json()
 
 
+def supabase_upsert(table: str, data: Dict[str, Any]):
+    """
+    Insert a row, or update the row with the same primary key.
+    """
+    url = f"{SUPABASE_URL}/rest/v1/{table}"
+    headers = dict(HEADERS, Prefer="resolution=merge-duplicates,return=representation")
+    resp = requests.post(url, headers=headers, json=data)
+    if resp.status_code >= 300:
+        raise Exception(f"Supabase upsert failed: {resp.status_code} - {resp.text}")
+    return resp.json()
+
+
 def supabase_select(
     table: str,
     select: str = "*",
@@ -109,3 +122,89 @@ def supabase_rpc(function_name: str, params: Dict[str, Any]):
         return res.data
 
     return res
+
+
+# ================== ASYNC POSTGREST HELPERS ==================
+# Non-blocking twins of the helpers above for use inside async request handlers.
+# They share one pooled httpx.AsyncClient per process.
+
+_async_http: Optional[httpx.AsyncClient] = None
+
+
+def _get_async_http() -> httpx.AsyncClient:
+    global _async_http
+    if _async_http is None or _async_http.is_closed:
+        _async_http = httpx.AsyncClient(
+            headers=HEADERS,
+            timeout=httpx.Timeout(60.0, connect=10.0),
+            limits=httpx.Limits(max_connections=200, max_keepalive_connections=50),
+        )
+    return _async_http
+
+
+async def close_async_http() -> None:
+    """Close the pooled async client (call on application shutdown)."""
+    global _async_http
+    if _async_http is not None and not _async_http.is_closed:
+        await _async_http.aclose()
+    _async_http = None
+
+
+async def supabase_insert_async(table: str, data: Union[Dict[str, Any], List[Dict[str, Any]]]):
+    """
+    Insert one row, or several rows (a list with identical keys) in one request.
+    """
+    url = f"{SUPABASE_URL}/rest/v1/{table}"
+    resp = await _get_async_http().post(url, json=data)
+    if resp.status_code >= 300:
+        raise Exception(f"Supabase insert failed: {resp.status_code} - {resp.text}")
+    return resp.json()
+
+
+async def supabase_select_async(
+    table: str,
+    select: str = "*",
+    filters: str = "",
+    limit: Optional[int] = None,
+    rpc: Optional[str] = None,
+    payload: Optional[Dict[str, Any]] = None,
+):
+    """
+    Async version of supabase_select.
+    """
+    if rpc:
+        url = f"{SUPABASE_URL}/rest/v1/rpc/{rpc}"
+        resp = await _get_async_http().post(url, json=payload or {})
+    else:
+        base_query = f"{SUPABASE_URL}/rest/v1/{table}?select={select}"
+        if filters:
+            base_query = f"{base_query}&{filters}"
+        if limit:
+            base_query = f"{base_query}&limit={limit}"
+        resp = await _get_async_http().get(base_query)
+
+    if resp.status_code >= 300:
+        raise Exception(f"Supabase select failed: {resp.status_code} - {resp.text}")
+    return resp.json()
+
+
+async def supabase_update_async(table: str, match: str, data: Dict[str, Any]):
+    """
+    Async version of supabase_update.
+    """
+    url = f"{SUPABASE_URL}/rest/v1/{table}?{match}"
+    resp = await _get_async_http().patch(url, json=data)
+    if resp.status_code >= 300:
+        raise Exception(f"Supabase update failed: {resp.status_code} - {resp.text}")
+    return resp.json()
+
+
+async def supabase_rpc_async(function_name: str, params: Dict[str, Any]):
+    """
+    Call a Postgres function through the PostgREST RPC endpoint without blocking.
+    """
+    url = f"{SUPABASE_URL}/rest/v1/rpc/{function_name}"
+    resp = await _get_async_http().post(url, json=params)
+    if resp.status_code >= 300:
+        raise Exception(f"Supabase RPC error: {resp.status_code} - {resp.text}")
+    return resp.json()
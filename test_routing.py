@@ -7,7 +7,8 @@ Tests the semantic router with different query types.
 import sys
 sys.path.insert(0, '.')
 
-from modules.model_gateway import get_model_gateway, Route
+from modules.lexical_router import LexicalRouter
+from modules.model_gateway import get_model_gateway, ModelGateway, Route
 
 
 def test_routing():
@@ -75,9 +76,55 @@ def test_routing():
     return failed == 0
 
 
+def test_lexical_fast_path():
+    """Test the keyword fast path (no embeddings / network needed)."""
+    print("=" * 70)
+    print("Testing Lexical Fast Path")
+    print("=" * 70)
+    
+    router = LexicalRouter(
+        small_talk_phrases=ModelGateway.SMALL_TALK_EXAMPLES,
+        facility_keywords=ModelGateway.LEXICAL_FACILITY_KEYWORDS,
+        medical_keywords=[kw for kws in ModelGateway.TOPIC_KEYWORDS.values() for kw in kws]
+        + ModelGateway.LEXICAL_MEDICAL_KEYWORDS,
+        urgent_keywords=ModelGateway.LEXICAL_URGENT_KEYWORDS,
+    )
+    
+    test_cases = [
+        ("hi", "small_talk"),
+        ("Hi Sakhi!!", "small_talk"),
+        ("ok thanks", "small_talk"),
+        ("thank you so much 🙏", "small_talk"),
+        ("this is it", None),  # "hi"/"it" inside words must not match
+        ("hello, i feel sad", None),
+        ("clinic address in vizag", "facility_info"),
+        ("ivf clinic address", None),  # medical term present -> use embeddings
+        ("what is ivf", None),
+        ("severe bleeding", None),
+    ]
+    
+    failed = 0
+    for query, expected in test_cases:
+        actual = router.match(query)
+        status = "✓ PASS" if actual == expected else "✗ FAIL"
+        print(f"{status}  '{query}' -> {actual} (expected {expected})")
+        if actual != expected:
+            failed += 1
+    
+    # Fallback must never send urgent messages to the small model
+    fallback = router.fallback("severe bleeding")
+    print(f"{'✓ PASS' if fallback == 'medical_complex' else '✗ FAIL'}  fallback('severe bleeding') -> {fallback}")
+    if fallback != "medical_complex":
+        failed += 1
+    
+    print("=" * 70)
+    return failed == 0
+
+
 if __name__ == "__main__":
     try:
-        success = test_routing()
+        lexical_ok = test_lexical_fast_path()
+        success = test_routing() and lexical_ok
         sys.exit(0 if success else 1)
     except Exception as e:
         print(f"\nError running tests: {e}")